@@ -1,18 +1,38 @@
+import argparse
 import pandas as pd
+from describe_stream import default_chunk_rows, default_sketch_size, describe_csvs
 
-# Load the CSV file into a DataFrame
-csv_file_path = "twitter_analysis_CSV.csv"
-df = pd.read_csv(csv_file_path)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summary statistics of extracted tweet CSVs, computed in chunks "
+                                                 "over a process pool (see describe_stream.py).")
+    parser.add_argument("--input", nargs="+", default=["twitter_analysis_CSV.csv"],
+                        help="One or more CSVs with the same columns, summarized together")
+    parser.add_argument("--output", default="summary_statistics.csv")
+    parser.add_argument("--bounds-output", default="summary_statistics_bounds.csv",
+                        help="Where to save the quantile error bounds")
+    parser.add_argument("--workers", type=int, default=None, help="Processes reading the CSVs")
+    parser.add_argument("--range-mb", type=int, default=32,
+                        help="Megabytes of CSV per worker task; at most this much per worker is in memory")
+    parser.add_argument("--chunk-rows", type=int, default=default_chunk_rows)
+    parser.add_argument("--sketch-size", type=int, default=default_sketch_size,
+                        help="KLL sketch size; larger is more accurate for the quantiles")
+    args = parser.parse_args()
 
-# View summary statistics for the DataFrame
-summary_statistics = df.describe()
+    # Summarize the CSV files chunk by chunk
+    summary, stats = describe_csvs(args.input, args.workers, args.range_mb << 20, args.chunk_rows,
+                                   args.sketch_size)
+    summary_statistics = summary.describe()
+    error_bounds = summary.error_bounds()
 
+    # Save the summary statistics to a new CSV file, in the layout of DataFrame.describe()
+    summary_statistics.to_csv(args.output)
+    error_bounds.to_csv(args.bounds_output)
 
-# Save the summary statistics to a new CSV file (optional)
-summary_output_file = "summary_statistics.csv"
-summary_statistics.to_csv(summary_output_file)
-
-
-
-# Print the summary statistics
-print(summary_statistics)
+    # Print the summary statistics
+    print(summary_statistics)
+    print(f"\nRead {stats['bytes'] / 1e6:.1f} MB from {stats['files']} file(s) in {stats['ranges']} range(s) "
+          f"in {stats['elapsed']:.2f}s")
+    with pd.option_context("display.float_format", "{:.3%}".format):
+        print("Quantile rank error (99% confidence, fraction of count; 0 means exact):")
+        print(error_bounds.loc["rank_error"].to_string())
+    print(f"Quantile error bounds saved to {args.bounds_output}")
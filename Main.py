@@ -1,137 +1,69 @@
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-import json
+import re
 import time
-
-# Load environment variables
-load_dotenv()
-
-# Set up API keys
-api_keys = [
-    os.getenv("GEMINI_API_KEY1"),
-    os.getenv("GEMINI_API_KEY2"),
-    os.getenv("GEMINI_API_KEY3"),
-    os.getenv("GEMINI_API_KEY4")
-]
-
-# Remove any None values if some keys are not set
-api_keys = [key for key in api_keys if key]
-
-if not api_keys:
-    print("Error: No valid API keys found in environment variables.")
-    exit()
-
-# Initialize the current key index
-current_key_index = 0
-
-# Function to configure API with current key
-def configure_api():
-    global current_key_index
-    genai.configure(api_key=api_keys[current_key_index])
-    print(f"Configured with API key: GEMINI_API_KEY{current_key_index + 1}")
-
-# Initial API configuration
-configure_api()
-
-# Load the original JSON file
-input_file = "twitter_analysis_results.json"
-output_file = "twitter_analysis_results_1.json"
-
+import argparse
+from collections import Counter
+from json_repair import RepairError, repair_json
+from results_stream import EntryWriter, iter_entries, written_keys
+
+# Fix the syntax of every response in twitter_analysis_results.json locally.
+# This used to send each entry back to Gemini with a "convert to valid JSON"
+# prompt; the failures are mechanical (code fences, truncation, bare 16k
+# numbers), so json_repair.py fixes them without any API calls.
+
+# Command line options
+parser = argparse.ArgumentParser(description="Repair the JSON responses in twitter_analysis_results.json.")
+parser.add_argument("--input", default="twitter_analysis_results.json")
+parser.add_argument("--output", default="twitter_analysis_results_1.json",
+                    help="A .json array, or .jsonl for one entry per line")
+parser.add_argument("--append", action="store_true",
+                    help="Add to an existing .jsonl output, skipping entries it already holds")
+parser.add_argument("--verbose", action="store_true", help="Print the repairs made to every entry")
+args = parser.parse_args()
+if args.append and not args.output.lower().endswith(".jsonl"):
+    parser.error("--append needs a .jsonl --output")
+
+input_file = args.input
+output_file = args.output
+already_written = written_keys(output_file) if args.append else set()
+
+# Stream the entries through the repair and write each one as soon as it parses
+start = time.perf_counter()
+entries = 0
+repaired = 0
+skipped = 0
+repair_counts = Counter()
+failed = 0
 try:
-    with open(input_file, "r") as file:
-        data = json.load(file)
-except Exception as e:
-    print(f"Error loading input JSON file: {e}")
-    exit()
-
-# Function to generate prompt for each entry
-def generate_prompt(entry):
-    tweet_id = entry.get("tweet_id", "")
-    file_name = entry.get("file_name", "")
-    original_response = entry.get("response", "")
-
-    prompt = (
-        f"The response received is not in valid JSON format. Please convert the following response into a valid JSON object. "
-        f"Follow this format strictly:\n\n"
-        "{\n"
-        "  \"tweet_id\": \"<tweet_id>\",\n"
-        "  \"file_name\": \"<file_name>\",\n"
-        "  \"response\": {\n"
-        "    \"tweets\": [\n"
-        "      {\n"
-        "        \"completeness\": \"<1 or 0>\",\n"
-        "        \"content_type\": \"<tweet or reply>\",\n"
-        "        \"text_body\": \"<text content>\",\n"
-        "        \"username\": \"<username>\",\n"
-        "        \"image_text_description\": \"<description>\",\n"
-        "        \"likes\": <integer>,\n"
-        "        \"replies\": <integer>,\n"
-        "        \"retweets\": <integer>,\n"
-        "        \"views\": <integer>,\n"
-        "        \"time_of_post\": \"<date and time>\",\n"
-        "        \"promotional_or_irrelevant\": <true or false>,\n"
-        "        \"pro_trump\": <float>,\n"
-        "        \"hostile_to_trump\": <float>,\n"
-        "        \"sarcastic_about_trump\": <float>,\n"
-        "        \"ambivalent_about_trump\": <float>,\n"
-        "        \"nationalist_pro_trump\": <float>,\n"
-        "        \"anti_elite_pro_trump\": <float>,\n"
-        "        \"fearful_pro_trump\": <float>,\n"
-        "        \"optimistic_about_trump\": <float>,\n"
-        "        \"skeptical_of_trump\": <float>,\n"
-        "        \"disengaged_from_trump\": <float>\n"
-        "      }\n"
-        "    ]\n"
-        "  }\n"
-        "}\n\n"
-        f"Convert the following response:\n{original_response}"
-    )
-    return prompt
-
-# Function to send each entry to the model, validate, and store the corrected JSON
-results = []
-for entry in data:
-    retries = 0
-    max_retries = len(api_keys)
-
-    while retries < max_retries:
-        try:
-            # Generate prompt from the entry
-            prompt = generate_prompt(entry)
-            response = genai.generate_content(prompt=prompt)
-        except Exception as e:
-            print(f"Error generating content for tweet_id: {entry.get('tweet_id', '')}: {e}")
-            retries += 1
-            continue
-
-            # Parse and validate response
+    with EntryWriter(output_file, append=args.append) as writer:
+        for entry in iter_entries(input_file):
+            entries += 1
+            tweet_id = entry.get("tweet_id", "")
+            file_name = entry.get("file_name", "")
+            if (tweet_id, file_name) in already_written:
+                skipped += 1
+                continue
             try:
-                response_data = json.loads(response["candidates"][0]["content"])
-                response_data["tweet_id"] = entry.get("tweet_id", "")
-                response_data["file_name"] = entry.get("file_name", "")
-                results.append(response_data)
-                print(f"Valid JSON received and processed for tweet_id: {entry.get('tweet_id', '')}")
-                break
-
-            except json.JSONDecodeError:
-                print(f"Invalid JSON response received for tweet_id: {entry.get('tweet_id', '')}. Retrying with correction prompt.")
-
-                # Retry logic with next API key
-                current_key_index = (current_key_index + 1) % len(api_keys)
-                configure_api()
-
-                # If we've cycled through all keys, wait and retry
-                if current_key_index == 0:
-                    print("All API keys exhausted. Waiting for 30 seconds before retrying...")
-                    time.sleep(30)
-
-            retries += 1
-
-# Save valid JSON entries to a new file
-try:
-    with open(output_file, "w") as file:
-        json.dump(results, file, indent=4)
-    print(f"Final results saved to {output_file}")
-except Exception as e:
-    print(f"Error saving final results to JSON file: {e}")
+                response_data, repairs = repair_json(entry.get("response", ""))
+            except RepairError as e:
+                print(f"Could not repair {file_name} in folder {tweet_id}: {e}")
+                failed += 1
+                continue
+
+            writer.write({"tweet_id": tweet_id, "file_name": file_name, "response": response_data})
+            repaired += 1
+            for repair in repairs:
+                # Count entries by kind of repair, without the per-entry numbers
+                repair_counts[re.sub(r"\s*\(.*\)|\d+ ", "", repair)] += 1
+            if args.verbose and repairs:
+                print(f"{file_name} in folder {tweet_id}: {'; '.join(repairs)}")
+except (OSError, ValueError) as e:
+    print(f"Error reading {input_file}: {e}")
+    exit(1)
+elapsed = time.perf_counter() - start
+
+# Repair report
+print(f"Repaired {repaired} of {entries} entries in {elapsed * 1000:.0f} ms "
+      f"({failed} could not be repaired, {skipped} already in {output_file})")
+for repair, count in repair_counts.most_common():
+    print(f"  {count:5d}  {repair}")
+print(f"Final results saved to {output_file}")
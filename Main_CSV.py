@@ -1,39 +1,100 @@
 import os
+import atexit
 import google.generativeai as genai
 from google.generativeai.types import safety_types
 from dotenv import load_dotenv
 import csv
-import time
+import argparse
+import datetime
+from analysis_engine import AnalysisEngine, list_screenshot_jobs
+from batch_jobs import (
+    batch_fingerprint, default_shard_lines, emit_requests, info_file_name, parse_request_key, read_batch_info,
+    read_results
+)
+from gemini_backend import create_backends, load_api_keys
+from key_pool import KeyPool
+from reference_cache import ReferenceCache
+from response_cache import ResponseCache, cache_key, default_cache_path, file_sha256
+from run_manifest import RunManifest, manifest_path_for
+import dedup_screenshots
+from screenshot_batching import is_truncated
+from tweet_schema import csv_value, json_format_instructions, parse_and_validate_json, structured_generation_config
+
+# Command line options
+parser = argparse.ArgumentParser(description="Extract tweet details from screenshots with Gemini.")
+parser.add_argument("--engine", choices=["serial", "async"], default="serial",
+                    help="serial: one screenshot at a time; async: concurrent requests across all API keys")
+parser.add_argument("--concurrency", type=int, default=4,
+                    help="Requests in flight per API key for the async engine")
+parser.add_argument("--batch-size", type=int, default=1,
+                    help="Pack up to this many screenshots of the same tweet into one request (async engine only)")
+parser.add_argument("--context-cache", action="store_true",
+                    help="Keep the prompt and reference image in a cached context so each request only sends the screenshot")
+parser.add_argument("--cache-path", default=default_cache_path,
+                    help="SQLite file caching responses by screenshot hash, prompt, model and generation_config")
+parser.add_argument("--no-cache", action="store_true", help="Always call the API, even for screenshots seen before")
+parser.add_argument("--resume", action="store_true",
+                    help="Keep the existing output and only process screenshots the manifest has no success for")
+parser.add_argument("--output", default="twitter_analysis_results.csv", help="CSV the extracted rows are written to")
+parser.add_argument("--screenshots-root", default="Screenshots/trump/replies",
+                    help="Folder holding one sub-folder of screenshots per tweet_id, e.g. the output of preprocess_screenshots.py")
+parser.add_argument("--dedup-threshold", type=int, default=None,
+                    help="Skip screenshots within this many bits (of 64) of an earlier frame of the same tweet")
+parser.add_argument("--dedup-method", choices=["dhash", "phash"], default="dhash",
+                    help="Perceptual hash used by --dedup-threshold")
+parser.add_argument("--structured", action="store_true",
+                    help="Ask for schema-constrained JSON and validate it locally instead of parsing CSV text")
+parser.add_argument("--capture-links", default=None,
+                    help="CSV of tweet links to capture into --screenshots-root while analyzing, instead of "
+                         "analyzing screenshots already there (async engine only)")
+parser.add_argument("--capture-driver", choices=["edge", "fake"], default="edge",
+                    help="Browser for --capture-links; fake generates frames without a browser")
+parser.add_argument("--headless", action="store_true", help="Run Edge without a window for --capture-links")
+parser.add_argument("--analysis-queue", type=int, default=8,
+                    help="With --capture-links, captured frames waiting for analysis before capture blocks")
+parser.add_argument("--batch-emit", metavar="BATCH_DIR", default=None,
+                    help="Write every pending request to sharded JSONL files in BATCH_DIR for the batch "
+                         "prediction endpoint, instead of calling the API")
+parser.add_argument("--batch-ingest", metavar="RESULTS", nargs="+", default=None,
+                    help="Read batch result JSONL files (or folders of them) into --output, instead of calling the API")
+parser.add_argument("--batch-shard-size", type=int, default=default_shard_lines,
+                    help="Requests per JSONL file for --batch-emit")
+args = parser.parse_args()
+if args.batch_size > 1 and args.engine != "async":
+    parser.error("--batch-size needs --engine async")
+if args.structured and args.batch_size > 1:
+    parser.error("--structured does not support --batch-size yet")
+if args.capture_links and (args.engine != "async" or args.batch_size > 1 or args.dedup_threshold is not None):
+    parser.error("--capture-links needs --engine async and does not support --batch-size or --dedup-threshold")
+batch_mode = args.batch_emit is not None or args.batch_ingest is not None
+if batch_mode and (args.batch_emit and args.batch_ingest or args.capture_links or args.batch_size > 1):
+    parser.error("--batch-emit and --batch-ingest are used one at a time, without --capture-links or --batch-size")
 
 # Load environment variables
 load_dotenv()
 
-# Set up API keys
-api_keys = [
-    os.getenv("GEMINI_API_KEY1"),
-    os.getenv("GEMINI_API_KEY2"),
-    os.getenv("GEMINI_API_KEY3"),
-    os.getenv("GEMINI_API_KEY4")
-]
-
-# Remove any None values if some keys are not set
-api_keys = [key for key in api_keys if key]
+# Set up API keys as (name, key) pairs, skipping any that are not set
+api_keys = load_api_keys()
 
-if not api_keys:
+# Batch files are written and read offline, without a key
+if not api_keys and not batch_mode:
     print("Error: No valid API keys found in environment variables.")
     exit()
 
-# Initialize the current key index
-current_key_index = 0
+# Requests go to the key with the most headroom; failing keys back off or are quarantined
+key_pool = KeyPool(api_keys, max_in_flight=args.concurrency) if api_keys else None
+configured_key_name = None
 
-# Function to configure API with current key
-def configure_api():
-    global current_key_index
-    genai.configure(api_key=api_keys[current_key_index])
-    print(f"Configured with API key: GEMINI_API_KEY{current_key_index + 1}")
+# Function to configure API with the given key
+def configure_api(key_name):
+    global configured_key_name
+    genai.configure(api_key=key_pool.key_for(key_name))
+    configured_key_name = key_name
+    print(f"Configured with API key: {key_name}")
 
 # Initial configuration
-configure_api()
+if api_keys:
+    configure_api(key_pool.names[0])
 
 # Define the model configuration
 generation_config = {
@@ -65,18 +126,24 @@ safety_settings = [
 
 # Path to completeness reference image and screenshots root folder
 completeness_path = "Completeness.jpg"
-screenshots_root_folder = "Screenshots/trump/replies"
+screenshots_root_folder = args.screenshots_root
 
-# Prompt
-prompt = (
+# Prompt, in three parts so the output format can be swapped for --structured
+prompt_task = (
     "Analyze the given image files. Extract any relevant Twitter interaction details for each complete Tweet, Reply, or Quote, ignoring incomplete ones. "
     "The first image shows a sample difference between complete and incomplete tweet; and identifies objects within complete tweet.\n\n"
-    "Only Analyze the second image. Provide the details in the following CSV format: \n\n"
+    "Only Analyze the second image. "
+)
+csv_format = (
+    "Provide the details in the following CSV format: \n\n"
     "Ensure all string values are properly escaped for CSV format. Use double quotes for text fields and escape any internal double quotes by doubling them.\n\n"
     'completeness,content_type,text_body,username,image_text_description,likes,replies,retweets,views,time_of_post,promotional_or_irrelevant,pro_trump,hostile_to_trump,sarcastic_about_trump,ambivalent_about_trump,nationalist_pro_trump,anti_elite_pro_trump,fearful_pro_trump,optimistic_about_trump,skeptical_of_trump,disengaged_from_trump\n'
     '1,"tweet","Tweet text here","username","Image description here",0,0,0,0,"time",false,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0\n'
     "\n"
-    "Note: Ensure values are properly escaped for CSV format. Use double quotes for text fields and escape any internal double quotes by doubling them. Explanations for fields:\n"
+    "Note: Ensure values are properly escaped for CSV format. Use double quotes for text fields and escape any internal double quotes by doubling them. "
+)
+field_explanations = (
+    "Explanations for fields:\n"
     "completeness: 1 (complete), 0 (incomplete)\n"
     'content_type: "tweet" for original tweet (only Donald J. Trump\'s Tweets), "reply" for all other Tweets\n'
     "username: Username of the tweet. Be very careful, as there can be multiple visible usernames on the screenshot but only take the one attached to the tweet. Leave empty if none is found.\n"
@@ -94,11 +161,20 @@ prompt = (
     "disengaged_from_trump: -1: highly engaged with Trump, 1: extremely disengaged from Trump"
 )
 
+if args.structured:
+    # Schema-constrained JSON, validated locally; no repair or conversion passes needed
+    prompt = prompt_task + json_format_instructions + field_explanations
+    generation_config = structured_generation_config({**generation_config, "max_output_tokens": 2048})
+else:
+    prompt = prompt_task + csv_format + field_explanations
+
 # Create the model instance using gemini-1.5-flash-8b
+model_name = "gemini-1.5-flash-8b"
+
 def create_model():
     try:
         model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash-8b",
+            model_name=model_name,
             generation_config=generation_config,
             safety_settings=safety_settings
         )
@@ -132,8 +208,11 @@ def parse_and_validate_csv(csv_text):
 
     return valid_lines
 
+# Structured responses are validated against the tweet schema instead
+parse_response = parse_and_validate_json if args.structured else parse_and_validate_csv
+
 # Change the output file extension
-output_file = "twitter_analysis_results.csv"
+output_file = args.output
 
 # Initialize the CSV file with headers
 csv_headers = [
@@ -144,55 +223,240 @@ csv_headers = [
     "fearful_pro_trump", "optimistic_about_trump", "skeptical_of_trump", "disengaged_from_trump"
 ]
 
-with open(output_file, "w", newline='', encoding='utf-8') as csv_file:
-    writer = csv.writer(csv_file)
-    writer.writerow(csv_headers)
-
-for folder_name in os.listdir(screenshots_root_folder):
-    folder_path = os.path.join(screenshots_root_folder, folder_name)
-    if os.path.isdir(folder_path):
-        tweet_id = folder_name
-        for file_name in os.listdir(folder_path):
-            if file_name.endswith(".png"):
-                file_path = os.path.join(folder_path, file_name)
-                retries = 0
-                max_retries = len(api_keys)
-                while retries < max_retries:
-                    try:
-                        completeness_reference = genai.upload_file(completeness_path)
-                        file_reference = genai.upload_file(file_path)
-                        print(f"Uploaded screenshot: {file_name} from folder: {tweet_id}")
-                        
-                        response = model.generate_content(
-                            [prompt, completeness_reference, file_reference]
-                        )
-                        
-                        # Parse and validate the CSV response
-                        valid_csv_lines = parse_and_validate_csv(response.text)
-                        
-                        for line in valid_csv_lines:
-                            csv_data = line.split(',')
-                            
-                            # Prepare the row data
-                            row_data = [tweet_id, file_name] + csv_data
-                            
-                            # Append the result to the CSV file
-                            with open(output_file, "a", newline='', encoding='utf-8') as csv_file:
-                                writer = csv.writer(csv_file)
-                                writer.writerow(row_data)
-                            
-                            print(f"Valid result appended to {output_file} for {file_name}")
-                        
-                        break  # Break the retry loop if successful
-                    except Exception as e:
-                        print(f"Error processing {file_name} in folder {tweet_id} with API key {current_key_index + 1}: {e}")
-                        # Cycle to the next API key regardless of error type
-                        current_key_index = (current_key_index + 1) % len(api_keys)
-                        if current_key_index == 0:
-                            print("All API keys exhausted. Waiting for 30 seconds before retrying...")
-                            time.sleep(30)
-                        configure_api()
-                        model = create_model()
-                        retries += 1
+# The manifest records success, failure and attempt count per screenshot; it is
+# saved periodically, and once more however the run ends
+manifest = RunManifest(manifest_path_for(output_file))
+atexit.register(manifest.flush)
+
+# Batch results are added to the existing output; emitting batch files leaves it alone
+if (args.resume or args.batch_ingest) and os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+    print(f"Resuming: {manifest.summary()}")
+    # Rows written after the manifest was last saved belong to screenshots that
+    # are processed again; an output from before manifests existed is kept as is
+    if os.path.exists(manifest.path):
+        dropped_rows = manifest.drop_unrecorded_rows(output_file)
+        if dropped_rows:
+            print(f"Removed {dropped_rows} rows of screenshots the manifest has no success for")
+elif not args.batch_emit:
+    manifest.reset()
+    with open(output_file, "w", newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(csv_headers)
+
+# Screenshots still to process (everything, unless resuming); with
+# --capture-links they are found as they are captured instead
+jobs = [] if args.capture_links else [
+    (tweet_id, file_name, file_path)
+    for tweet_id, file_name, file_path in list_screenshot_jobs(screenshots_root_folder)
+    if not manifest.is_done(tweet_id, file_name)
+]
+
+# Drop identical and near-identical frames before they cost an API call
+if args.dedup_threshold is not None:
+    jobs, duplicate_jobs = dedup_screenshots.dedupe_jobs(jobs, args.dedup_threshold, args.dedup_method)
+    dedup_screenshots.report(jobs, duplicate_jobs)
+if not args.capture_links:
+    print(f"{len(jobs)} screenshots to process")
+
+if args.batch_emit:
+    # Screenshots the manifest has a success for are left out, as with --resume
+    shard_paths = emit_requests(jobs, args.batch_emit, prompt, completeness_path, model_name, generation_config,
+                                safety_settings, shard_lines=args.batch_shard_size)
+    print(f"Wrote {len(jobs)} batch requests to {len(shard_paths)} JSONL files in {args.batch_emit}")
+    print("Submit them to the batch endpoint, then run Main_CSV.py --batch-ingest with the result files")
+    exit()
+
+# Completeness.jpg is uploaded once per API key and reused until it expires
+reference_cache = ReferenceCache(completeness_path)
+
+# Responses already paid for are reused when nothing about the request changed
+response_cache = None if args.no_cache else ResponseCache(args.cache_path)
+
+# Function to create a model whose cached context holds the prompt and reference image
+def create_context_model(completeness_reference):
+    cached_content = genai.caching.CachedContent.create(
+        model=model_name,
+        system_instruction=prompt,
+        contents=[completeness_reference],
+        ttl=datetime.timedelta(seconds=reference_cache.context_ttl_seconds)
+    )
+    context_model = genai.GenerativeModel.from_cached_content(
+        cached_content, generation_config=generation_config, safety_settings=safety_settings
+    )
+    return context_model, cached_content.expire_time
+
+# Function to append the rows of one analyzed screenshot to the output CSV
+# and record the outcome in the manifest
+def write_result(result):
+    if result["error"]:
+        print(f"Giving up on {result['file_name']} in folder {result['tweet_id']}: {result['error']}")
+        manifest.record(result["tweet_id"], result["file_name"], False,
+                        attempts=result["attempts"], error=result["error"])
+        return
+    with open(output_file, "a", newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        for row in result["rows"]:
+            values = [csv_value(value) for value in row] if isinstance(row, list) else row.split(',')
+            writer.writerow([result["tweet_id"], result["file_name"]] + values)
+    manifest.record(result["tweet_id"], result["file_name"], True,
+                    attempts=result["attempts"], rows=len(result["rows"]))
+    print(f"{len(result['rows'])} valid results appended to {output_file} for {result['file_name']} "
+          f"in folder {result['tweet_id']} ({result['key_name']})")
+
+if args.batch_ingest:
+    # Each answer is handled as if the API had just returned it: parsed, written,
+    # recorded in the manifest and cached for later interactive runs
+    first_path = args.batch_ingest[0]
+    batch_info = read_batch_info(first_path if os.path.isdir(first_path) else os.path.dirname(first_path) or ".")
+    cacheable = response_cache is not None
+    if batch_info is None:
+        print(f"Warning: no {info_file_name} next to the results, so the prompt, model and generation_config "
+              "they were made with are unknown; their answers are not added to the response cache")
+        cacheable = False
+    elif batch_info["fingerprint"] != batch_fingerprint(prompt, model_name, generation_config):
+        print("Warning: these batch requests were made with a different prompt, model or generation_config; "
+              "their answers are not added to the response cache")
+        cacheable = False
+    ingest_counts = {"results": 0, "skipped": 0}
+    for result in read_results(args.batch_ingest):
+        tweet_id, file_name = parse_request_key(result["key"])
+        ingest_counts["results"] += 1
+        if manifest.is_done(tweet_id, file_name):
+            ingest_counts["skipped"] += 1  # already ingested
+            continue
+        error, rows = result["error"], []
+        if error is None and result["finish_reason"] == "MAX_TOKENS":
+            error = "Response cut off by max_output_tokens"
+        if error is None:
+            try:
+                rows = parse_response(result["text"])
+            except Exception as e:
+                error = f"Unparseable response: {e}"
+        # Recorded as a failure, so the screenshot goes into the next --batch-emit
+        if error is None and not rows:
+            error = "No valid rows in the response"
+        file_path = os.path.join(screenshots_root_folder, tweet_id, file_name)
+        if error is None and cacheable and os.path.exists(file_path):
+            response_cache.put(cache_key(file_sha256(file_path), prompt, model_name, generation_config),
+                               result["text"])
+        write_result({"tweet_id": tweet_id, "file_name": file_name, "rows": rows, "error": error,
+                      "key_name": "batch", "attempts": 1})
+    print(f"Ingested {ingest_counts['results']} batch results ({ingest_counts['skipped']} were already in the output)")
+elif args.engine == "async":
+    # Concurrent requests across every API key; rows are written as each screenshot completes
+    engine = AnalysisEngine(
+        create_backends(model_name, generation_config, safety_settings),
+        prompt=prompt,
+        reference_path=completeness_path,
+        parse_response=parse_response,
+        concurrency_per_key=args.concurrency,
+        reference_cache=reference_cache,
+        use_context_cache=args.context_cache,
+        response_cache=response_cache,
+        batch_size=args.batch_size,
+        key_pool=key_pool
+    )
+    if args.capture_links:
+        # Capture and analysis overlap: each frame is analyzed once it is saved
+        from capture_drivers import make_driver
+        from capture_pool import read_links
+        from stream_pipeline import run_pipeline
+        if args.capture_driver == "edge":
+            from Screenshots import default_user_data_dir
+            driver = make_driver("edge", 0, profile_dir=default_user_data_dir, headless=args.headless)
+        else:
+            driver = make_driver("fake", 0)
+        try:
+            stats, capture_results = run_pipeline(engine, driver, read_links(args.capture_links),
+                                                  screenshots_root_folder, write_result,
+                                                  max_queued_jobs=args.analysis_queue,
+                                                  job_filter=lambda tweet_id, file_name:
+                                                      not manifest.is_done(tweet_id, file_name))
+        finally:
+            driver.close()
+        print(f"Captured {sum(result['frames'] for result in capture_results)} frames "
+              f"from {len(capture_results)} links")
+    else:
+        stats = engine.run_sync(jobs, write_result)
+    print(f"Processed {stats['jobs']} screenshots in {stats['elapsed']:.1f}s "
+          f"({stats['succeeded']} succeeded, {stats['failed']} failed)")
+else:
+    for tweet_id, file_name, file_path in jobs:
+        if response_cache is not None:
+            response_key = cache_key(file_sha256(file_path), prompt, model_name, generation_config)
+            cached_text = response_cache.get(response_key)
+            cached_rows = parse_response(cached_text) if cached_text is not None else []
+            # An empty answer cached by an older version is asked again
+            if cached_rows:
+                write_result({"tweet_id": tweet_id, "file_name": file_name,
+                              "rows": cached_rows, "error": None,
+                              "key_name": "cache", "attempts": 0})
+                continue
+
+        retries = 0
+        max_retries = max(3, len(api_keys))
+        while retries < max_retries:
+            key_name, request_id = key_pool.acquire()
+            if key_name != configured_key_name:
+                # The model binds to the configured key, so rebuild it after switching
+                configure_api(key_name)
+                model = create_model()
+            try:
+                context_model = None
+                if args.context_cache:
+                    context_model = reference_cache.get_context(key_name, genai.upload_file, create_context_model)
+
+                file_reference = genai.upload_file(file_path)
+                print(f"Uploaded screenshot: {file_name} from folder: {tweet_id}")
+
+                if context_model is not None:
+                    response = context_model.generate_content([file_reference])
+                else:
+                    completeness_reference = reference_cache.get(key_name, genai.upload_file)
+                    response = model.generate_content(
+                        [prompt, completeness_reference, file_reference]
+                    )
+            except Exception as e:
+                print(f"Error processing {file_name} in folder {tweet_id} with {key_name}: {e}")
+                # Back off on this key and let the pool pick the next request's key;
+                # files uploaded with this key are not reused after a failure
+                key_pool.report_failure(key_name, request_id, e)
+                reference_cache.evict(key_name)
+                retries += 1
+                last_error = str(e)
+                continue
+            # The key is judged on the API call alone; a bad answer is retried without a cooldown
+            key_pool.report_success(key_name, request_id, KeyPool.tokens_used(response))
+
+            # Parse and validate the response before caching it; a cut-off or
+            # unreadable answer is retried instead of being replayed from the cache
+            try:
+                if is_truncated(response):
+                    raise ValueError("Response cut off by max_output_tokens")
+                valid_csv_lines = parse_response(response.text)
+                if not valid_csv_lines:
+                    raise ValueError("No valid rows in the response")
+            except Exception as e:
+                print(f"Unusable response for {file_name} in folder {tweet_id} from {key_name}: {e}")
+                retries += 1
+                last_error = str(e)
+                continue
+            if response_cache is not None:
+                response_cache.put(response_key, response.text)
+
+            # Append the rows to the CSV file
+            write_result({"tweet_id": tweet_id, "file_name": file_name, "rows": valid_csv_lines,
+                          "error": None, "key_name": key_name, "attempts": retries + 1})
+            break  # Break the retry loop if successful
+        else:
+            # Every key failed for this screenshot
+            write_result({"tweet_id": tweet_id, "file_name": file_name, "rows": [],
+                          "error": last_error, "key_name": key_name, "attempts": retries})
 
+if response_cache is not None:
+    print(response_cache.stats())
+    response_cache.close()
+manifest.flush()
+print(manifest.summary())
+print(f"Reference image uploaded {reference_cache.uploads} times, reused {reference_cache.reuses} times")
 print(f"All processing complete. Results saved to {output_file}")
\ No newline at end of file
@@ -1,18 +1,15 @@
-import csv
 import time
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
+import argparse
 import os
-from PIL import Image
-from io import BytesIO
-import psutil
 import threading
-import keyboard
+from functools import partial
+from capture_drivers import default_edge_driver_path, make_driver
+from capture_pool import capture_links, capture_screenshots, link_id, read_links, report
+from frame_writer import make_frame_writer, transform_names
 
 # Ensure all Edge processes are closed before starting a new session
 def kill_edge_processes():
+    import psutil
     try:
         for process in psutil.process_iter(['pid', 'name']):
             if process.info['name'] in ('msedge.exe', 'msedgedriver.exe'):
@@ -21,127 +18,115 @@ def kill_edge_processes():
     except Exception as e:
         print(f"Error while closing Edge processes: {e}")
 
-kill_edge_processes()
-
-# Set the path to Edge WebDriver
-edge_driver_path = '../Computational Social Science/edgedriver_win64/msedgedriver.exe'
-service = Service(edge_driver_path)
-
-# Specify the path to your Edge user data directory and the profile directory
-edge_options = webdriver.EdgeOptions()
-edge_options.add_argument(r"user-data-dir=C:\Users\Farhan\AppData\Local\Microsoft\Edge\User Data")
-edge_options.add_argument(r"profile-directory=Default")
-edge_options.add_argument("disable-gpu")
-edge_options.add_argument("no-sandbox")
-
-# Initialize Edge WebDriver
-driver = webdriver.Edge(service=service, options=edge_options)
-driver.maximize_window()  # Open browser in full-screen mode
-
-# Base directory for screenshots
-base_screenshots_dir = r"\screenshots\trump"
-
-# Create directories if they don't exist
-os.makedirs(base_screenshots_dir, exist_ok=True)
-
-# Global variables for pausing, resuming, and stopping
-is_paused = False
-is_stopped = False
-
-# Function to reset global control variables
-def reset_control_variables():
-    global is_paused, is_stopped
-    is_paused = False
-    is_stopped = False
-
-# Function to monitor pause, resume, and stop keys
-def monitor_keys():
-    global is_paused, is_stopped
-    while not is_stopped:
-        if keyboard.is_pressed('='):
-            is_paused = not is_paused
-            print("Paused" if is_paused else "Resumed")
-            time.sleep(1)  # Debounce delay
-
-        if keyboard.is_pressed('-'):
-            is_stopped = True
-            print("Stopping...")
-            break
-        time.sleep(0.1)  # Prevents CPU overutilization
-
-# Function to capture screenshots while scrolling through the tweet page
-def capture_screenshots(tweet_link, save_dir):
-    global is_paused, is_stopped
-    print(f"Processing: {tweet_link}")
-
-    # Validate that the tweet_link starts with "http"
-    if not tweet_link.startswith("http"):
-        print(f"Invalid URL: {tweet_link}")
-        return
-
-    try:
-        # Open the tweet link
-        driver.get(tweet_link)
-        time.sleep(5)  # Wait for the tweet page to load
-
-        screenshot_count = 0
-        max_screenshots = 200  # Set limit to 200 screenshots
-
-        # Start the key monitoring thread
-        key_monitor_thread = threading.Thread(target=monitor_keys, daemon=True)
-        key_monitor_thread.start()
-
-        while screenshot_count < max_screenshots:
-            if is_stopped:
-                print("Stopped by user.")
-                break
-
-            if is_paused:
-                time.sleep(1)
-                continue
-
-            # Capture a screenshot of the current page
-            screenshot = driver.get_screenshot_as_png()
-            image = Image.open(BytesIO(screenshot))
-
-            # Save screenshot in the specified directory
-            screenshot_filename = os.path.join(save_dir, f"screenshot_{screenshot_count}.png")
-            image.save(screenshot_filename)
-            screenshot_count += 1
-            print(f"Captured screenshot {screenshot_count}")
-
-            # Scroll down the page
-            driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.PAGE_DOWN)
-            time.sleep(2)  # Adjust based on how long it takes for new content to load
-
-        # Reset control variables after finishing each link
-        reset_control_variables()
-
-    except Exception as e:
-        print(f"Error processing {tweet_link}: {e}")
-
-# Define the path to your CSV file
-tweet_csv_path = r"\trumptweets.csv"
-
-# Read each tweet link from the CSV and start the process
-with open(tweet_csv_path, mode='r', newline='', encoding='utf-8') as file:
-    reader = csv.reader(file)
-    for row in reader:
-        tweet_link = row[0]  # Get each tweet link
-
-        # Debug print statement to check if the link is valid
-        print(f"Read tweet link: {tweet_link}")
-
-        # Create unique directory for each link's screenshots
-        link_id = tweet_link.split('/')[-1]
-        link_replies_dir = os.path.join(base_screenshots_dir, 'replies', link_id)
-        os.makedirs(link_replies_dir, exist_ok=True)
-
-        # Capture 200 screenshots from the original tweet (replies)
-        capture_screenshots(tweet_link, link_replies_dir)
-
-        # Reset stopping flag for the next link
-        is_stopped = False
-
-# Close the browser when done
-driver.quit()
+# Edge user data directory used for a single interactive session (already logged in to X)
+default_user_data_dir = r"C:\Users\Farhan\AppData\Local\Microsoft\Edge\User Data"
+
+
+# Pausing, resuming, and stopping with the keyboard during a single session
+class KeyControls:
+    def __init__(self):
+        self.is_paused = False
+        self.is_stopped = False
+
+    # Function to reset control variables after each link
+    def reset(self):
+        self.is_paused = False
+        self.is_stopped = False
+
+    # Function to monitor pause, resume, and stop keys for the whole run
+    def monitor_keys(self):
+        import keyboard
+        while True:
+            if keyboard.is_pressed('='):
+                self.is_paused = not self.is_paused
+                print("Paused" if self.is_paused else "Resumed")
+                time.sleep(1)  # Debounce delay
+
+            if keyboard.is_pressed('-') and not self.is_stopped:
+                self.is_stopped = True
+                print("Stopping...")
+                time.sleep(1)  # Debounce delay
+            time.sleep(0.1)  # Prevents CPU overutilization
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture screenshots of tweet threads while scrolling.")
+    parser.add_argument("--links", default=r"\trumptweets.csv", help="CSV file with one tweet link per row")
+    parser.add_argument("--output-dir", default=r"\screenshots\trump", help="Base directory for screenshots")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Browser sessions capturing in parallel; more than 1 runs a pool of worker processes")
+    parser.add_argument("--driver", choices=["edge", "fake"], default="edge",
+                        help="fake replays local fixtures instead of opening a browser")
+    parser.add_argument("--headless", action="store_true", help="Run Edge without a window")
+    parser.add_argument("--edge-driver-path", default=default_edge_driver_path)
+    parser.add_argument("--profile-root", default="edge_profiles",
+                        help="Pool mode: session N uses <profile-root>/profile_N as its Edge user data directory")
+    parser.add_argument("--max-screenshots", type=int, default=200, help="Upper limit on screenshots per link")
+    parser.add_argument("--load-timeout", type=float, default=15.0,
+                        help="Longest wait for a page's height to settle after opening a link")
+    parser.add_argument("--scroll-timeout", type=float, default=4.0,
+                        help="Longest wait for a new, stable frame after each PAGE_DOWN")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="Seconds between readiness checks")
+    parser.add_argument("--end-after", type=int, default=2,
+                        help="Stop a link after this many scrolls in a row leave the page where it was")
+    parser.add_argument("--write-queue", type=int, default=32,
+                        help="Frames waiting for the background writer before capture blocks")
+    parser.add_argument("--transform", action="append", choices=sorted(transform_names), default=[],
+                        help="Extra work per saved frame, run by the writer thread (repeatable)")
+    parser.add_argument("--fixtures", default=None, help="Fake driver: folder of PNG frames to replay")
+    parser.add_argument("--fake-frames", type=int, default=12, help="Fake driver: frames per page without fixtures")
+    parser.add_argument("--fake-latency", type=float, default=0.0,
+                        help="Fake driver: seconds per page load and per scroll")
+    args = parser.parse_args()
+
+    if args.driver == "fake":
+        driver_options = {"fixtures_dir": args.fixtures, "frames_per_page": args.fake_frames,
+                          "load_latency": args.fake_latency, "scroll_latency": args.fake_latency}
+    else:
+        kill_edge_processes()
+        driver_options = {"driver_path": args.edge_driver_path, "headless": args.headless}
+    capture_options = {"max_screenshots": args.max_screenshots, "load_timeout": args.load_timeout,
+                       "scroll_timeout": args.scroll_timeout, "poll_interval": args.poll_interval,
+                       "end_after": args.end_after}
+    writer_options = {"max_queued": args.write_queue, "transforms": args.transform}
+
+    # Create directories if they don't exist
+    base_screenshots_dir = args.output_dir
+    os.makedirs(base_screenshots_dir, exist_ok=True)
+    tweet_links = read_links(args.links)
+
+    if args.workers > 1:
+        # Links are handed to whichever browser session is free next
+        driver_factory = partial(make_driver, args.driver, profile_root=args.profile_root, **driver_options)
+        results, elapsed = capture_links(tweet_links, base_screenshots_dir, driver_factory,
+                                         workers=args.workers, writer_options=writer_options, **capture_options)
+        report(results, elapsed)
+    else:
+        # One session on the everyday profile, with keyboard controls
+        controls = None
+        if args.driver == "edge":
+            driver_options["profile_dir"] = default_user_data_dir
+            # Start the key monitoring thread
+            controls = KeyControls()
+            threading.Thread(target=controls.monitor_keys, daemon=True).start()
+        driver = make_driver(args.driver, 0, **driver_options)
+        writer = make_frame_writer(**writer_options)
+
+        results = []
+        start = time.perf_counter()
+        for tweet_link in tweet_links:
+            # Debug print statement to check if the link is valid
+            print(f"Read tweet link: {tweet_link}")
+
+            # Create unique directory for each link's screenshots
+            link_replies_dir = os.path.join(base_screenshots_dir, 'replies', link_id(tweet_link))
+            results.append(capture_screenshots(driver, tweet_link, link_replies_dir,
+                                               controls=controls, writer=writer, **capture_options))
+            # Reset stopping flag for the next link
+            if controls is not None:
+                controls.reset()
+
+        # Finish writing frames and close the browser when done
+        writer.close()
+        driver.close()
+        report(results, time.perf_counter() - start)
@@ -0,0 +1,233 @@
+import io
+import os
+import json
+import hashlib
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Persistent, incrementally updated sentiment statistics.
+#
+# For every group (candidate) the store keeps pairwise moments of the score
+# columns: for each pair (i, j) the number of rows where both are present, the
+# mean and the sum of squared deviations (M2) of column i over those rows, and
+# their co-moment. Partial moments are combined with Chan et al.'s parallel form
+# of Welford's update, so
+#   - appended CSV rows are folded in by parsing only the bytes after the last
+#     offset seen, in O(new rows); the bytes before it are only hashed, so an
+#     edit anywhere in what was already read triggers a rebuild instead;
+#   - stores built separately (e.g. one per shard of the results) merge exactly.
+# Means, variances and correlations are then read straight from the moments.
+# Pairs are counted over rows where both values are present, as pandas does,
+# so the numbers match DataFrame.mean / var / corr. Polarity counts (negative,
+# neutral, positive per column) are kept alongside.
+
+default_store_path = "sentiment_aggregates.json"
+
+chunk_rows = 100_000
+
+
+# Mergeable pairwise moments of k columns
+class Moments:
+    def __init__(self, k):
+        self.count = np.zeros((k, k))
+        self.mean = np.zeros((k, k))      # mean[i, j]: mean of column i over rows with both i and j
+        self.m2 = np.zeros((k, k))        # m2[i, j]: sum of squared deviations of column i over those rows
+        self.comoment = np.zeros((k, k))  # sum of (x_i - mean_i)(x_j - mean_j) over those rows
+        self.polarity = np.zeros((k, 3), dtype=np.int64)
+
+    # Function to compute the moments of a block of rows (2D array, NaN = missing)
+    @classmethod
+    def from_values(cls, values):
+        moments = cls(values.shape[1])
+        present = np.isfinite(values)
+        weights = present.astype(float)
+        x = np.where(present, values, 0.0)
+        # Shift by the column means first so the sums of squares stay small
+        counts = weights.sum(axis=0)
+        shift = np.divide(x.sum(axis=0), counts, out=np.zeros_like(counts), where=counts > 0)
+        x = np.where(present, x - shift, 0.0)
+
+        moments.count = weights.T @ weights
+        sums = x.T @ weights  # sums[i, j]: sum of shifted x_i over rows with j present
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shifted_mean = np.where(moments.count > 0, sums / moments.count, 0.0)
+            moments.m2 = np.where(moments.count > 0, (x * x).T @ weights - sums * shifted_mean, 0.0)
+            moments.comoment = np.where(moments.count > 0, x.T @ x - sums * shifted_mean.T, 0.0)
+        moments.mean = np.where(moments.count > 0, shifted_mean + shift[:, None], 0.0)
+
+        categories = (values > 0).astype(np.int64) - (values < 0) + 1
+        for category in range(3):
+            moments.polarity[:, category] = (categories == category).sum(axis=0)
+        return moments
+
+    # Function to combine two sets of moments into a new one (Chan et al.)
+    def merge(self, other):
+        merged = Moments(self.count.shape[0])
+        merged.count = self.count + other.count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(merged.count > 0, other.count / merged.count, 0.0)
+            weight = np.where(merged.count > 0, self.count * other.count / merged.count, 0.0)
+        delta = other.mean - self.mean
+        merged.mean = self.mean + delta * share
+        merged.m2 = self.m2 + other.m2 + delta * delta * weight
+        merged.comoment = self.comoment + other.comoment + delta * delta.T * weight
+        merged.polarity = self.polarity + other.polarity
+        return merged
+
+    def means(self):
+        return np.diag(self.mean).copy()
+
+    # Sample variance (ddof=1), as pandas computes it
+    def variances(self):
+        count = np.diag(self.count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 1, np.diag(self.m2) / (count - 1), np.nan)
+
+    # Pairwise correlation matrix, as DataFrame.corr computes it
+    def correlation(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correlation = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        return np.where(self.count > 1, correlation, np.nan)
+
+    def to_dict(self):
+        return {name: getattr(self, name).tolist() for name in ("count", "mean", "m2", "comoment", "polarity")}
+
+    @classmethod
+    def from_dict(cls, state):
+        moments = cls(len(state["count"]))
+        for name in ("count", "mean", "m2", "comoment"):
+            setattr(moments, name, np.array(state[name], dtype=float))
+        moments.polarity = np.array(state["polarity"], dtype=np.int64)
+        return moments
+
+
+# Function to hash the first `offset` bytes of a file. Returns the hashlib
+# object, so the bytes after them can be added to the same hash.
+def prefix_sha256(path, offset):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while offset > 0:
+            block = file.read(min(offset, 1 << 20))
+            if not block:
+                break
+            digest.update(block)
+            offset -= len(block)
+    return digest
+
+
+# Moments per group, with the position read up to in each group's CSV
+class AggregateStore:
+    def __init__(self, columns, path=None):
+        self.columns = list(columns)
+        self.path = path
+        self.groups = {}
+        self.sources = {}
+
+    @classmethod
+    def open(cls, path, columns):
+        store = cls(columns, path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+            if state.get("columns") == store.columns:
+                store.groups = {group: Moments.from_dict(moments) for group, moments in state["groups"].items()}
+                store.sources = state.get("sources", {})
+        return store
+
+    def save(self, path=None):
+        path = path or self.path
+        state = {"columns": self.columns, "sources": self.sources,
+                 "groups": {group: moments.to_dict() for group, moments in self.groups.items()}}
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix=".aggregates-", suffix=".tmp", dir=directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(temp_path, path)
+
+    # Function to fold rows (a DataFrame with the score columns) into a group's moments
+    def add_rows(self, group, rows):
+        values = rows[self.columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        moments = Moments.from_values(values)
+        self.groups[group] = self.groups[group].merge(moments) if group in self.groups else moments
+
+    # Function to bring the store up to date with {group: CSV path}. Rows after the
+    # last offset read are added when the SHA-256 of the bytes before it is still
+    # the one stored; a file that moved, shrank or changed anywhere before that
+    # offset is read again from the start. Returns the number of rows added.
+    def update(self, sources):
+        added = 0
+        for group, path in sources.items():
+            size = os.path.getsize(path)
+            seen = self.sources.get(group)
+            digest = None
+            if seen and seen["path"] == os.path.abspath(path) and size >= seen["offset"]:
+                digest = prefix_sha256(path, seen["offset"])
+            if seen and (digest is None or digest.hexdigest() != seen.get("sha256")):
+                print(f"{path} was rewritten; rebuilding its aggregates")
+                self.groups.pop(group, None)
+                seen = digest = None
+            with open(path, "rb") as file:
+                header = file.readline()
+                offset = seen["offset"] if seen else len(header)
+                if digest is None:
+                    digest = hashlib.sha256(header)
+                file.seek(offset)
+                new_bytes = file.read(size - offset)
+            digest.update(new_bytes)
+            if new_bytes.strip():
+                for rows in pd.read_csv(io.BytesIO(header + new_bytes), usecols=self.columns, chunksize=chunk_rows):
+                    self.add_rows(group, rows)
+                    added += len(rows)
+            self.sources[group] = {"path": os.path.abspath(path), "offset": size, "sha256": digest.hexdigest()}
+        return added
+
+    # Function to merge another store (e.g. from another shard) into this one
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge aggregate stores with different columns")
+        for group, moments in other.groups.items():
+            self.groups[group] = self.groups[group].merge(moments) if group in self.groups else moments
+
+    def count_frame(self):
+        return pd.DataFrame({group: np.diag(moments.count).astype(np.int64) for group, moments in self.groups.items()},
+                            index=self.columns).T
+
+    def means_frame(self):
+        return pd.DataFrame({group: moments.means() for group, moments in self.groups.items()},
+                            index=self.columns).T
+
+    def variances_frame(self):
+        return pd.DataFrame({group: moments.variances() for group, moments in self.groups.items()},
+                            index=self.columns).T
+
+    def correlations(self):
+        return {group: pd.DataFrame(moments.correlation(), index=self.columns, columns=self.columns)
+                for group, moments in self.groups.items()}
+
+
+if __name__ == "__main__":
+    import time
+    from visuals_data import candidate_files, sentiment_columns
+
+    parser = argparse.ArgumentParser(description="Update the sentiment aggregate store and print its statistics.")
+    parser.add_argument("--store", default=default_store_path)
+    parser.add_argument("--data-dir", default=".", help="Folder holding the candidate sentiment CSVs")
+    parser.add_argument("--merge", nargs="*", default=[], help="Other stores (shards) to merge into --store")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = AggregateStore.open(args.store, sentiment_columns)
+    added = store.update({candidate: os.path.join(args.data_dir, file_name)
+                          for candidate, file_name in candidate_files.items()})
+    for shard_path in args.merge:
+        store.merge(AggregateStore.open(shard_path, sentiment_columns))
+    store.save()
+    print(f"Added {added} new rows in {time.perf_counter() - start:.2f}s; store saved to {args.store}")
+    print("Rows:")
+    print(store.count_frame())
+    print("Means:")
+    print(store.means_frame().round(3))
+    print("Variances:")
+    print(store.variances_frame().round(3))
@@ -0,0 +1,276 @@
+import os
+import asyncio
+import queue as queue_module
+import time
+from concurrent.futures import ThreadPoolExecutor
+from key_pool import KeyPool, default_request_tokens
+from response_cache import cache_key, file_sha256
+from screenshot_batching import (
+    AdaptiveBatchSize, TruncatedResponse, batch_instructions, group_batches, is_truncated, parse_batch_response
+)
+
+# Screenshot formats: raw captures are PNG, preprocessed ones JPEG or WebP
+screenshot_extensions = (".png", ".jpg", ".jpeg", ".webp")
+
+# Function to list the screenshots to analyze as (tweet_id, file_name, file_path),
+# walking the same Screenshots/<...>/replies/<tweet_id>/*.png layout as Main_CSV.py
+def list_screenshot_jobs(screenshots_root_folder):
+    jobs = []
+    for folder_name in os.listdir(screenshots_root_folder):
+        folder_path = os.path.join(screenshots_root_folder, folder_name)
+        if os.path.isdir(folder_path):
+            for file_name in os.listdir(folder_path):
+                if file_name.lower().endswith(screenshot_extensions):
+                    jobs.append((folder_name, file_name, os.path.join(folder_path, file_name)))
+    return jobs
+
+
+# Asynchronous analysis engine with a bounded worker pool per API key.
+#
+# backends: objects with upload_file(path) and generate_content(contents),
+#   one per API key (GeminiBackend, or FakeGeminiBackend for benchmarks).
+# key_pool: a KeyPool deciding which key each request goes to. It routes to the
+#   key with the most rate-limit headroom and backs off or quarantines failing
+#   keys. Without one, keys are only limited by concurrency_per_key.
+# concurrency_per_key: an int, or a dict of key_name -> int, giving how many
+#   requests may be in flight on each key at once when no key_pool is given.
+# parse_response: turns the response text into a list of result rows.
+#
+# reference_cache: a ReferenceCache so the reference image is uploaded once per
+#   key instead of once per screenshot; with use_context_cache the prompt and
+#   reference also live in a cached context and requests carry only the screenshot.
+# response_cache: a ResponseCache; a screenshot whose bytes, prompt, model and
+#   generation_config were seen before is answered from disk with no API call.
+#   Only responses that were not truncated and gave rows for every screenshot
+#   are cached.
+# batch_size: pack up to this many screenshots of the same tweet_id into one
+#   request (see screenshot_batching.py). A batch whose response is truncated by
+#   max_output_tokens is split in half and requeued, and later batches shrink too.
+#
+# A failed job, or one whose response gave no valid rows, is put back on the
+# queue so the next free worker, usually on a different key, retries it, up to
+# max_retries attempts in total.
+class AnalysisEngine:
+    def __init__(self, backends, prompt, reference_path, parse_response,
+                 concurrency_per_key=4, max_retries=None, reference_cache=None,
+                 use_context_cache=False, response_cache=None, batch_size=1, key_pool=None):
+        if not backends:
+            raise ValueError("AnalysisEngine needs at least one backend")
+        self.backends = {backend.key_name: backend for backend in backends}
+        self.prompt = prompt
+        self.reference_path = reference_path
+        self.parse_response = parse_response
+        self.max_retries = max_retries or max(3, len(backends))
+        self.reference_cache = reference_cache
+        self.use_context_cache = use_context_cache and reference_cache is not None
+        self.response_cache = response_cache
+        self.batch_size = AdaptiveBatchSize(batch_size)
+        if key_pool is None:
+            key_pool = KeyPool([(name, None) for name in self.backends], requests_per_minute=10 ** 9,
+                               tokens_per_minute=10 ** 12, max_in_flight=concurrency_per_key)
+        self.key_pool = key_pool
+
+    # Function to look a batch up in the response cache before any key is spent on it.
+    # Returns (cache key, response text or None).
+    def _cached_response(self, batch, extra_text):
+        if self.response_cache is None:
+            return None, None
+        backend = next(iter(self.backends.values()))
+        content_hash = "+".join(file_sha256(job[2]) for job in batch)
+        key = cache_key(content_hash, self.prompt + extra_text, backend.model_name, backend.generation_config)
+        return key, self.response_cache.get(key)
+
+    def _parse(self, batch, response_text):
+        if len(batch) == 1:
+            return [(batch[0], self.parse_response(response_text))]
+        return parse_batch_response(response_text, batch, self.parse_response)
+
+    # Function to turn the response for one batch of screenshots (usually a batch
+    # of one) into rows, caching it when it is usable; runs on the engine's thread
+    # pool. Returns a list of (job, rows).
+    def _read_response(self, batch, response, key):
+        if is_truncated(response):
+            if len(batch) > 1:
+                raise TruncatedResponse(f"Response for {len(batch)} screenshots hit max_output_tokens")
+            raise ValueError("Response cut off by max_output_tokens")
+        results = self._parse(batch, response.text)
+        # A refusal or unreadable answer parses to no rows; caching it would replay it forever
+        if key is not None and all(rows for _, rows in results):
+            self.response_cache.put(key, response.text)
+        return results
+
+    # Send screenshots to the API and return the response
+    def _generate(self, backend, file_paths, extra_text):
+        if self.use_context_cache:
+            context_model = self.reference_cache.get_context(
+                backend.key_name, backend.upload_file,
+                lambda reference: backend.create_cached_model(
+                    self.prompt, reference, self.reference_cache.context_ttl_seconds)
+            )
+            if context_model is not None:
+                file_references = [backend.upload_file(file_path) for file_path in file_paths]
+                contents = ([extra_text] if extra_text else []) + file_references
+                return context_model.generate_content(contents)
+
+        if self.reference_cache is not None:
+            reference = self.reference_cache.get(backend.key_name, backend.upload_file)
+        else:
+            reference = backend.upload_file(self.reference_path)
+        file_references = [backend.upload_file(file_path) for file_path in file_paths]
+        return backend.generate_content([self.prompt + extra_text, reference] + file_references)
+
+    # Function to wait for the key with the most headroom without blocking the event loop
+    async def _acquire_key(self, estimated_tokens):
+        while True:
+            name, request_id, wait = self.key_pool.try_acquire(estimated_tokens)
+            if name is not None:
+                return name, request_id
+            await asyncio.sleep(wait)
+
+    def _report(self, on_result, stats, batch, results=None, error=None, key_name=None, attempts=0):
+        if results is None:
+            results = [(job, []) for job in batch]
+        for (tweet_id, file_name, _), rows in results:
+            stats["failed" if error else "succeeded"] += 1
+            on_result({"tweet_id": tweet_id, "file_name": file_name, "rows": rows,
+                       "error": error, "key_name": key_name, "attempts": attempts})
+
+    # Function to put a failed batch back on the queue, or report it as failed
+    # once it has used up max_retries attempts
+    def _retry(self, queue, on_result, stats, batch, attempts, error, key_name):
+        for tweet_id, file_name, _ in batch:
+            print(f"Error processing {file_name} in folder {tweet_id} with {key_name}: {error}")
+        if attempts < self.max_retries:
+            queue.put_nowait((batch, attempts))
+        else:
+            self._report(on_result, stats, batch, error=str(error), key_name=key_name, attempts=attempts)
+
+    async def _worker(self, queue, executor, on_result, stats):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, attempts = await queue.get()
+            key_name = None
+            try:
+                # Hand back whatever no longer fits the current batch size
+                if len(batch) > self.batch_size.size:
+                    queue.put_nowait((batch[self.batch_size.size:], attempts))
+                    batch = batch[:self.batch_size.size]
+                extra_text = batch_instructions(len(batch)) if len(batch) > 1 else ""
+
+                key, response_text = await loop.run_in_executor(executor, self._cached_response, batch, extra_text)
+                if response_text is not None:
+                    results = self._parse(batch, response_text)
+                    # An empty answer cached by an older version is asked again
+                    if all(rows for _, rows in results):
+                        self._report(on_result, stats, batch, results, key_name="cache", attempts=attempts)
+                        continue
+
+                key_name, request_id = await self._acquire_key(default_request_tokens * len(batch))
+                backend = self.backends[key_name]
+                # The key is judged on the API call alone, reported exactly once;
+                # what the answer holds is checked afterwards
+                try:
+                    response = await loop.run_in_executor(
+                        executor, self._generate, backend, [job[2] for job in batch], extra_text)
+                except Exception as e:
+                    self.key_pool.report_failure(key_name, request_id, e)
+                    if self.reference_cache is not None:
+                        self.reference_cache.evict(key_name)
+                    raise
+                self.key_pool.report_success(key_name, request_id, KeyPool.tokens_used(response))
+                results = await loop.run_in_executor(executor, self._read_response, batch, response, key)
+            except TruncatedResponse as e:
+                print(f"{e}; splitting the batch")
+                self.batch_size.truncated(len(batch))
+                middle = len(batch) // 2
+                queue.put_nowait((batch[:middle], attempts))
+                queue.put_nowait((batch[middle:], attempts))
+            except Exception as e:
+                self._retry(queue, on_result, stats, batch, attempts + 1, e, key_name)
+            else:
+                if len(batch) > 1:
+                    self.batch_size.complete()
+                answered = [(job, rows) for job, rows in results if rows]
+                self._report(on_result, stats, [job for job, _ in answered], answered,
+                             key_name=key_name, attempts=attempts + 1)
+                unanswered = [job for job, rows in results if not rows]
+                if unanswered:
+                    self._retry(queue, on_result, stats, unanswered, attempts + 1,
+                                "No valid rows in the response", key_name)
+            finally:
+                queue.task_done()
+
+    # Run every job and call on_result(result) as each screenshot completes.
+    # Results arrive in completion order; each carries its tweet_id and file_name.
+    async def run(self, jobs, on_result):
+        queue = asyncio.Queue()
+        if self.batch_size.max_size > 1:
+            batches = group_batches(jobs, self.batch_size.max_size)
+        else:
+            batches = [[job] for job in jobs]
+        for batch in batches:
+            queue.put_nowait((batch, 0))
+
+        worker_count = sum(self.key_pool.max_in_flight(name) for name in self.backends)
+        stats = {"succeeded": 0, "failed": 0, "jobs": len(jobs)}
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=worker_count) as executor:
+            workers = [
+                asyncio.create_task(self._worker(queue, executor, on_result, stats))
+                for _ in range(worker_count)
+            ]
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        stats["elapsed"] = time.perf_counter() - start
+        return stats
+
+    # Run jobs as they arrive instead of from a list, e.g. screenshots handed over
+    # by the capture loop while it keeps scrolling (see stream_pipeline.py).
+    # job_source: a queue.Queue of (tweet_id, file_name, file_path) ending with None.
+    # At most max_pending jobs are taken off job_source ahead of the workers; past
+    # that, job_source is left to fill up, so a bounded one blocks its producer.
+    # Jobs are sent one screenshot per request (no batching).
+    async def run_stream(self, job_source, on_result, max_pending=None, poll_interval=0.05):
+        queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        worker_count = sum(self.key_pool.max_in_flight(name) for name in self.backends)
+        max_pending = max_pending or worker_count
+        stats = {"succeeded": 0, "failed": 0, "jobs": 0}
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=worker_count) as executor:
+            workers = [
+                asyncio.create_task(self._worker(queue, executor, on_result, stats))
+                for _ in range(worker_count)
+            ]
+            while True:
+                # Backpressure: wait for room before taking the next job
+                while stats["jobs"] - stats["succeeded"] - stats["failed"] >= max_pending:
+                    await asyncio.sleep(poll_interval)
+                try:
+                    job = job_source.get_nowait()
+                except queue_module.Empty:
+                    await asyncio.sleep(poll_interval)
+                    continue
+                if job is None:
+                    break
+                stats["jobs"] += 1
+                queue.put_nowait(([job], 0))
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        stats["elapsed"] = time.perf_counter() - start
+        return stats
+
+    # Convenience wrappers for synchronous callers
+    def run_sync(self, jobs, on_result):
+        return asyncio.run(self.run(jobs, on_result))
+
+    def run_stream_sync(self, job_source, on_result, max_pending=None):
+        return asyncio.run(self.run_stream(job_source, on_result, max_pending))
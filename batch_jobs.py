@@ -0,0 +1,166 @@
+import os
+import json
+import base64
+import hashlib
+import argparse
+from dedup_screenshots import screenshot_number
+
+# Offline batch jobs for Gemini's batch prediction endpoint.
+#
+# Instead of one interactive call per screenshot, every pending request is
+# written as one line of a JSONL request file:
+#   {"key": "<tweet_id>/<file_name>", "request": {"contents": [...], "generation_config": ...}}
+# The prompt, the reference image and the screenshot go inline (base64), so the
+# files can be submitted without uploading anything first. Requests are sorted
+# by tweet_id and capture order and cut into shards of at most shard_lines lines
+# and shard_bytes bytes, so the same pending set always gives the same shards.
+#
+# The endpoint answers with a result JSONL file per request file, one line per
+# key holding either a response or an error. Results are read back one line at
+# a time; the key says which screenshot each answer belongs to, whatever order
+# the lines come back in.
+
+request_file_prefix = "requests-"
+info_file_name = "batch_info.json"
+
+default_shard_lines = 1000
+default_shard_bytes = 512 * 1024 * 1024
+
+image_mime_types = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
+
+# Function to build the stable ID of one screenshot's request (the manifest's key too)
+def request_key(tweet_id, file_name):
+    return f"{tweet_id}/{file_name}"
+
+# Function to split a request key back into (tweet_id, file_name)
+def parse_request_key(key):
+    tweet_id, _, file_name = key.partition("/")
+    return tweet_id, file_name
+
+# Function to read an image into an inline_data part
+def inline_image(path):
+    with open(path, "rb") as file:
+        data = base64.b64encode(file.read()).decode("ascii")
+    mime_type = image_mime_types.get(os.path.splitext(path)[1].lower(), "image/png")
+    return {"inline_data": {"mime_type": mime_type, "data": data}}
+
+# Function to write safety settings with enum names, as the JSON API expects
+def _json_safety_settings(safety_settings):
+    return [{name: getattr(value, "name", value) for name, value in setting.items()}
+            for setting in safety_settings or []]
+
+# Function to fingerprint the settings a batch was made with, so results are
+# only parsed and cached under the same prompt and generation_config
+def batch_fingerprint(prompt, model_name, generation_config):
+    material = json.dumps({"prompt": prompt, "model_name": model_name, "generation_config": generation_config},
+                          sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# Function to write the request shards for jobs, a list of (tweet_id, file_name, file_path).
+# Returns the list of shard paths.
+def emit_requests(jobs, output_dir, prompt, reference_path, model_name, generation_config, safety_settings=None,
+                  shard_lines=default_shard_lines, shard_bytes=default_shard_bytes):
+    os.makedirs(output_dir, exist_ok=True)
+    # Shards from an earlier emit would be submitted twice
+    for file_name in os.listdir(output_dir):
+        if file_name.startswith(request_file_prefix) and file_name.endswith(".jsonl"):
+            os.remove(os.path.join(output_dir, file_name))
+
+    reference = inline_image(reference_path)
+    settings = _json_safety_settings(safety_settings)
+    jobs = sorted(jobs, key=lambda job: (job[0], screenshot_number(job[1]), job[1]))
+
+    shard_paths = []
+    shard = None
+    lines = size = 0
+    for tweet_id, file_name, file_path in jobs:
+        request = {"contents": [{"role": "user", "parts": [{"text": prompt}, reference, inline_image(file_path)]}],
+                   "generation_config": generation_config}
+        if settings:
+            request["safety_settings"] = settings
+        line = (json.dumps({"key": request_key(tweet_id, file_name), "request": request}) + "\n").encode("utf-8")
+        if shard is None or lines >= shard_lines or (lines and size + len(line) > shard_bytes):
+            if shard is not None:
+                shard.close()
+            shard_paths.append(os.path.join(output_dir, f"{request_file_prefix}{len(shard_paths):05d}.jsonl"))
+            shard = open(shard_paths[-1], "wb")
+            lines = size = 0
+        shard.write(line)
+        lines += 1
+        size += len(line)
+    if shard is not None:
+        shard.close()
+
+    with open(os.path.join(output_dir, info_file_name), "w", encoding="utf-8") as file:
+        json.dump({"model_name": model_name, "requests": len(jobs), "shards": [os.path.basename(path)
+                                                                            for path in shard_paths],
+                   "fingerprint": batch_fingerprint(prompt, model_name, generation_config)}, file, indent=1)
+    return shard_paths
+
+# Function to read the batch info written by emit_requests, or None
+def read_batch_info(output_dir):
+    path = os.path.join(output_dir, info_file_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+# Function to list the result files among paths: files as given, and every
+# .jsonl file in a folder that is not a request shard
+def result_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.endswith(".jsonl") and not name.startswith(request_file_prefix))
+        else:
+            files.append(path)
+    return files
+
+# Function to stream the results, one dict per line:
+#   {"key", "text", "finish_reason", "error"}; error is None for an answer
+def read_results(paths):
+    for path in result_files(paths):
+        with open(path, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Skipping unreadable line {line_number} of {path}: {e}")
+                    continue
+                key = result.get("key")
+                if key is None:
+                    print(f"Skipping line {line_number} of {path}: no key")
+                    continue
+                if result.get("error"):
+                    error = result["error"]
+                    yield {"key": key, "text": None, "finish_reason": None,
+                           "error": error.get("message", str(error)) if isinstance(error, dict) else str(error)}
+                    continue
+                candidates = result.get("response", {}).get("candidates") or []
+                if not candidates:
+                    yield {"key": key, "text": None, "finish_reason": None, "error": "Response has no candidates"}
+                    continue
+                candidate = candidates[0]
+                parts = candidate.get("content", {}).get("parts") or []
+                yield {"key": key, "text": "".join(part.get("text", "") for part in parts),
+                       "finish_reason": candidate.get("finishReason", candidate.get("finish_reason")), "error": None}
+
+
+if __name__ == "__main__":
+    from fake_gemini import fabricate_batch_results
+
+    parser = argparse.ArgumentParser(description="Fabricate batch results for request shards written by "
+                                                 "Main_CSV.py --batch-emit, without calling the API.")
+    parser.add_argument("batch_dir", help="Folder holding the requests-*.jsonl shards")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    shards = sorted(os.path.join(args.batch_dir, name) for name in os.listdir(args.batch_dir)
+                    if name.startswith(request_file_prefix) and name.endswith(".jsonl"))
+    counts = fabricate_batch_results(shards, args.batch_dir, args.failure_rate, args.seed)
+    print(f"Fabricated {counts['answered']} answers and {counts['failed']} errors in {len(shards)} result files")
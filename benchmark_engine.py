@@ -0,0 +1,99 @@
+import os
+import argparse
+import tempfile
+import time
+from analysis_engine import AnalysisEngine, list_screenshot_jobs
+from fake_gemini import FakeGeminiBackend, fake_csv_row, fake_json_response
+from reference_cache import ReferenceCache
+from response_cache import ResponseCache
+from tweet_schema import parse_and_validate_json
+
+# Benchmark the serial Main_CSV.py loop against the async engine, using the
+# local fake backend so no API calls are made.
+
+parser = argparse.ArgumentParser(description="Benchmark serial vs async analysis against a fake Gemini backend.")
+parser.add_argument("--screenshots", type=int, default=40, help="Number of fake screenshots to process")
+parser.add_argument("--folders", type=int, default=2, help="Number of tweet_id folders to spread them over")
+parser.add_argument("--keys", type=int, default=4, help="Number of fake API keys")
+parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight per key")
+parser.add_argument("--upload-latency", type=float, default=0.05, help="Seconds per fake upload")
+parser.add_argument("--reference-cache", action="store_true", help="Upload the reference image once per key")
+parser.add_argument("--context-cache", action="store_true", help="Also keep prompt and reference in a cached context")
+parser.add_argument("--response-cache", action="store_true", help="Rerun the async pass against a warm response cache")
+parser.add_argument("--batch-size", type=int, default=1, help="Screenshots packed into each async request")
+parser.add_argument("--generate-latency", type=float, default=0.3, help="Seconds per fake generate call")
+parser.add_argument("--structured", action="store_true",
+                    help="Answer with schema-constrained JSON and validate it locally, as Main_CSV.py --structured does")
+args = parser.parse_args()
+if args.structured and args.batch_size > 1:
+    parser.error("--structured does not support --batch-size")
+
+def split_lines(text):
+    return text.strip().split("\n")
+
+parse_response = parse_and_validate_json if args.structured else split_lines
+
+def make_backend(index):
+    return FakeGeminiBackend(
+        key_name=f"GEMINI_API_KEY{index + 1}",
+        upload_latency=args.upload_latency,
+        generate_latency=args.generate_latency,
+        response_text=fake_json_response if args.structured else fake_csv_row
+    )
+
+with tempfile.TemporaryDirectory() as root:
+    # Build a fake Screenshots/trump/replies tree
+    reference_path = os.path.join(root, "Completeness.jpg")
+    open(reference_path, "wb").close()
+    for i in range(args.screenshots):
+        folder = os.path.join(root, "replies", f"18000000000000000{i % args.folders}")
+        os.makedirs(folder, exist_ok=True)
+        # Distinct bytes per screenshot, so the response cache only hits on a real repeat
+        with open(os.path.join(folder, f"screenshot_{i}.png"), "wb") as file:
+            file.write(f"{os.path.basename(folder)}/{i}".encode("ascii"))
+    jobs = list_screenshot_jobs(os.path.join(root, "replies"))
+
+    # Serial baseline: same calls as the Main_CSV.py loop, one at a time on one key
+    backend = make_backend(0)
+    start = time.perf_counter()
+    for tweet_id, file_name, file_path in jobs:
+        completeness_reference = backend.upload_file(reference_path)
+        file_reference = backend.upload_file(file_path)
+        response = backend.generate_content(["prompt", completeness_reference, file_reference])
+        parse_response(response.text)
+    serial_elapsed = time.perf_counter() - start
+
+    # Async engine over all keys
+    engine = AnalysisEngine(
+        [make_backend(i) for i in range(args.keys)],
+        prompt="prompt",
+        reference_path=reference_path,
+        parse_response=parse_response,
+        concurrency_per_key=args.concurrency,
+        reference_cache=ReferenceCache(reference_path) if args.reference_cache or args.context_cache else None,
+        use_context_cache=args.context_cache,
+        batch_size=args.batch_size
+    )
+    rows = []
+    stats = engine.run_sync(jobs, lambda result: rows.extend(result["rows"]))
+    async_uploads = sum(backend.upload_calls for backend in engine.backends.values())
+    async_requests = sum(backend.generate_calls for backend in engine.backends.values())
+
+    # Rerun over the unchanged corpus: every screenshot should be a cache hit
+    if args.response_cache:
+        engine.response_cache = ResponseCache(os.path.join(root, "cache.sqlite"))
+        engine.run_sync(jobs, lambda result: None)
+        calls_before = sum(backend.generate_calls for backend in engine.backends.values())
+        rerun_stats = engine.run_sync(jobs, lambda result: None)
+        rerun_calls = sum(backend.generate_calls for backend in engine.backends.values()) - calls_before
+        print(f"Cached rerun: {rerun_stats['elapsed']:.2f}s, {rerun_calls} API calls, {engine.response_cache.stats()}")
+        engine.response_cache.close()
+
+print(f"Screenshots: {len(jobs)}")
+print(f"Serial:  {serial_elapsed:.2f}s ({len(jobs) / serial_elapsed:.1f} screenshots/s)")
+print(f"Async:   {stats['elapsed']:.2f}s ({len(jobs) / stats['elapsed']:.1f} screenshots/s) "
+      f"with {args.keys} keys x {args.concurrency} in flight")
+print(f"Uploads: {backend.upload_calls} serial, {async_uploads} async")
+print(f"Requests: {backend.generate_calls} serial, {async_requests} async")
+print(f"Rows:    {len(rows)} parsed from the async pass")
+print(f"Speedup: {serial_elapsed / stats['elapsed']:.1f}x")
@@ -0,0 +1,153 @@
+import os
+import glob
+import time
+import zlib
+import random
+from io import BytesIO
+from PIL import Image, ImageDraw
+
+# Capture drivers used by Screenshots.py. A driver is one browser session with
+# these methods:
+#   open(url)           start loading a page
+#   screenshot_png()    the current viewport as PNG bytes
+#   scroll_down()       scroll by one screen (PAGE_DOWN)
+#   scroll_position()   how far the page is scrolled, in pixels
+#   scroll_height()     total height of the page content, in pixels (0 while loading)
+#   close()             end the session
+# open and scroll_down return straight away; the capture loop polls the last
+# three methods to tell when the page is ready and when it has stopped changing.
+# EdgeCaptureDriver drives Microsoft Edge through Selenium. FakeCaptureDriver
+# replays local image fixtures (or generated frames), so the capture scheduler
+# and its throughput can be exercised without a browser or a network.
+
+# Path to Edge WebDriver, as in the Readme
+default_edge_driver_path = '../Computational Social Science/edgedriver_win64/msedgedriver.exe'
+
+
+class EdgeCaptureDriver:
+    # profile_dir: the browser's user data directory. Every session in a pool
+    #   needs its own, since Edge locks a profile to one process; log in to X
+    #   once in each profile before a run.
+    def __init__(self, driver_path=default_edge_driver_path, profile_dir=None, profile_directory="Default",
+                 headless=False, window_size=(1920, 1080)):
+        # Selenium is only needed when a real browser is used
+        from selenium import webdriver
+        from selenium.webdriver.edge.service import Service
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        self._by = By
+        self._keys = Keys
+
+        edge_options = webdriver.EdgeOptions()
+        if profile_dir is not None:
+            edge_options.add_argument(f"user-data-dir={profile_dir}")
+            edge_options.add_argument(f"profile-directory={profile_directory}")
+        edge_options.add_argument("disable-gpu")
+        edge_options.add_argument("no-sandbox")
+        if headless:
+            edge_options.add_argument("headless=new")
+            edge_options.add_argument(f"window-size={window_size[0]},{window_size[1]}")
+
+        self.driver = webdriver.Edge(service=Service(driver_path), options=edge_options)
+        if not headless:
+            self.driver.maximize_window()  # Open browser in full-screen mode
+
+    def open(self, url):
+        self.driver.get(url)
+
+    def screenshot_png(self):
+        return self.driver.get_screenshot_as_png()
+
+    def scroll_down(self):
+        self.driver.find_element(self._by.TAG_NAME, 'body').send_keys(self._keys.PAGE_DOWN)
+
+    def scroll_position(self):
+        return self.driver.execute_script("return window.scrollY")
+
+    def scroll_height(self):
+        return self.driver.execute_script("return document.documentElement.scrollHeight")
+
+    def close(self):
+        self.driver.quit()
+
+
+# Stand-in browser that replays fixtures. Each page is frames_per_page screens
+# long: scrolling moves to the next frame until the last one, after which the
+# page has bottomed out and stops moving. Like a real page, content renders in
+# the background: for load_latency after open the page is blank with no height,
+# and for scroll_latency after a scroll the previous frame is still on screen.
+class FakeCaptureDriver:
+    def __init__(self, fixtures_dir=None, frames_per_page=12, load_latency=0.0, scroll_latency=0.0,
+                 frame_size=(480, 270)):
+        self.fixtures = sorted(glob.glob(os.path.join(fixtures_dir, "*.png"))) if fixtures_dir else []
+        self.frames_per_page = len(self.fixtures) if self.fixtures else frames_per_page
+        self.load_latency = load_latency
+        self.scroll_latency = scroll_latency
+        self.frame_size = frame_size
+        self.url = None
+        self.position = 0
+        self.loaded_at = 0.0
+        self.rendered_at = 0.0
+        self.opens = 0
+        self.screenshots = 0
+
+    def open(self, url):
+        self.url = url
+        self.position = 0
+        self.loaded_at = time.monotonic() + self.load_latency
+        self.rendered_at = self.loaded_at
+        self.opens += 1
+
+    # PNG for frame `index` of the page; -1 is the blank page shown while loading
+    def _frame_png(self, index):
+        if self.fixtures and index >= 0:
+            with open(self.fixtures[index], "rb") as file:
+                return file.read()
+        image = Image.new("RGB", self.frame_size, (255, 255, 255))
+        if index >= 0:
+            # Generated frame: a different pattern for every page and position
+            pattern = random.Random(zlib.crc32(f"{self.url}#{index}".encode("utf-8")))
+            draw = ImageDraw.Draw(image)
+            for _ in range(12):
+                top = pattern.randrange(self.frame_size[1])
+                draw.rectangle((20, top, pattern.randrange(40, self.frame_size[0]), top + 8), fill=(0, 0, 0))
+        buffer = BytesIO()
+        image.save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def screenshot_png(self):
+        self.screenshots += 1
+        now = time.monotonic()
+        if now < self.loaded_at:
+            return self._frame_png(-1)
+        if now < self.rendered_at:
+            return self._frame_png(self.position - 1)
+        return self._frame_png(self.position)
+
+    def scroll_down(self):
+        if self.position < self.frames_per_page - 1:
+            self.position += 1
+            self.rendered_at = time.monotonic() + self.scroll_latency
+
+    def scroll_position(self):
+        return self.position * self.frame_size[1]
+
+    def scroll_height(self):
+        if time.monotonic() < self.loaded_at:
+            return 0
+        return self.frames_per_page * self.frame_size[1]
+
+    def close(self):
+        self.url = None
+
+
+# Function to create a driver for pool slot `slot` (0, 1, ...).
+# Each slot gets its own profile directory under profile_root.
+def make_driver(kind, slot, profile_root=None, **options):
+    if kind == "fake":
+        return FakeCaptureDriver(**options)
+    if kind == "edge":
+        if profile_root:
+            options["profile_dir"] = os.path.abspath(os.path.join(profile_root, f"profile_{slot}"))
+        return EdgeCaptureDriver(**options)
+    raise ValueError(f"Unknown capture driver: {kind}")
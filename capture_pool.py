@@ -0,0 +1,200 @@
+import os
+import csv
+import time
+import multiprocessing
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor
+from frame_writer import make_frame_writer
+
+# Screenshot capture for one tweet link, and a pool that spreads links over N
+# independent browser sessions in worker processes. Each worker process owns one
+# driver (see capture_drivers.py) for its whole life, with its own profile
+# directory, and takes the next link as soon as it finishes the previous one.
+# Frames are saved by a FrameWriter thread (see frame_writer.py), so disk writes
+# overlap with scrolling.
+
+# Function to get the folder name for a tweet link (its status id)
+def link_id(tweet_link):
+    return tweet_link.rstrip('/').split('/')[-1]
+
+# Function to read the tweet links from the first column of a CSV file
+def read_links(tweet_csv_path):
+    with open(tweet_csv_path, mode='r', newline='', encoding='utf-8') as file:
+        return [row[0] for row in csv.reader(file) if row]
+
+# Function to wait until the page has loaded: its scroll height is non-zero
+# and unchanged between two polls. Returns False if timeout passes first.
+def wait_for_page(driver, timeout, poll_interval):
+    deadline = time.monotonic() + timeout
+    last_height = None
+    while time.monotonic() < deadline:
+        height = driver.scroll_height()
+        if height and height == last_height:
+            return True
+        last_height = height
+        time.sleep(poll_interval)
+    return False
+
+# Function to wait for the next frame to be ready: different from previous_frame
+# and identical on two polls in a row, so it is not caught mid-render.
+# Gives up after timeout, or after end_grace if the page has not moved from
+# (position, height) at all, and returns whatever is on screen then.
+def wait_for_frame(driver, previous_frame, timeout, poll_interval, position=None, height=None, end_grace=1.0):
+    start = time.monotonic()
+    last_frame = None
+    while True:
+        frame = driver.screenshot_png()
+        waited = time.monotonic() - start
+        if frame != previous_frame and frame == last_frame:
+            return frame
+        if waited >= timeout:
+            return frame
+        if (position is not None and waited >= end_grace
+                and driver.scroll_position() == position and driver.scroll_height() == height):
+            return frame  # The scroll did not move the page: nothing more to load
+        last_frame = frame
+        time.sleep(poll_interval)
+
+# Function to capture screenshots while scrolling through the tweet page.
+# Instead of fixed sleeps it waits for readiness signals (see wait_for_page and
+# wait_for_frame), each bounded by a timeout. Capture stops at max_screenshots,
+# or once end_after scrolls in a row leave the page where it was (end of thread).
+# controls: optional object with is_paused / is_stopped flags (keyboard controls).
+# writer: FrameWriter to save frames with; without one a writer is made for this link.
+# Returns a dict with the link, frames captured, elapsed seconds and any error,
+# plus each frame's capture latency (from opening or scrolling until the frame
+# is queued) and the deepest writer queue seen.
+def capture_screenshots(driver, tweet_link, save_dir, max_screenshots=200, load_timeout=15.0, scroll_timeout=4.0,
+                        poll_interval=0.25, end_after=2, controls=None, writer=None):
+    print(f"Processing: {tweet_link}")
+    start = time.perf_counter()
+    result = {"link": tweet_link, "save_dir": save_dir, "frames": 0, "error": None, "reached_end": False,
+              "frame_latencies": [], "max_queue_depth": 0}
+
+    # Validate that the tweet_link starts with "http"
+    if not tweet_link.startswith("http"):
+        print(f"Invalid URL: {tweet_link}")
+        result["error"] = "invalid URL"
+        result["seconds"] = 0.0
+        return result
+
+    own_writer = writer is None
+    if own_writer:
+        writer = make_frame_writer()
+    try:
+        os.makedirs(save_dir, exist_ok=True)
+
+        # Open the tweet link and wait for the tweet page to load
+        requested = time.perf_counter()
+        driver.open(tweet_link)
+        if not wait_for_page(driver, load_timeout, poll_interval):
+            print(f"Page did not settle within {load_timeout}s; capturing anyway")
+        frame = wait_for_frame(driver, None, scroll_timeout, poll_interval)
+
+        screenshot_count = 0
+        last_saved = None
+        unmoved_scrolls = 0
+        while screenshot_count < max_screenshots:
+            if controls is not None and controls.is_stopped:
+                print("Stopped by user.")
+                break
+
+            if controls is not None and controls.is_paused:
+                time.sleep(1)
+                continue
+
+            # Queue the current frame for saving if it shows something new
+            if frame is not None and frame != last_saved:
+                screenshot_filename = os.path.join(save_dir, f"screenshot_{screenshot_count}.png")
+                depth = writer.put(screenshot_filename, frame)
+                result["frame_latencies"].append(time.perf_counter() - requested)
+                result["max_queue_depth"] = max(result["max_queue_depth"], depth)
+                last_saved = frame
+                screenshot_count += 1
+                print(f"Captured screenshot {screenshot_count} of {link_id(tweet_link)}")
+
+            # Scroll down the page and wait for new content to render
+            position = driver.scroll_position()
+            height = driver.scroll_height()
+            requested = time.perf_counter()
+            driver.scroll_down()
+            frame = wait_for_frame(driver, last_saved, scroll_timeout, poll_interval, position, height)
+
+            if driver.scroll_position() == position and driver.scroll_height() == height:
+                unmoved_scrolls += 1
+                if unmoved_scrolls >= end_after:
+                    print(f"Reached the end of {link_id(tweet_link)} after {screenshot_count} screenshots")
+                    result["reached_end"] = True
+                    break
+            else:
+                unmoved_scrolls = 0
+
+        result["frames"] = screenshot_count
+
+    except Exception as e:
+        print(f"Error processing {tweet_link}: {e}")
+        result["error"] = str(e)
+    finally:
+        if own_writer:
+            writer.close()
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+# State of a pool worker process: its driver, frame writer and the capture options
+_worker = {}
+
+def _init_worker(driver_factory, slots, capture_options, writer_options):
+    slot = slots.get()
+    driver = driver_factory(slot)
+    writer = make_frame_writer(**writer_options)
+    _worker.update(driver=driver, writer=writer, slot=slot, options=capture_options)
+    # When the pool shuts the process down, finish writing frames, then close the browser
+    Finalize(writer, writer.close, exitpriority=20)
+    Finalize(driver, driver.close, exitpriority=10)
+
+def _capture_job(job):
+    tweet_link, save_dir = job
+    result = capture_screenshots(_worker["driver"], tweet_link, save_dir, writer=_worker["writer"],
+                                 **_worker["options"])
+    result["slot"] = _worker["slot"]
+    return result
+
+# Function to capture every link across `workers` browser sessions.
+# driver_factory(slot) creates the driver for one session and must be picklable
+# (e.g. functools.partial(make_driver, "edge", profile_root=...)).
+# writer_options: arguments for each worker's make_frame_writer (max_queued, transforms).
+# Returns (list of per-link results in link order, elapsed seconds).
+def capture_links(links, base_screenshots_dir, driver_factory, workers=2, writer_options=None, **capture_options):
+    jobs = [(link, os.path.join(base_screenshots_dir, 'replies', link_id(link))) for link in links]
+    context = multiprocessing.get_context()
+    start = time.perf_counter()
+    with context.Manager() as manager:
+        # Every worker process takes one slot number, which picks its profile directory
+        slots = manager.Queue()
+        for slot in range(workers):
+            slots.put(slot)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(driver_factory, slots, capture_options, writer_options or {})) as executor:
+            results = list(executor.map(_capture_job, jobs))
+    return results, time.perf_counter() - start
+
+# Function to print per-session and overall capture throughput
+def report(results, elapsed):
+    frames = sum(result["frames"] for result in results)
+    failed = [result for result in results if result["error"]]
+    sessions = {}
+    for result in results:
+        sessions.setdefault(result.get("slot", 0), []).append(result)
+    for slot, session_results in sorted(sessions.items()):
+        busy = sum(result["seconds"] for result in session_results)
+        print(f"Session {slot}: {len(session_results)} links, "
+              f"{sum(result['frames'] for result in session_results)} frames, {busy:.1f}s busy")
+    print(f"Captured {frames} frames from {len(results)} links in {elapsed:.1f}s "
+          f"({len(results) / elapsed:.2f} links/s, {frames / elapsed:.1f} frames/s), {len(failed)} failed")
+    latencies = sorted(latency for result in results for latency in result.get("frame_latencies", []))
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"Frame latency: mean {sum(latencies) / len(latencies):.3f}s, p95 {p95:.3f}s; "
+              f"deepest writer queue {max(result.get('max_queue_depth', 0) for result in results)}")
@@ -0,0 +1,132 @@
+import re
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+# Perceptual-hash deduplication of captured screenshots.
+#
+# Once a page bottoms out, Screenshots.py keeps saving the same frame, and
+# consecutive frames can be near-identical. Each frame is reduced to a 64-bit
+# perceptual hash (dHash or pHash over a downscaled grayscale image). Frames
+# whose hash is within `threshold` bits of an earlier kept frame from the same
+# tweet are dropped before they cost a Gemini call. Frames that only partly
+# overlap hash differently and are kept; their repeated tweets are merged later
+# at the record level.
+
+hash_size = 8
+
+# Number of set bits in every byte value, for vectorized Hamming distances
+popcount_table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Function to order screenshot_N.png files by N rather than alphabetically
+def screenshot_number(file_name):
+    match = re.search(r"(\d+)", file_name)
+    return int(match.group(1)) if match else -1
+
+# Function to load a screenshot as a small grayscale array
+def load_grayscale(path, size):
+    with Image.open(path) as image:
+        return np.asarray(image.convert("L").resize(size, Image.BILINEAR), dtype=np.float32)
+
+def _load_for_dhash(path):
+    return load_grayscale(path, (hash_size + 1, hash_size))
+
+def _load_for_phash(path):
+    return load_grayscale(path, (hash_size * 4, hash_size * 4))
+
+# dHash: is each pixel brighter than its right-hand neighbour? images: (n, 8, 9)
+def dhash_bits(images):
+    return (images[:, :, 1:] > images[:, :, :-1]).reshape(len(images), -1)
+
+# Orthonormal DCT-II matrix of size n
+def dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+# pHash: low-frequency DCT coefficients compared to their median. images: (n, 32, 32)
+def phash_bits(images):
+    dct = dct_matrix(images.shape[1])
+    coefficients = np.einsum("ij,njk,lk->nil", dct, images, dct)[:, :hash_size, :hash_size]
+    coefficients = coefficients.reshape(len(images), -1)
+    return coefficients > np.median(coefficients[:, 1:], axis=1, keepdims=True)
+
+# Function to hash many screenshots; returns an (n, 8) uint8 array of packed 64-bit hashes
+def hash_screenshots(paths, method="dhash", executor=None):
+    loader = _load_for_dhash if method == "dhash" else _load_for_phash
+    if not paths:
+        return np.zeros((0, hash_size * hash_size // 8), dtype=np.uint8)
+    if executor is not None:
+        images = np.stack(list(executor.map(loader, paths, chunksize=32)))
+    else:
+        images = np.stack([loader(path) for path in paths])
+    bits = dhash_bits(images) if method == "dhash" else phash_bits(images)
+    return np.packbits(bits, axis=1)
+
+# Hamming distances from one packed hash to many: (8,), (n, 8) -> (n,)
+def hamming_distances(target, hashes):
+    return popcount_table[hashes ^ target].sum(axis=1, dtype=np.int32)
+
+# Function to pick the frames to keep, in capture order. A frame is dropped when
+# it is within threshold bits of a frame already kept.
+# Returns (kept indices, {dropped index: index it duplicates}).
+def select_unique(hashes, threshold):
+    kept = []
+    dropped = {}
+    for index in range(len(hashes)):
+        if kept:
+            distances = hamming_distances(hashes[index], hashes[kept])
+            nearest = int(np.argmin(distances))
+            if distances[nearest] <= threshold:
+                dropped[index] = kept[nearest]
+                continue
+        kept.append(index)
+    return kept, dropped
+
+# Function to deduplicate (tweet_id, file_name, file_path) jobs within each tweet_id.
+# Returns (kept jobs, list of (dropped job, job it duplicates)).
+# Images are decoded on a thread pool (Pillow releases the GIL while decoding and
+# resizing), which also keeps this safe to call from scripts without a __main__ guard.
+def dedupe_jobs(jobs, threshold=4, method="dhash", workers=None):
+    by_tweet = defaultdict(list)
+    for job in jobs:
+        by_tweet[job[0]].append(job)
+
+    kept_jobs = []
+    dropped_jobs = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for tweet_id, tweet_jobs in by_tweet.items():
+            tweet_jobs.sort(key=lambda job: screenshot_number(job[1]))
+            hashes = hash_screenshots([job[2] for job in tweet_jobs], method, executor)
+            kept, dropped = select_unique(hashes, threshold)
+            kept_jobs.extend(tweet_jobs[index] for index in kept)
+            dropped_jobs.extend((tweet_jobs[index], tweet_jobs[original]) for index, original in dropped.items())
+    return kept_jobs, dropped_jobs
+
+# Function to print how many API calls deduplication saves
+def report(kept_jobs, dropped_jobs):
+    total = len(kept_jobs) + len(dropped_jobs)
+    saved = len(dropped_jobs)
+    share = saved / total if total else 0.0
+    print(f"Deduplication kept {len(kept_jobs)} of {total} screenshots, saving {saved} API calls ({share:.0%})")
+
+
+if __name__ == "__main__":
+    from analysis_engine import list_screenshot_jobs
+
+    parser = argparse.ArgumentParser(description="Find duplicate screenshots with perceptual hashes.")
+    parser.add_argument("--root", default="Screenshots/trump/replies", help="Folder holding one sub-folder per tweet_id")
+    parser.add_argument("--threshold", type=int, default=4, help="Maximum Hamming distance (out of 64 bits) for a duplicate")
+    parser.add_argument("--method", choices=["dhash", "phash"], default="dhash")
+    parser.add_argument("--verbose", action="store_true", help="List every dropped screenshot")
+    args = parser.parse_args()
+
+    kept_jobs, dropped_jobs = dedupe_jobs(list_screenshot_jobs(args.root), args.threshold, args.method)
+    if args.verbose:
+        for (tweet_id, file_name, _), (_, original, _) in dropped_jobs:
+            print(f"{tweet_id}/{file_name} duplicates {original}")
+    report(kept_jobs, dropped_jobs)
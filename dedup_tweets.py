@@ -0,0 +1,196 @@
+import re
+import zlib
+import argparse
+import unicodedata
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from dedup_screenshots import screenshot_number
+
+# Record-level deduplication of extracted tweets.
+#
+# Consecutive PAGE_DOWN frames overlap, so the same reply is extracted from
+# several screenshots and shows up as several rows. Within each tweet_id, rows
+# with the same normalized username and text_body are merged first (an exact
+# hash match). The rows left over are compared by MinHash signatures of their
+# text's character shingles, bucketed with LSH bands, so OCR noise ("RT" vs
+# "Rt", a dropped emoji, a cut-off last word) still matches. Each row is only
+# compared with rows that share a band bucket, so the work grows linearly with
+# the number of rows.
+#
+# Merged rows keep the highest engagement counts seen (counts only grow while
+# the capture runs, and a partly hidden tweet reads low), the mean of the
+# numeric scores, and the longest text of each text field. A flag such as
+# promotional_or_irrelevant is set if any copy has it set.
+
+count_columns = ["likes", "replies", "retweets", "views"]
+
+# Yes/no fields; they may be read as text ("true", "False") when a value is missing
+flag_columns = ["promotional_or_irrelevant"]
+
+shingle_size = 3
+num_permutations = 32
+band_rows = 4
+
+# Fixed seeds so signatures, and therefore results, are the same on every run
+_mersenne_prime = (1 << 31) - 1
+_permutations = np.random.default_rng(20241030).integers(1, _mersenne_prime, size=(2, num_permutations),
+                                                          dtype=np.uint64)
+
+# Function to normalize tweet text for comparison: lowercase, no punctuation or extra spaces
+def normalize_text(text):
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"https?://\S+", " ", text)
+    return " ".join(re.findall(r"\w+", text))
+
+# Function to normalize a username: lowercase, without the @ or surrounding punctuation
+def normalize_username(username):
+    if not isinstance(username, str):
+        return ""
+    return re.sub(r"[^\w]", "", unicodedata.normalize("NFKC", username).lower())
+
+# Function to compute the MinHash signature of a text's character shingles
+def minhash_signature(text):
+    shingles = {text[i:i + shingle_size] for i in range(max(1, len(text) - shingle_size + 1))}
+    hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+    # (a * h + b) mod p for every permutation and shingle; the minimum per permutation
+    a, b = _permutations
+    permuted = (np.outer(a, hashes) + b[:, None]) % _mersenne_prime
+    return permuted.min(axis=1)
+
+
+# Function to read a flag column as True, False or missing
+def parse_flags(column):
+    if pd.api.types.is_bool_dtype(column):
+        return column.astype(object)
+    words = column.astype(str).str.strip().str.lower()
+    return words.map({"true": True, "1": True, "1.0": True, "yes": True,
+                      "false": False, "0": False, "0.0": False, "no": False}).where(column.notna())
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, index):
+        while self.parent[index] != index:
+            self.parent[index] = self.parent[self.parent[index]]
+            index = self.parent[index]
+        return index
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            # The earlier row stays the representative
+            self.parent[max(first, second)] = min(first, second)
+
+
+# Function to assign every row a group number; rows in the same group are one tweet.
+# threshold: estimated Jaccard similarity of text shingles needed for a fuzzy match.
+def duplicate_groups(frame, threshold=0.7):
+    tweet_ids = frame["tweet_id"].astype(str).to_numpy()
+    usernames = frame["username"].map(normalize_username).to_numpy()
+    texts = frame["text_body"].map(normalize_text).to_numpy()
+    groups = UnionFind(len(frame))
+
+    # Exact matches: same tweet_id, username and text. A row with no readable
+    # text says nothing about which tweet it is, so it is never matched.
+    first_seen = {}
+    for index, key in enumerate(zip(tweet_ids, usernames, texts)):
+        if not texts[index]:
+            continue
+        if key in first_seen:
+            groups.union(first_seen[key], index)
+        else:
+            first_seen[key] = index
+
+    # Fuzzy matches among the distinct texts, through LSH band buckets
+    representatives = [index for index in first_seen.values() if len(texts[index]) >= shingle_size]
+    signatures = {index: minhash_signature(texts[index]) for index in representatives}
+    buckets = defaultdict(list)
+    for index in representatives:
+        signature = signatures[index]
+        for band in range(num_permutations // band_rows):
+            band_key = signature[band * band_rows:(band + 1) * band_rows].tobytes()
+            buckets[(tweet_ids[index], band, band_key)].append(index)
+
+    for candidates in buckets.values():
+        for position, index in enumerate(candidates):
+            for other in candidates[:position]:
+                if groups.find(index) == groups.find(other):
+                    continue
+                # An unread username matches anyone; two read ones must agree
+                if usernames[index] and usernames[other] and usernames[index] != usernames[other]:
+                    continue
+                if np.mean(signatures[index] == signatures[other]) >= threshold:
+                    groups.union(other, index)
+
+    return np.array([groups.find(index) for index in range(len(frame))])
+
+# Function to merge each group of duplicate rows into one row.
+# Returns the deduplicated DataFrame (first-seen order) with a `copies` column.
+def merge_duplicates(frame, group_ids):
+    frame = frame.assign(_group=group_ids)
+    grouped = frame.groupby("_group", sort=False)
+
+    counts = [column for column in count_columns if column in frame]
+    flags = [column for column in frame.columns
+             if column in flag_columns or pd.api.types.is_bool_dtype(frame[column])]
+    numeric = [column for column in frame.select_dtypes("number").columns
+               if column not in counts and column not in flags and column not in ("_group", "tweet_id")]
+    text = [column for column in frame.columns if column not in counts and column not in numeric
+            and column not in flags and column not in ("_group", "tweet_id", "file_name")]
+
+    merged = grouped[["tweet_id", "file_name"]].first()
+    for column in counts:
+        merged[column] = grouped[column].max()
+    for column in numeric:
+        merged[column] = grouped[column].max() if column == "completeness" else grouped[column].mean()
+    for column in flags:
+        values = parse_flags(frame[column])
+        # Set if any copy says so; missing only if no copy was read
+        flagged = values.fillna(False).astype(bool).groupby(frame["_group"], sort=False).any()
+        known = values.notna().groupby(frame["_group"], sort=False).any()
+        merged[column] = flagged.astype(object).where(known)
+    # The longest version of each text field is the least truncated one
+    lengths = frame[text].apply(lambda column: column.fillna("").astype(str).str.len())
+    for column in text:
+        longest = lengths[column].groupby(frame["_group"], sort=False).idxmax()
+        merged[column] = frame.loc[longest.to_numpy(), column].to_numpy()
+    merged["copies"] = grouped.size()
+    return merged[[column for column in frame.columns if column != "_group"] + ["copies"]].reset_index(drop=True)
+
+# Function to deduplicate extracted tweet rows. Rows are taken in capture order
+# (screenshot_N by N) so each merged tweet keeps the frame it first appeared in.
+# Returns (deduplicated DataFrame, number of rows merged away).
+def dedupe_rows(frame, threshold=0.7):
+    frame = frame.dropna(how="all").copy()
+    order = frame["file_name"].map(screenshot_number)
+    frame = frame.iloc[np.lexsort((order.to_numpy(), frame["tweet_id"].astype(str).to_numpy()))]
+    frame = frame.reset_index(drop=True)
+    merged = merge_duplicates(frame, duplicate_groups(frame, threshold))
+    return merged, len(frame) - len(merged)
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Merge tweets extracted from several overlapping screenshots.")
+    parser.add_argument("--input", default="twitter_analysis_results.csv",
+                        help="Extracted rows, e.g. twitter_analysis_results.csv or trump_sentiment.csv")
+    parser.add_argument("--output", default="twitter_analysis_results_dedup.csv")
+    parser.add_argument("--threshold", type=float, default=0.7,
+                        help="Estimated text similarity (0-1) for two rows of the same tweet_id to be merged")
+    args = parser.parse_args()
+
+    # tweet_id is a 19-digit id: read it as text so it is not rounded
+    rows = pd.read_csv(args.input, dtype={"tweet_id": str})
+    start = time.perf_counter()
+    deduplicated, merged_away = dedupe_rows(rows, args.threshold)
+    elapsed = time.perf_counter() - start
+    deduplicated.to_csv(args.output, index=False)
+    print(f"Kept {len(deduplicated)} of {len(deduplicated) + merged_away} rows "
+          f"({merged_away} duplicates merged) in {elapsed:.2f}s")
+    print(f"Deduplicated rows saved to {args.output}")
@@ -0,0 +1,290 @@
+import io
+import os
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Streaming DataFrame.describe() for CSVs larger than memory.
+#
+# Each CSV is split into byte ranges at row boundaries (a newline outside any
+# quoted field, so multi-line tweet texts stay whole). Worker processes parse
+# their ranges in chunks and build partial summaries per numeric column: count,
+# mean and M2 (combined with Chan et al.'s parallel Welford update), min, max,
+# and a KLL quantile sketch for the 25/50/75% quantiles. Partials merge
+# exactly for the moments and within the tracked error bound for the quantiles.
+#
+# A KLL sketch keeps levels of sorted values; a value on level h stands for 2^h
+# input values. When a level fills up, it is sorted and every other value (from
+# a random start) moves up a level. Each such compaction moves any rank by at
+# most 2^h, up or down with equal probability, so the sketch tracks both the
+# worst-case rank error (the sum of 2^h) and a 99% bound from Hoeffding's
+# inequality (3.26 * sqrt of the sum of 4^h). Until its first compaction a
+# sketch holds every value and its quantiles are exact, interpolated like pandas.
+
+quantiles = (0.25, 0.5, 0.75)
+
+default_sketch_size = 200
+default_range_bytes = 32 << 20
+default_chunk_rows = 100_000
+
+# sqrt(2 ln(2 / 0.01)): Hoeffding's multiplier for a 99% two-sided bound
+_confidence_factor = math.sqrt(2 * math.log(200))
+
+
+# Mergeable KLL quantile sketch
+class QuantileSketch:
+    def __init__(self, k=default_sketch_size, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.max_rank_error = 0.0  # sum of 2^h over compactions
+        self.rank_variance = 0.0   # sum of 4^h over compactions
+        self.rng = np.random.default_rng(seed)
+
+    # Capacity of level h: the top level holds k values, lower ones 2/3 as many as the next
+    def capacity(self, level):
+        return max(2, int(math.ceil(self.k * (2 / 3) ** (len(self.levels) - level - 1))))
+
+    # Function to add an array of (finite) values
+    def update(self, values):
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.count += len(values)
+            self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) < self.capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            values = np.sort(self.levels[level])
+            # An odd value out stays on this level
+            keep = values[-1:] if len(values) % 2 else values[:0]
+            values = values[:len(values) - len(keep)]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1],
+                                                     values[self.rng.integers(2)::2]])
+            self.levels[level] = keep
+            self.max_rank_error += 2.0 ** level
+            self.rank_variance += 4.0 ** level
+            # Capacities shrink when a level is added, so start over from the bottom
+            level = 0
+
+    # Function to merge another sketch into this one
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, values in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.count += other.count
+        self.max_rank_error += other.max_rank_error
+        self.rank_variance += other.rank_variance
+        self._compress()
+
+    # Rank error bound, in values: worst case or with 99% confidence
+    def rank_error(self, worst_case=False):
+        if worst_case:
+            return self.max_rank_error
+        return min(self.max_rank_error, _confidence_factor * math.sqrt(self.rank_variance))
+
+    def _weighted_values(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(values), 2.0 ** level) for level, values in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    # Function to estimate the value at 0-based rank `rank` (of count values)
+    def value_at_rank(self, rank):
+        values, cumulative = self._weighted_values()
+        position = np.searchsorted(cumulative, min(max(rank, 0), self.count - 1), side="right")
+        return values[min(position, len(values) - 1)]
+
+    # Function to estimate quantile q, interpolating like pandas when still exact
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        if self.max_rank_error == 0:
+            return float(np.quantile(self.levels[0], q))
+        return float(self.value_at_rank(q * (self.count - 1)))
+
+    # Function to bound quantile q: (low, high) values within the 99% rank error
+    def quantile_bounds(self, q):
+        if self.count == 0:
+            return np.nan, np.nan
+        if self.max_rank_error == 0:
+            return self.quantile(q), self.quantile(q)
+        rank, error = q * (self.count - 1), self.rank_error()
+        return float(self.value_at_rank(rank - error)), float(self.value_at_rank(rank + error))
+
+
+# Mergeable summary of one numeric column
+class ColumnSummary:
+    def __init__(self, sketch_size=default_sketch_size, seed=0):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(sketch_size, seed)
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        mean = values.mean()
+        self._combine(len(values), mean, ((values - mean) ** 2).sum())
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.sketch.update(values)
+
+    # Chan et al.'s update of count, mean and M2
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    # Function to list the statistics in DataFrame.describe() order
+    def describe(self):
+        if not self.count:
+            return [0.0] + [np.nan] * (4 + len(quantiles))
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+        return ([float(self.count), self.mean, std, self.min]
+                + [self.sketch.quantile(q) for q in quantiles] + [self.max])
+
+
+# Partial summary of a set of rows: a ColumnSummary per column. Columns that are
+# not numeric in some chunk are dropped at the end, as describe() drops them.
+class Summary:
+    def __init__(self, sketch_size=default_sketch_size, seed=0):
+        self.sketch_size = sketch_size
+        self.seed = seed
+        self.columns = {}
+        self.non_numeric = set()
+
+    # Function to add a parsed chunk of rows
+    def add_frame(self, frame):
+        for name in frame.columns:
+            column = frame[name]
+            if name not in self.columns:
+                self.columns[name] = ColumnSummary(self.sketch_size, self.seed + len(self.columns))
+            if name in self.non_numeric:
+                continue
+            if pd.api.types.is_bool_dtype(column) or not (pd.api.types.is_numeric_dtype(column)
+                                                          or column.isna().all()):
+                self.non_numeric.add(name)
+                continue
+            self.columns[name].update(column.to_numpy(dtype=float, na_value=np.nan))
+
+    def merge(self, other):
+        for name, column in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(column)
+            else:
+                self.columns[name] = column
+        self.non_numeric |= other.non_numeric
+
+    def numeric_columns(self):
+        return [name for name in self.columns if name not in self.non_numeric]
+
+    # Function to build the describe() table: count, mean, std, min, 25%, 50%, 75%, max
+    def describe(self):
+        index = ["count", "mean", "std", "min"] + [f"{q:.0%}" for q in quantiles] + ["max"]
+        return pd.DataFrame({name: self.columns[name].describe() for name in self.numeric_columns()},
+                            index=index)
+
+    # Function to build the quantile error table. rank_error is the 99% bound on
+    # the rank of each quantile as a fraction of the count, rank_error_max the
+    # worst case; "<q> low"/"<q> high" bracket the true quantile with 99% confidence.
+    def error_bounds(self):
+        rows = {}
+        for name in self.numeric_columns():
+            column = self.columns[name]
+            sketch = column.sketch
+            count = max(column.count, 1)
+            row = {"rank_error": sketch.rank_error() / count,
+                   "rank_error_max": sketch.rank_error(worst_case=True) / count}
+            for q in quantiles:
+                row[f"{q:.0%} low"], row[f"{q:.0%} high"] = sketch.quantile_bounds(q)
+            rows[name] = row
+        return pd.DataFrame(rows)
+
+
+# Function to split a CSV into byte ranges of about range_bytes that end at row
+# boundaries. A newline only ends a row outside quotes; quotes are counted from
+# the start of the file ("" escapes count twice, so they do not flip the state).
+# Returns (header line, [(start, end), ...]).
+def split_ranges(path, range_bytes=default_range_bytes):
+    ranges = []
+    with open(path, "rb") as file:
+        header = file.readline()
+        start = position = file.tell()
+        target = start + range_bytes
+        in_quotes = False
+        for block in iter(lambda: file.read(1 << 20), b""):
+            offset = 0  # quotes before this point in the block are already counted
+            while position + len(block) > target:
+                newline = block.find(b"\n", max(offset, target - position))
+                if newline < 0:
+                    break
+                in_quotes ^= block.count(b'"', offset, newline) % 2 == 1
+                offset = newline
+                end = position + newline + 1
+                if not in_quotes:
+                    ranges.append((start, end))
+                    start = end
+                    target = start + range_bytes
+                else:
+                    target = end
+            in_quotes ^= block.count(b'"', offset) % 2 == 1
+            position += len(block)
+    if start < position:
+        ranges.append((start, position))
+    return header, ranges
+
+# Worker: summarize one byte range of a CSV in chunks of chunk_rows rows
+def summarize_range(job):
+    path, header, start, end, chunk_rows, sketch_size, seed = job
+    with open(path, "rb") as file:
+        file.seek(start)
+        rows = file.read(end - start)
+    summary = Summary(sketch_size, seed)
+    for chunk in pd.read_csv(io.BytesIO(header + rows), chunksize=chunk_rows):
+        summary.add_frame(chunk)
+    return summary
+
+# Function to summarize CSVs over a process pool. Returns (Summary, stats).
+def describe_csvs(paths, workers=None, range_bytes=default_range_bytes, chunk_rows=default_chunk_rows,
+                  sketch_size=default_sketch_size):
+    start = time.perf_counter()
+    jobs = []
+    for path in paths:
+        header, ranges = split_ranges(path, range_bytes)
+        for range_start, range_end in ranges:
+            # Each range gets its own seeds, so results do not depend on scheduling
+            jobs.append((path, header, range_start, range_end, chunk_rows, sketch_size, len(jobs) * 1000))
+
+    summary = Summary(sketch_size)
+    if len(jobs) <= 1 or workers == 1:
+        for partial in map(summarize_range, jobs):
+            summary.merge(partial)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Merged in file order, so columns keep the order of the first file
+            for partial in executor.map(summarize_range, jobs):
+                summary.merge(partial)
+    stats = {"files": len(paths), "ranges": len(jobs),
+             "bytes": sum(os.path.getsize(path) for path in paths), "elapsed": time.perf_counter() - start}
+    return summary, stats
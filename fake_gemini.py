@@ -0,0 +1,142 @@
+import os
+import json
+import random
+import threading
+import time
+
+# A canned response row in the 21-field CSV format Main_CSV.py asks for
+fake_csv_row = (
+    '1,"reply","Sample reply text","sample_user","No image",10,1,2,300,"1h",false,'
+    "0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0"
+)
+
+# The same tweet as a schema-constrained JSON response (Main_CSV.py --structured)
+fake_json_response = json.dumps({"tweets": [{
+    "completeness": 1, "content_type": "reply", "text_body": "Sample reply text", "username": "sample_user",
+    "image_text_description": "No image", "likes": 10, "replies": 1, "retweets": 2, "views": 300,
+    "time_of_post": "1h", "promotional_or_irrelevant": False,
+    "pro_trump": 0.0, "hostile_to_trump": 0.0, "sarcastic_about_trump": 0.0, "ambivalent_about_trump": 0.0,
+    "nationalist_pro_trump": 0.0, "anti_elite_pro_trump": 0.0, "fearful_pro_trump": 0.0,
+    "optimistic_about_trump": 0.0, "skeptical_of_trump": 0.0, "disengaged_from_trump": 0.0
+}]})
+
+
+class FakeFile:
+    def __init__(self, name, path):
+        self.name = name
+        self.display_name = os.path.basename(path)
+        self.path = path
+
+
+class FakeCandidate:
+    def __init__(self, finish_reason):
+        self.finish_reason = finish_reason
+
+
+class FakeResponse:
+    def __init__(self, text, finish_reason="STOP"):
+        self.text = text
+        self.candidates = [FakeCandidate(finish_reason)]
+
+
+class FakeCachedModel:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def generate_content(self, contents):
+        return self.backend.generate_content(contents)
+
+
+# Local stand-in for GeminiBackend used for benchmarks and offline runs.
+# Calls sleep for a configurable latency to mimic network round-trips.
+# In batch mode (prompt asks for image_index) it answers one row per screenshot,
+# and with max_output_rows set it truncates longer answers the way
+# max_output_tokens does.
+class FakeGeminiBackend:
+    def __init__(self, key_name="FAKE_KEY", upload_latency=0.2, generate_latency=1.0,
+                 failure_rate=0.0, response_text=fake_csv_row, seed=None, max_output_rows=None,
+                 reference_name="Completeness.jpg"):
+        self.key_name = key_name
+        self.model_name = "fake-gemini"
+        self.generation_config = {}
+        self.upload_latency = upload_latency
+        self.generate_latency = generate_latency
+        self.failure_rate = failure_rate
+        self.response_text = response_text
+        self.max_output_rows = max_output_rows
+        self.reference_name = reference_name
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.upload_calls = 0
+        self.generate_calls = 0
+        self.context_calls = 0
+        self.supports_context_cache = True
+
+    def _maybe_fail(self, what):
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+        if failed:
+            raise RuntimeError(f"Simulated {what} failure on {self.key_name}")
+
+    def upload_file(self, path):
+        time.sleep(self.upload_latency)
+        self._maybe_fail("upload")
+        with self._lock:
+            self.upload_calls += 1
+            count = self.upload_calls
+        return FakeFile(f"files/fake-{self.key_name}-{count}", path)
+
+    def generate_content(self, contents):
+        time.sleep(self.generate_latency)
+        self._maybe_fail("generate")
+        with self._lock:
+            self.generate_calls += 1
+
+        batch_mode = any(isinstance(part, str) and "image_index" in part for part in contents)
+        if not batch_mode:
+            return FakeResponse(self.response_text)
+
+        screenshots = [part for part in contents
+                       if isinstance(part, FakeFile) and part.display_name != self.reference_name]
+        rows = [f"{index},{self.response_text}" for index in range(1, len(screenshots) + 1)]
+        if self.max_output_rows is not None and len(rows) > self.max_output_rows:
+            return FakeResponse("\n".join(rows[:self.max_output_rows]), finish_reason="MAX_TOKENS")
+        return FakeResponse("\n".join(rows))
+
+    def create_cached_model(self, prompt, reference, ttl_seconds):
+        if not self.supports_context_cache:
+            raise RuntimeError("Cached content is too small")
+        with self._lock:
+            self.context_calls += 1
+        return FakeCachedModel(self), None
+
+
+# Local stand-in for the batch prediction endpoint: writes a result file for
+# every request shard (requests-N.jsonl -> results-N.jsonl). Each request gets
+# the canned CSV or JSON answer, depending on whether it asked for JSON, or an
+# error for failure_rate of them. Lines come back shuffled, as a real batch may
+# return them. Returns {"answered": n, "failed": n}.
+def fabricate_batch_results(request_paths, output_dir, failure_rate=0.0, seed=None):
+    generator = random.Random(seed)
+    counts = {"answered": 0, "failed": 0}
+    for request_path in request_paths:
+        results = []
+        with open(request_path, "r", encoding="utf-8") as file:
+            for line in file:
+                request = json.loads(line)
+                if generator.random() < failure_rate:
+                    results.append({"key": request["key"], "error": {"code": 500, "message": "Simulated batch failure"}})
+                    counts["failed"] += 1
+                    continue
+                wants_json = request["request"].get("generation_config", {}).get("response_mime_type") == "application/json"
+                text = fake_json_response if wants_json else fake_csv_row
+                results.append({"key": request["key"], "response": {
+                    "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+                    "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0}}})
+                counts["answered"] += 1
+        generator.shuffle(results)
+        result_name = os.path.basename(request_path).replace("requests-", "results-", 1)
+        with open(os.path.join(output_dir, result_name), "w", encoding="utf-8") as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+    return counts
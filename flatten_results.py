@@ -0,0 +1,104 @@
+import pandas as pd
+from json_repair import RepairError, repair_json
+from tweet_schema import field_names, score_fields
+
+# Local flattener for the results JSON: explodes response.tweets[*] into one row
+# per tweet and projects the rows onto the 23 CSV columns with column-wise
+# pandas operations, instead of asking Gemini to convert each entry.
+
+csv_headers = ["tweet_id", "file_name"] + field_names
+
+count_columns = ["likes", "replies", "retweets", "views"]
+
+# Older responses nest the scores as sentiment_scores.{supportive, hostile, ...}
+sentiment_score_aliases = {
+    alias: field
+    for alias, field in zip(
+        ["supportive", "hostile", "sarcastic", "ambivalent", "nationalist",
+         "anti_elite", "fearful", "optimistic", "skeptical", "disengaged"],
+        score_fields
+    )
+}
+
+count_multipliers = {"": 1, "k": 1_000, "m": 1_000_000, "b": 1_000_000_000}
+
+# Function to parse a column of counts like 459, "2,535", "1.6k" or "282K" into nullable integers
+def parse_counts(column):
+    counts = pd.to_numeric(column, errors="coerce")
+    # Only the few values that are not plain numbers go through the string parsing
+    leftover = counts.isna() & column.notna()
+    if leftover.any():
+        text = column[leftover].astype(str).str.strip().str.replace(",", "", regex=False)
+        parts = text.str.extract(r"^(-?\d+(?:\.\d+)?)\s*([kKmMbB]?)$")
+        multiplier = parts[1].str.lower().map(count_multipliers)
+        counts[leftover] = pd.to_numeric(parts[0], errors="coerce") * multiplier
+    return counts.round().astype("Int64")
+
+# Function to format true/false values the way Main_CSV.py writes them
+def format_booleans(column):
+    lowered = column.astype("string").str.strip().str.lower()
+    return lowered.where(lowered.isin(["true", "false"]))
+
+# Function to pull the list of tweets out of one entry's response,
+# repairing a raw response string first. Returns (tweets, repaired ok).
+def entry_tweets(response):
+    if isinstance(response, str):
+        try:
+            response, _ = repair_json(response)
+        except RepairError:
+            return [], False
+    if isinstance(response, list):
+        return response, True
+    if isinstance(response, dict):
+        tweets = response.get("tweets", [])
+        return (tweets if isinstance(tweets, list) else []), True
+    return [], False
+
+# Function to flatten a list of results entries into a DataFrame with csv_headers columns.
+# Returns (DataFrame, number of entries whose response could not be parsed).
+def entries_to_frame(entries):
+    entries_frame = pd.DataFrame(
+        [(entry.get("tweet_id", ""), entry.get("file_name", ""), entry.get("response")) for entry in entries],
+        columns=["tweet_id", "file_name", "response"]
+    )
+    parsed = entries_frame.pop("response").map(entry_tweets)
+    entries_frame["tweets"] = parsed.str[0]
+    unparsed = int((~parsed.str[1].astype(bool)).sum())
+
+    # One row per tweet, with a column per tweet field
+    exploded = entries_frame.explode("tweets", ignore_index=True)
+    exploded = exploded[exploded["tweets"].map(lambda tweet: isinstance(tweet, dict))]
+    if exploded.empty:
+        return pd.DataFrame(columns=csv_headers), unparsed
+    tweets = pd.DataFrame(exploded["tweets"].tolist())
+
+    # Lift nested sentiment_scores into the score columns the flat schema uses
+    if "sentiment_scores" in tweets:
+        nested = tweets.pop("sentiment_scores")
+        scores = pd.DataFrame([value if isinstance(value, dict) else {} for value in nested])
+        scores = scores.rename(columns=sentiment_score_aliases)
+        for field in score_fields:
+            if field in scores:
+                tweets[field] = tweets[field].combine_first(scores[field]) if field in tweets else scores[field]
+
+    frame = tweets.reindex(columns=field_names)
+    frame.insert(0, "tweet_id", exploded["tweet_id"].to_numpy())
+    frame.insert(1, "file_name", exploded["file_name"].to_numpy())
+
+    frame["completeness"] = pd.to_numeric(frame["completeness"], errors="coerce").astype("Int64")
+    for column in count_columns:
+        frame[column] = parse_counts(frame[column])
+    frame["promotional_or_irrelevant"] = format_booleans(frame["promotional_or_irrelevant"])
+    frame[score_fields] = frame[score_fields].apply(pd.to_numeric, errors="coerce")
+    return frame, unparsed
+
+# Function to group an iterable of entries into lists of at most chunk_size
+def chunked(entries, chunk_size):
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,103 @@
+import os
+import csv
+import time
+import queue
+import hashlib
+import threading
+from io import BytesIO
+
+# Background writer for captured screenshots. The capture loop hands over the
+# PNG bytes exactly as the browser returned them and goes straight back to
+# scrolling; a thread writes them to disk unchanged (no decode/re-encode) and
+# then runs any optional transforms on them. The queue is bounded, so a slow
+# disk makes the capture loop wait instead of holding every frame in memory.
+
+
+class FrameWriter:
+    # max_queued: frames waiting to be written before put() blocks
+    # transforms: functions called as transform(path, png_bytes) after each write,
+    #   e.g. thumbnail_transform() or hash_transform
+    # on_written: optional function called with each path once it is on disk,
+    #   e.g. to hand the frame to analysis straight away (see stream_pipeline.py)
+    def __init__(self, max_queued=32, transforms=(), on_written=None):
+        self.frames = queue.Queue(maxsize=max_queued)
+        self.transforms = list(transforms)
+        self.on_written = on_written
+        self.written = 0
+        self.failed = 0
+        self.write_seconds = 0.0
+        self.max_depth = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # Function to queue one frame for writing; returns the queue depth it found
+    def put(self, path, png_bytes):
+        depth = self.frames.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self.frames.put((path, png_bytes))
+        return depth
+
+    def _run(self):
+        while True:
+            item = self.frames.get()
+            try:
+                if item is None:
+                    return
+                path, png_bytes = item
+                start = time.perf_counter()
+                with open(path, "wb") as file:
+                    file.write(png_bytes)
+                for transform in self.transforms:
+                    transform(path, png_bytes)
+                self.write_seconds += time.perf_counter() - start
+                self.written += 1
+                if self.on_written is not None:
+                    self.on_written(path)
+            except Exception as e:
+                self.failed += 1
+                print(f"Error writing {item[0]}: {e}")
+            finally:
+                self.frames.task_done()
+
+    # Function to wait until every queued frame has been written
+    def flush(self):
+        self.frames.join()
+
+    # Function to write the remaining frames and stop the thread
+    def close(self):
+        if self.thread.is_alive():
+            self.frames.put(None)
+            self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Transform that saves a downscaled copy under <frame folder>/thumbnails
+def thumbnail_transform(max_size=(320, 180)):
+    def save_thumbnail(path, png_bytes):
+        from PIL import Image
+        folder, name = os.path.split(path)
+        thumbnails_dir = os.path.join(folder, "thumbnails")
+        os.makedirs(thumbnails_dir, exist_ok=True)
+        image = Image.open(BytesIO(png_bytes))
+        image.thumbnail(max_size)
+        image.save(os.path.join(thumbnails_dir, name))
+    return save_thumbnail
+
+# Transform that appends each frame's SHA-256 to <frame folder>/frame_hashes.csv
+def hash_transform(path, png_bytes):
+    folder, name = os.path.split(path)
+    with open(os.path.join(folder, "frame_hashes.csv"), "a", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerow([name, hashlib.sha256(png_bytes).hexdigest()])
+
+# Transforms that can be picked by name (e.g. from the command line)
+transform_names = {"thumbnail": thumbnail_transform(), "hash": hash_transform}
+
+# Function to create a FrameWriter from transform names, so worker processes
+# can be told which transforms to run without pickling functions
+def make_frame_writer(max_queued=32, transforms=(), on_written=None):
+    return FrameWriter(max_queued, [transform_names[name] for name in transforms], on_written)
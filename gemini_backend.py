@@ -0,0 +1,76 @@
+import os
+import mimetypes
+import datetime
+import google.generativeai as genai
+from google.generativeai import caching
+from google.generativeai import client as genai_client
+from google.generativeai.types import file_types
+from dotenv import load_dotenv
+
+# Names of the environment variables holding the API keys
+api_key_names = ["GEMINI_API_KEY1", "GEMINI_API_KEY2", "GEMINI_API_KEY3", "GEMINI_API_KEY4"]
+
+# Function to load the (name, key) pairs that are set in the environment
+def load_api_keys():
+    load_dotenv()
+    return [(name, os.getenv(name)) for name in api_key_names if os.getenv(name)]
+
+
+# Backend bound to a single API key.
+# genai.configure() is global, so each backend owns its own client manager
+# instead; that lets several keys have requests in flight at the same time.
+class GeminiBackend:
+    def __init__(self, api_key, key_name, model_name, generation_config, safety_settings):
+        self.key_name = key_name
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.safety_settings = safety_settings
+
+        self._clients = genai_client._ClientManager()
+        self._clients.configure(api_key=api_key)
+        self._file_client = self._clients.get_default_client("file")
+
+        self.model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            safety_settings=safety_settings
+        )
+        self.model._client = self._clients.get_default_client("generative")
+
+    # Same as genai.upload_file, but through this backend's own file client
+    def upload_file(self, path):
+        mime_type, _ = mimetypes.guess_type(path)
+        response = self._file_client.create_file(
+            path=path, mime_type=mime_type, display_name=os.path.basename(path)
+        )
+        return file_types.File(response)
+
+    def generate_content(self, contents):
+        return self.model.generate_content(contents)
+
+    # Create a cached context holding the static prompt and the reference image
+    # and return (model using that context, context expire_time)
+    def create_cached_model(self, prompt, reference, ttl_seconds):
+        request = caching.CachedContent._prepare_create_request(
+            model=self.model_name,
+            system_instruction=prompt,
+            contents=[reference],
+            ttl=datetime.timedelta(seconds=ttl_seconds)
+        )
+        cache_client = self._clients.get_default_client("cache")
+        cached_content = caching.CachedContent._from_obj(cache_client.create_cached_content(request))
+        model = genai.GenerativeModel.from_cached_content(
+            cached_content,
+            generation_config=self.generation_config,
+            safety_settings=self.safety_settings
+        )
+        model._client = self._clients.get_default_client("generative")
+        return model, cached_content.expire_time
+
+
+# Function to create one backend per configured API key
+def create_backends(model_name, generation_config, safety_settings):
+    return [
+        GeminiBackend(key, name, model_name, generation_config, safety_settings)
+        for name, key in load_api_keys()
+    ]
@@ -28,13 +28,23 @@ with open("twitter_analysis_results_corrected.json", "w", encoding="utf-8") as f
 
 import json
 import re
+import argparse
+from results_stream import EntryWriter, iter_entries, written_keys
 
-# Load the JSON file
-input_file = "twitter_analysis_results_corrected.json"
-output_file = "twitter_analysis_results_fixed.json"
+# Command line options
+parser = argparse.ArgumentParser(description="Parse the JSON embedded in each response field.")
+parser.add_argument("--input", default="twitter_analysis_results_corrected.json")
+parser.add_argument("--output", default="twitter_analysis_results_fixed.json",
+                    help="A .json array, or .jsonl for one entry per line")
+parser.add_argument("--append", action="store_true",
+                    help="Add to an existing .jsonl output, skipping entries it already holds")
+args = parser.parse_args()
+if args.append and not args.output.lower().endswith(".jsonl"):
+    parser.error("--append needs a .jsonl --output")
 
-with open(input_file, "r", encoding="utf-8") as file:
-    data = json.load(file)
+# Input and output files; entries are streamed one at a time
+input_file = args.input
+output_file = args.output
 
 # Function to clean and parse embedded JSON strings
 def parse_embedded_json(item):
@@ -48,12 +58,13 @@ def parse_embedded_json(item):
         except json.JSONDecodeError as e:
             print(f"Error parsing embedded JSON: {e}")
 
-# Iterate through each item in the data and fix the "response" field
-for item in data:
-    parse_embedded_json(item)
-
-# Save the fixed JSON to a new file
-with open(output_file, "w", encoding="utf-8") as file:
-    json.dump(data, file, indent=4)
+# Fix the "response" field of each item and write it straight to the output
+already_written = written_keys(output_file) if args.append else set()
+with EntryWriter(output_file, append=args.append) as writer:
+    for item in iter_entries(input_file):
+        if (item.get("tweet_id", ""), item.get("file_name", "")) in already_written:
+            continue
+        parse_embedded_json(item)
+        writer.write(item)
 
 print(f"Fixed JSON file saved as {output_file}")
@@ -0,0 +1,175 @@
+import re
+import json
+
+# Deterministic local repair for the loosely formatted JSON Gemini returns.
+#
+# The failures in twitter_analysis_results.json are mechanical:
+#   - the answer is wrapped in ```json ... ``` fences
+#   - it is cut off mid-object by max_output_tokens, leaving arrays and objects open
+#   - counts are written as bare 16k / 1.6k / 282k, or with thousands separators
+#     (2,535), which is not valid JSON
+#   - the odd trailing comma before a closing bracket
+# repair_json fixes these in a single string-aware pass, with no API calls.
+# A truncated answer is cut back to the last complete array element (so a
+# half-written tweet is dropped and every complete one is kept) and the
+# brackets still open at that point are closed.
+
+fence_pattern = re.compile(r"```(?:json)?", re.IGNORECASE)
+number_pattern = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?$")
+suffixed_number_pattern = re.compile(r"-?\d+(?:\.\d+)?[kKmMbB]$")
+bare_token_pattern = re.compile(r"[^\s,:\[\]{}\"]+")
+string_pattern = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+whitespace_pattern = re.compile(r"\s+")
+thousands_pattern = re.compile(r"(?:,\d{3})+(?=\s*[,}\]]|\s*$)")
+closers = {"{": "}", "[": "]"}
+suffix_multipliers = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}
+
+
+# Raised when a response cannot be turned into JSON
+class RepairError(ValueError):
+    pass
+
+
+# Function to turn a count like "1.6k", "282K" or 459 into an integer; None if it is not a count
+def parse_count(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().replace(",", "")
+    if number_pattern.match(text):
+        return int(float(text))
+    if suffixed_number_pattern.match(text):
+        return int(round(float(text[:-1]) * suffix_multipliers[text[-1].lower()]))
+    return None
+
+# Function to remove code fences and any text before the first bracket
+def strip_fences(text, repairs):
+    cleaned = fence_pattern.sub("", text)
+    if cleaned != text:
+        repairs.append("removed code fences")
+    starts = [index for index in (cleaned.find("{"), cleaned.find("[")) if index >= 0]
+    if not starts:
+        raise RepairError("no JSON object or array found")
+    if cleaned[:min(starts)].strip():
+        repairs.append("dropped text before the JSON")
+    return cleaned[min(starts):]
+
+# Function to rewrite text into valid JSON syntax; returns the repaired string
+def repair_text(text, repairs):
+    text = strip_fences(text, repairs)
+    out = []
+    length = 0  # characters in out
+    stack = []
+    safe_point = None  # (length of out, offset in text, open brackets) after the last complete array element
+    in_string = False
+    joined_numbers = 0
+    quoted_numbers = 0
+    quoted_tokens = 0
+    trailing_commas = 0
+    position = 0
+
+    def emit(piece):
+        nonlocal length
+        out.append(piece)
+        length += len(piece)
+
+    while position < len(text):
+        char = text[position]
+        if char == '"':
+            match = string_pattern.match(text, position)
+            if match is None:
+                in_string = True  # unterminated string: the response was cut off inside it
+                break
+            emit(match.group(0))
+            position = match.end()
+            continue
+        if char.isspace():
+            match = whitespace_pattern.match(text, position)
+            emit(match.group(0))
+            position = match.end()
+            continue
+
+        if char in closers:
+            stack.append(char)
+            emit(char)
+            if char == "[":
+                safe_point = (length, position + 1, list(stack))
+        elif char in "}]":
+            if not stack or closers[stack[-1]] != char:
+                raise RepairError(f"unexpected {char!r} at offset {position}")
+            # Drop a trailing comma before the closing bracket
+            last = len(out) - 1
+            while last >= 0 and out[last].isspace():
+                last -= 1
+            if last >= 0 and out[last] == ",":
+                del out[last]
+                length -= 1
+                trailing_commas += 1
+            stack.pop()
+            emit(char)
+            if not stack:
+                if text[position + 1:].strip():
+                    repairs.append("dropped text after the JSON")
+                break
+            if stack[-1] == "[":
+                safe_point = (length, position + 1, list(stack))
+        elif char in ",:":
+            emit(char)
+        else:
+            token = bare_token_pattern.match(text, position).group(0)
+            separators = None
+            if stack and stack[-1] == "{" and token.isdigit():
+                # An object value can't be followed by a bare number, so 2,535 is one count
+                separators = thousands_pattern.match(text, position + len(token))
+            if separators:
+                emit(token + separators.group(0).replace(",", ""))
+                joined_numbers += 1
+                position = separators.end()
+                continue
+            if token in ("true", "false", "null") or number_pattern.match(token):
+                emit(token)
+            elif suffixed_number_pattern.match(token):
+                emit(json.dumps(token))
+                quoted_numbers += 1
+            else:
+                emit(json.dumps(token))
+                quoted_tokens += 1
+            position += len(token)
+            continue
+        position += 1
+
+    if joined_numbers:
+        repairs.append(f"removed thousands separators from {joined_numbers} numbers")
+    if quoted_numbers:
+        repairs.append(f"quoted {quoted_numbers} suffixed numbers")
+    if quoted_tokens:
+        repairs.append(f"quoted {quoted_tokens} bare values")
+    if trailing_commas:
+        repairs.append(f"removed {trailing_commas} trailing commas")
+
+    repaired = "".join(out)
+    if in_string or stack:
+        # Truncated: keep everything up to the last complete array element
+        if safe_point is None:
+            raise RepairError("truncated before any complete element")
+        cut, offset, open_brackets = safe_point
+        dropped = len(text) - offset
+        repaired = repaired[:cut].rstrip().rstrip(",")
+        repaired += "".join(closers[bracket] for bracket in reversed(open_brackets))
+        repairs.append(f"closed truncated JSON ({len(open_brackets)} brackets, dropped {dropped} trailing characters)")
+    return repaired
+
+# Function to parse a model response as JSON, repairing it if needed.
+# Returns (value, list of repairs made); raises RepairError if it cannot be repaired.
+def repair_json(text):
+    repairs = []
+    try:
+        return json.loads(text), repairs
+    except json.JSONDecodeError:
+        pass
+    repaired = repair_text(text, repairs)
+    try:
+        return json.loads(repaired), repairs
+    except json.JSONDecodeError as e:
+        raise RepairError(f"still invalid after repair: {e}") from e
@@ -1,166 +1,81 @@
 import os
-import google.generativeai as genai
-from google.generativeai.types import safety_types
-from dotenv import load_dotenv
-import csv
-import json
 import time
-
-# Load environment variables
-load_dotenv()
-
-# Set up API keys
-api_keys = [
-    os.getenv("GEMINI_API_KEY1"),
-    os.getenv("GEMINI_API_KEY2"),
-    os.getenv("GEMINI_API_KEY3"),
-    os.getenv("GEMINI_API_KEY4")
-]
-
-# Remove any None values if some keys are not set
-api_keys = [key for key in api_keys if key]
-
-if not api_keys:
-    print("Error: No valid API keys found in environment variables.")
+import argparse
+import pandas as pd
+from flatten_results import chunked, csv_headers, entries_to_frame
+from results_stream import iter_entries
+from run_manifest import RunManifest, manifest_path_for
+
+# Convert the results JSON to CSV locally. Each entry's response.tweets[*] is
+# exploded into rows and projected onto csv_headers with pandas, in chunks of
+# entries, so there are no API calls and memory stays bounded by one chunk.
+# Accepts the raw results (response strings are repaired with json_repair.py)
+# as well as the repaired output of Main.py or json_corrector.py.
+
+# Command line options
+parser = argparse.ArgumentParser(description="Convert twitter_analysis_results.json to CSV.")
+parser.add_argument("--input", default="twitter_analysis_results.json",
+                    help="Results as a .json array or .jsonl lines; entries are read one at a time")
+parser.add_argument("--output", default="twitter_analysis_results_converted.csv")
+parser.add_argument("--chunk-size", type=int, default=10_000, help="Entries flattened per pandas batch")
+parser.add_argument("--resume", action="store_true",
+                    help="Append to the existing CSV and skip entries already converted")
+args = parser.parse_args()
+
+input_file = args.input
+output_file = args.output
+
+if not os.path.exists(input_file):
+    print(f"Error loading input JSON file: {input_file} not found")
     exit()
 
-# Initialize the current key index
-current_key_index = 0
-
-# Function to configure API with current key
-def configure_api():
-    global current_key_index
-    genai.configure(api_key=api_keys[current_key_index])
-    print(f"Configured with API key: GEMINI_API_KEY{current_key_index + 1}")
-
-# Initial configuration
-configure_api()
-
-# Define the model configuration
-generation_config = {
-    "temperature": 0.3,
-    "top_p": 0.95,
-    "top_k": 40,
-    "max_output_tokens": 1024,
-}
-
-# Define safety settings
-safety_settings = [
-    {
-        "category": safety_types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
-        "threshold": safety_types.HarmBlockThreshold.BLOCK_NONE
-    },
-    {
-        "category": safety_types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-        "threshold": safety_types.HarmBlockThreshold.BLOCK_NONE
-    },
-    {
-        "category": safety_types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-        "threshold": safety_types.HarmBlockThreshold.BLOCK_NONE
-    },
-    {
-        "category": safety_types.HarmCategory.HARM_CATEGORY_HARASSMENT,
-        "threshold": safety_types.HarmBlockThreshold.BLOCK_NONE
-    }
-]
-
-# Create the model instance using gemini-1.5-flash-8b
-def create_model():
-    try:
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash-8b",
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
-        print("Model created successfully.")
-        return model
-    except Exception as e:
-        print(f"Error creating model: {e}")
-        exit(1)
-
-model = create_model()
-
-# Load the original JSON file
-input_file = "twitter_analysis_results.json"
-output_file = "twitter_analysis_results_converted.csv"
-
-try:
-    with open(input_file, "r") as file:
-        data = json.load(file)
-except Exception as e:
-    print(f"Error loading input JSON file: {e}")
-    exit()
-
-# Define headers based on the expected CSV format
-csv_headers = [
-    "tweet_id", "file_name", "completeness", "content_type", "text_body", "username",
-    "image_text_description", "likes", "replies", "retweets", "views", "time_of_post",
-    "promotional_or_irrelevant", "pro_trump", "hostile_to_trump", "sarcastic_about_trump",
-    "ambivalent_about_trump", "nationalist_pro_trump", "anti_elite_pro_trump",
-    "fearful_pro_trump", "optimistic_about_trump", "skeptical_of_trump", "disengaged_from_trump"
-]
-
-# Open CSV file for writing
-with open(output_file, mode="w", newline="") as csv_file:
-    writer = csv.DictWriter(csv_file, fieldnames=csv_headers)
-    writer.writeheader()  # Write headers to CSV
-
-    for entry in data:
-        retries = 0
-        max_retries = len(api_keys)
-        prior_response_text = None  # To store previous response text for the retry prompt
-
-        while retries < max_retries:
-            try:
-                # Create prompt to ask for CSV conversion with correct format example
-                prompt = (
-                    "Convert the following JSON entry to CSV format:\n\n"
-                    f"{entry}\n\n"
-                    "Ensure each JSON key has its own column in the CSV. If the entry is nested, please flatten it appropriately.\n"
-                    "Format the output exactly as shown in this example:\n\n"
-                    "tweet_id,file_name,completeness,content_type,text_body,username,image_text_description,likes,replies,retweets,views,time_of_post,promotional_or_irrelevant,pro_trump,hostile_to_trump,sarcastic_about_trump,ambivalent_about_trump,nationalist_pro_trump,anti_elite_pro_trump,fearful_pro_trump,optimistic_about_trump,skeptical_of_trump,disengaged_from_trump\n"
-                    "1234567890,screenshot.png,1,tweet,\"Sample tweet text\",\"username123\",\"Description of the image\",100,20,50,200,\"2023-01-01 12:34:56\",false,0.5,0.2,0.0,0.0,0.1,-0.3,0.0,0.2,-0.1,0.3\n"
-                )
-                response = model.generate_content(prompt)
-
-                # Parse the CSV response
-                try:
-                    # Extract CSV content from response text
-                    csv_content = response.text.strip()
-                    csv_lines = csv_content.splitlines()
-                    csv_reader = csv.DictReader(csv_lines)
-
-                    for row in csv_reader:
-                        # Ensure all fields are accounted for before writing to CSV
-                        csv_row = {field: row.get(field, "") for field in csv_headers}
-                        writer.writerow(csv_row)
-
-                    print(f"CSV data received and processed for tweet_id: {entry.get('tweet_id', '')}")
-                    break
-
-                except Exception as e:
-                    print(f"Failed to parse CSV for tweet_id: {entry.get('tweet_id', '')}. Retrying with correction prompt.")
-
-                    # Update prior response text for retry
-                    correction_prompt = (
-                        f"The following response was invalid CSV. Please correct it to ensure all keys are "
-                        f"flattened into individual CSV columns following this structure:\n\n"
-                        "tweet_id,file_name,completeness,content_type,text_body,username,image_text_description,likes,replies,retweets,views,time_of_post,promotional_or_irrelevant,pro_trump,hostile_to_trump,sarcastic_about_trump,ambivalent_about_trump,nationalist_pro_trump,anti_elite_pro_trump,fearful_pro_trump,optimistic_about_trump,skeptical_of_trump,disengaged_from_trump\n\n"
-                        "Response:\n{prior_response_text or response.text}"
-                    )
-                    prior_response_text = response.text
-                    response = model.generate_content(correction_prompt)
-
-                retries += 1
-                # Cycle API keys if necessary
-                current_key_index = (current_key_index + 1) % len(api_keys)
-                if current_key_index == 0:
-                    print("All API keys exhausted. Waiting for 30 seconds before retrying...")
-                    time.sleep(30)
-                configure_api()
-
-            except Exception as e:
-                print(f"Error processing tweet_id {entry.get('tweet_id', '')} with API key {current_key_index + 1}: {e}")
-                retries += 1
-
+# The manifest records every converted entry, including those that gave no rows
+manifest = RunManifest(manifest_path_for(output_file))
+
+# Entries already converted, when appending to an earlier run's output
+resuming = args.resume and os.path.exists(output_file) and os.path.getsize(output_file) > 0
+done = set()
+if resuming and os.path.exists(manifest.path):
+    # Rows written after the manifest was last saved are converted again
+    manifest.drop_unrecorded_rows(output_file)
+    done = {(entry["tweet_id"], entry["file_name"]) for entry in manifest.entries.values()
+            if entry["status"] == "success"}
+    print(f"Resuming: {len(done)} entries already converted into {output_file}")
+elif resuming:
+    # An output from before manifests existed: entries with rows in it are done
+    converted = pd.read_csv(output_file, usecols=["tweet_id", "file_name"], dtype=str, keep_default_na=False)
+    done = set(zip(converted["tweet_id"], converted["file_name"]))
+    print(f"Resuming: {len(done)} entries already in {output_file}")
+else:
+    manifest.reset()
+
+start = time.perf_counter()
+entries = 0
+rows = 0
+unparsed = 0
+write_header = not resuming
+for chunk in chunked(iter_entries(input_file), args.chunk_size):
+    entries += len(chunk)
+    if done:
+        chunk = [entry for entry in chunk
+                 if (str(entry.get("tweet_id", "")), entry.get("file_name", "")) not in done]
+    frame, chunk_unparsed = entries_to_frame(chunk)
+    unparsed += chunk_unparsed
+    frame.to_csv(output_file, mode="w" if write_header else "a", header=write_header, index=False,
+                 columns=csv_headers)
+    write_header = False
+    rows += len(frame)
+    entry_rows = frame.groupby([frame["tweet_id"].astype(str), frame["file_name"]]).size()
+    for entry in chunk:
+        tweet_id, file_name = str(entry.get("tweet_id", "")), entry.get("file_name", "")
+        manifest.record(tweet_id, file_name, True, rows=int(entry_rows.get((tweet_id, file_name), 0)))
+manifest.flush()
+
+if write_header:
+    # Empty input: still leave a CSV with the header row
+    pd.DataFrame(columns=csv_headers).to_csv(output_file, index=False)
+
+elapsed = time.perf_counter() - start
+print(f"Converted {entries} entries into {rows} rows in {elapsed:.2f}s "
+      f"({unparsed} responses could not be parsed)")
 print(f"CSV file saved to {output_file}")
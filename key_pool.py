@@ -0,0 +1,171 @@
+import random
+import re
+import threading
+import time
+
+# Shared API key pool replacing the round-robin + sleep(30) logic in Main.py,
+# Main_CSV.py and json_to_csv.py.
+#
+# Each key has token buckets for requests per minute and tokens per minute, a
+# limit on requests in flight, and a cooldown. Requests go to the key with the
+# most headroom. A failure puts the key on cooldown for the server's retry-after
+# hint when it gives one, or for a jittered exponential backoff otherwise. A key
+# that keeps failing is quarantined for a while. Work only waits when no key has
+# capacity, and then only until the earliest key frees up.
+
+# Free-tier limits for gemini-1.5-flash-8b; override per deployment
+default_requests_per_minute = 15
+default_tokens_per_minute = 1_000_000
+
+# Rough token cost of one screenshot request (prompt, two images, full answer)
+default_request_tokens = 2000
+
+# Function to pull a retry-after hint, in seconds, out of an API error
+def retry_after_seconds(error):
+    text = str(error)
+    for pattern in (r"retry in ([\d.]+)\s*s", r"retry_delay\s*\{\s*seconds:\s*(\d+)", r"Retry-After:\s*([\d.]+)"):
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until `amount` tokens are available
+    def wait_for(self, amount):
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+
+class KeyState:
+    def __init__(self, name, key, requests_per_minute, tokens_per_minute, max_in_flight):
+        self.name = name
+        self.key = key
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.quarantined_until = 0.0
+        self.reserved = {}  # request id -> tokens reserved
+
+
+class KeyPool:
+    def __init__(self, keys, requests_per_minute=default_requests_per_minute,
+                 tokens_per_minute=default_tokens_per_minute, max_in_flight=4,
+                 quarantine_after=3, quarantine_seconds=300, backoff_base=2.0, backoff_max=120.0):
+        if not keys:
+            raise ValueError("KeyPool needs at least one API key")
+        self.quarantine_after = quarantine_after
+        self.quarantine_seconds = quarantine_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._states = {}
+        for name, key in keys:
+            limit = max_in_flight.get(name, 1) if isinstance(max_in_flight, dict) else max_in_flight
+            self._states[name] = KeyState(name, key, requests_per_minute, tokens_per_minute, max(1, limit))
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._next_request = 0
+
+    @property
+    def names(self):
+        return list(self._states)
+
+    def key_for(self, name):
+        return self._states[name].key
+
+    def max_in_flight(self, name):
+        return self._states[name].max_in_flight
+
+    # Function to pick a key without blocking.
+    # Returns (name, request_id, 0.0), or (None, None, seconds to wait) if no key has capacity.
+    def try_acquire(self, estimated_tokens=default_request_tokens):
+        with self._lock:
+            now = time.monotonic()
+            best = None
+            best_headroom = None
+            wait = None
+            for state in self._states.values():
+                state.requests.refill(now)
+                state.tokens.refill(now)
+                blocked_until = max(state.cooldown_until, state.quarantined_until)
+                if blocked_until > now:
+                    key_wait = blocked_until - now
+                elif state.in_flight >= state.max_in_flight:
+                    key_wait = 0.05  # a request on this key will finish soon
+                else:
+                    key_wait = max(state.requests.wait_for(1), state.tokens.wait_for(estimated_tokens))
+                if key_wait > 0:
+                    wait = key_wait if wait is None else min(wait, key_wait)
+                    continue
+
+                headroom = min(state.requests.tokens / state.requests.capacity,
+                               state.tokens.tokens / state.tokens.capacity)
+                headroom -= state.in_flight / state.max_in_flight
+                if best is None or headroom > best_headroom:
+                    best, best_headroom = state, headroom
+
+            if best is None:
+                return None, None, wait
+            best.requests.tokens -= 1
+            best.tokens.tokens -= estimated_tokens
+            best.in_flight += 1
+            self._next_request += 1
+            best.reserved[self._next_request] = estimated_tokens
+            return best.name, self._next_request, 0.0
+
+    # Function to pick a key, sleeping only as long as the earliest key needs
+    def acquire(self, estimated_tokens=default_request_tokens):
+        while True:
+            name, request_id, wait = self.try_acquire(estimated_tokens)
+            if name is not None:
+                return name, request_id
+            time.sleep(wait)
+
+    def report_success(self, name, request_id, tokens_used=None):
+        with self._lock:
+            state = self._states[name]
+            reserved = state.reserved.pop(request_id, 0)
+            if tokens_used is not None:
+                state.tokens.tokens += reserved - tokens_used
+            state.in_flight = max(0, state.in_flight - 1)
+            state.failures = 0
+
+    def report_failure(self, name, request_id, error):
+        with self._lock:
+            state = self._states[name]
+            state.reserved.pop(request_id, None)
+            state.in_flight = max(0, state.in_flight - 1)
+            state.failures += 1
+            now = time.monotonic()
+
+            delay = retry_after_seconds(error)
+            if delay is None:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (state.failures - 1))
+                delay *= self._random.uniform(0.5, 1.5)
+            state.cooldown_until = max(state.cooldown_until, now + delay)
+
+            if state.failures >= self.quarantine_after:
+                state.quarantined_until = now + self.quarantine_seconds
+                state.failures = 0
+                print(f"{name} failed {self.quarantine_after} times in a row; quarantined for {self.quarantine_seconds}s")
+            else:
+                print(f"{name} cooling down for {delay:.1f}s")
+
+    # Function to read the token count Gemini reports for a response, if any
+    @staticmethod
+    def tokens_used(response):
+        usage = getattr(response, "usage_metadata", None)
+        return getattr(usage, "total_token_count", None) or None
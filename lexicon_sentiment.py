@@ -0,0 +1,182 @@
+import os
+import time
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from flatten_results import csv_headers, sentiment_score_aliases
+
+# Local lexicon sentiment stage: VADER's neg/neu/pos/compound scores for the
+# extracted tweets, as carried by trump_sentiment.csv and kamala_sentiment.csv.
+#
+# Texts are scored with vaderSentiment (pip install vaderSentiment), with no API
+# calls. Only distinct texts are scored: every text is keyed by its SHA-256, the
+# scores of texts seen before come from an SQLite cache, and the rest are split
+# into batches scored by worker processes, each holding one analyzer. The scores
+# are then joined back onto every row with that text.
+
+score_columns = ["neg", "neu", "pos", "compound"]
+
+default_cache_path = ".lexicon_cache.sqlite"
+default_batch_size = 2000
+
+# Part of every cache key, so a different scorer never reuses old scores
+scorer_name = "vader"
+
+# Function to build the analyzer, with a clear message when vaderSentiment is missing
+def create_analyzer():
+    try:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    except ImportError:
+        raise ImportError("The lexicon sentiment stage needs vaderSentiment: pip install vaderSentiment") from None
+    return SentimentIntensityAnalyzer()
+
+# Function to hash a text for the score cache
+def text_sha256(text):
+    return hashlib.sha256(f"{scorer_name}\0{text}".encode("utf-8")).hexdigest()
+
+# Function to build the text scored for each row: text_body, optionally followed
+# by image_text_description
+def row_texts(frame, include_description=False):
+    texts = frame["text_body"].fillna("").astype(str)
+    if include_description and "image_text_description" in frame:
+        description = frame["image_text_description"].fillna("").astype(str)
+        texts = (texts + "\n" + description).str.strip()
+    return texts
+
+
+# Scores of texts already seen, by text hash, stored in SQLite
+class ScoreCache:
+    def __init__(self, path=default_cache_path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "key TEXT PRIMARY KEY, neg REAL NOT NULL, neu REAL NOT NULL, pos REAL NOT NULL, compound REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    # Function to look up many keys at once. Returns {key: (neg, neu, pos, compound)}.
+    def get_many(self, keys):
+        found = {}
+        for start in range(0, len(keys), 900):  # SQLite's limit on query parameters
+            batch = keys[start:start + 900]
+            rows = self._connection.execute(
+                f"SELECT key, neg, neu, pos, compound FROM scores WHERE key IN ({','.join('?' * len(batch))})", batch
+            )
+            found.update((row[0], row[1:]) for row in rows)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO scores (key, neg, neu, pos, compound) VALUES (?, ?, ?, ?, ?)",
+            [(key,) + tuple(scores) for key, scores in items]
+        )
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+# Analyzer of this worker process, created once by _init_worker
+_analyzer = None
+
+def _init_worker():
+    global _analyzer
+    _analyzer = create_analyzer()
+
+# Worker: score one batch of texts. Returns a list of (neg, neu, pos, compound).
+def _score_batch(texts):
+    scores = []
+    for text in texts:
+        polarity = _analyzer.polarity_scores(text)
+        scores.append(tuple(polarity[column] for column in score_columns))
+    return scores
+
+# Function to score texts, each distinct text once. Returns a DataFrame of the
+# score columns aligned with `texts`, and a stats dict.
+def score_texts(texts, cache=None, workers=None, batch_size=default_batch_size):
+    start = time.perf_counter()
+    texts = pd.Series(texts, dtype=object).fillna("").astype(str)
+    codes, unique_texts = pd.factorize(texts)
+    keys = [text_sha256(text) for text in unique_texts]
+    known = cache.get_many(keys) if cache is not None else {}
+
+    missing = [index for index, key in enumerate(keys) if key not in known]
+    batches = [[unique_texts[index] for index in missing[offset:offset + batch_size]]
+               for offset in range(0, len(missing), batch_size)]
+    scored = []
+    if len(batches) <= 1 or workers == 1:
+        if batches and _analyzer is None:
+            _init_worker()
+        for batch in batches:
+            scored.extend(_score_batch(batch))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            for batch_scores in executor.map(_score_batch, batches):
+                scored.extend(batch_scores)
+    new_scores = {keys[index]: scores for index, scores in zip(missing, scored)}
+    if cache is not None and new_scores:
+        cache.put_many(new_scores.items())
+
+    known.update(new_scores)
+    unique_scores = pd.DataFrame([known[key] for key in keys], columns=score_columns, dtype=float)
+    scores = unique_scores.iloc[codes].reset_index(drop=True)
+    scores.index = texts.index
+    stats = {"rows": len(texts), "distinct": len(unique_texts), "cached": len(keys) - len(missing),
+             "scored": len(missing), "elapsed": time.perf_counter() - start}
+    return scores, stats
+
+# Function to add (or replace) the neg/neu/pos/compound columns of a results frame
+def add_lexicon_scores(frame, include_description=False, cache=None, workers=None, batch_size=default_batch_size):
+    scores, stats = score_texts(row_texts(frame, include_description), cache, workers, batch_size)
+    frame = frame.drop(columns=[column for column in score_columns if column in frame])
+    return pd.concat([frame, scores], axis=1), stats
+
+# Function to project scored results onto the columns of trump_sentiment.csv:
+# generic score names (supportive, hostile, ...), no promotional_or_irrelevant
+def to_sentiment_layout(frame):
+    renames = {field: alias for alias, field in sentiment_score_aliases.items()}
+    columns = [renames.get(column, column) for column in csv_headers if column != "promotional_or_irrelevant"]
+    frame = frame.rename(columns=renames)
+    return frame[[column for column in columns + score_columns if column in frame]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add VADER neg/neu/pos/compound scores to extracted tweet rows.")
+    parser.add_argument("--input", default="twitter_analysis_results.csv")
+    parser.add_argument("--output", default=None, help="Where to save the scored rows (default: update --input)")
+    parser.add_argument("--with-description", action="store_true",
+                        help="Score text_body together with image_text_description")
+    parser.add_argument("--sentiment-layout", action="store_true",
+                        help="Save in the column layout of trump_sentiment.csv and kamala_sentiment.csv")
+    parser.add_argument("--workers", type=int, default=None, help="Processes scoring texts")
+    parser.add_argument("--batch-size", type=int, default=default_batch_size, help="Texts per worker task")
+    parser.add_argument("--cache-path", default=default_cache_path)
+    parser.add_argument("--no-cache", action="store_true", help="Score every text again")
+    args = parser.parse_args()
+
+    # tweet_id is a 19-digit id: read it as text so it is not rounded
+    rows = pd.read_csv(args.input, dtype={"tweet_id": str})
+    cache = None if args.no_cache else ScoreCache(args.cache_path)
+    scored_rows, stats = add_lexicon_scores(rows, args.with_description, cache, args.workers, args.batch_size)
+    if cache is not None:
+        cache.close()
+    if args.sentiment_layout:
+        scored_rows = to_sentiment_layout(scored_rows)
+
+    output = args.output or args.input
+    # Written to a temporary file first, so an interrupted run leaves the input intact
+    fd, temp_path = tempfile.mkstemp(prefix=".lexicon-", suffix=".csv", dir=os.path.dirname(os.path.abspath(output)))
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+        scored_rows.to_csv(file, index=False)
+    os.replace(temp_path, output)
+    print(f"Scored {stats['rows']} rows ({stats['distinct']} distinct texts: {stats['cached']} from the cache, "
+          f"{stats['scored']} newly scored) in {stats['elapsed']:.2f}s")
+    print(f"Scored rows saved to {output}")
@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from visuals_data import candidate_files, file_fingerprint
+
+# Make-style orchestrator for the whole workflow.
+#
+# Each stage declares the command it runs, its input files or folders, the code
+# it depends on and its outputs. A stage depends on the stages whose outputs it
+# reads. A stage's key is the SHA-256 of its command line together with the
+# content hashes of its inputs and code (the prompt and generation_config live
+# in Main_CSV.py and tweet_schema.py, so editing them changes the key). A stage
+# is skipped while its key matches the last successful run and its outputs still
+# have the hashes that run left, so a rerun after a small change redoes only
+# the affected stages, and a stage whose output came out unchanged stops the
+# change there. Independent stages (per-candidate work, summary and rendering)
+# run concurrently; stages sharing a resource, like the browser, take turns.
+
+default_state_path = ".pipeline_state.json"
+default_log_dir = ".pipeline_logs"
+
+
+class Stage:
+    def __init__(self, name, script, args=(), inputs=(), outputs=(), code=(), resource=None):
+        self.name = name
+        self.script = script
+        self.args = [str(arg) for arg in args]
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = [script] + list(code)
+        self.resource = resource
+        self.dependencies = []
+
+    def command(self):
+        return [sys.executable, self.script] + self.args
+
+
+# Function to declare the stages for each candidate, then the shared ones.
+# Candidate "Trump" reads links from trumptweets.csv and ends in trump_sentiment.csv.
+def build_stages(capture_args=(), extract_args=("--engine", "async"), plots_dir="plots"):
+    stages = []
+    for candidate, sentiment_file in candidate_files.items():
+        name = candidate.lower()
+        screenshots = os.path.join("Screenshots", name)
+        replies = os.path.join(screenshots, "replies")
+        results = f"{name}_analysis_results.csv"
+        deduplicated = f"{name}_analysis_results_dedup.csv"
+        stages += [
+            Stage(f"capture_{name}", "Screenshots.py",
+                  ["--links", f"{name}tweets.csv", "--output-dir", screenshots, *capture_args],
+                  inputs=[f"{name}tweets.csv"], outputs=[replies],
+                  code=["capture_pool.py", "capture_drivers.py", "frame_writer.py"], resource="browser"),
+            Stage(f"extract_{name}", "Main_CSV.py",
+                  ["--screenshots-root", replies, "--output", results, *extract_args],
+                  inputs=[replies, "Completeness.jpg"], outputs=[results],
+                  code=["tweet_schema.py", "analysis_engine.py", "gemini_backend.py", "screenshot_batching.py"]),
+            Stage(f"dedup_{name}", "dedup_tweets.py", ["--input", results, "--output", deduplicated],
+                  inputs=[results], outputs=[deduplicated], code=["dedup_screenshots.py"]),
+            Stage(f"sentiment_{name}", "lexicon_sentiment.py",
+                  ["--input", deduplicated, "--output", sentiment_file, "--sentiment-layout"],
+                  inputs=[deduplicated], outputs=[sentiment_file], code=["flatten_results.py", "tweet_schema.py"]),
+        ]
+    sentiment_files = list(candidate_files.values())
+    stages += [
+        Stage("summary", "Data_Exploration.py",
+              ["--input", *sentiment_files, "--output", "summary_statistics.csv",
+               "--bounds-output", "summary_statistics_bounds.csv"],
+              inputs=sentiment_files, outputs=["summary_statistics.csv", "summary_statistics_bounds.csv"],
+              code=["describe_stream.py"]),
+        Stage("render", "visuals_ui.py", ["--render-all", plots_dir, "--data-dir", "."],
+              inputs=sentiment_files, outputs=[plots_dir],
+              code=["visuals_data.py", "visuals_render.py", "visuals_large.py", "aggregate_store.py"]),
+    ]
+    return stages
+
+# Function to check whether `path` is `output` or lies inside it
+def _within(path, output):
+    path, output = os.path.normpath(path), os.path.normpath(output)
+    return path == output or path.startswith(output + os.sep)
+
+# Function to link every stage to the stages producing its inputs and sort them
+# so each comes after its dependencies. Raises ValueError on a cycle.
+def resolve(stages):
+    by_output = [(output, stage) for stage in stages for output in stage.outputs]
+    for stage in stages:
+        stage.dependencies = []
+        for path in stage.inputs:
+            for output, producer in by_output:
+                if producer is not stage and _within(path, output) and producer not in stage.dependencies:
+                    stage.dependencies.append(producer)
+    ordered, placed = [], set()
+    while len(ordered) < len(stages):
+        ready = [stage for stage in stages if stage.name not in placed
+                 and all(dependency.name in placed for dependency in stage.dependencies)]
+        if not ready:
+            raise ValueError("Stage dependencies form a cycle: "
+                             + ", ".join(stage.name for stage in stages if stage.name not in placed))
+        ordered += ready
+        placed.update(stage.name for stage in ready)
+    return ordered
+
+
+# Last successful run of every stage, plus file fingerprints (size, mtime,
+# SHA-256) so unchanged files are not hashed again
+class PipelineState:
+    def __init__(self, path=default_state_path):
+        self.path = path
+        self.stages = {}
+        self.files = {}
+        # Stages hash files from worker threads while the main thread saves
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+            self.stages = state.get("stages", {})
+            self.files = state.get("files", {})
+
+    def save(self):
+        with self._lock:
+            state = json.dumps({"stages": self.stages, "files": self.files}, indent=1)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(state)
+        os.replace(temp_path, self.path)
+
+    # Function to hash a file, or a folder as the names and hashes of all files in it.
+    # Returns None when the path does not exist.
+    def path_sha256(self, path):
+        if os.path.isfile(path):
+            fingerprint = file_fingerprint(path, self.files.get(path))
+            with self._lock:
+                self.files[path] = fingerprint
+            return fingerprint["sha256"]
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for folder, folder_names, file_names in os.walk(path):
+            folder_names.sort()
+            for file_name in sorted(file_names):
+                file_path = os.path.join(folder, file_name)
+                digest.update(os.path.relpath(file_path, path).encode("utf-8") + b"\0")
+                digest.update(self.path_sha256(file_path).encode("ascii"))
+        return digest.hexdigest()
+
+    # Function to compute a stage's key: command line, input and code hashes
+    def stage_key(self, stage):
+        material = {"command": [stage.script] + stage.args,
+                    "inputs": {path: self.path_sha256(path) for path in stage.inputs},
+                    "code": {path: self.path_sha256(path) for path in stage.code}}
+        return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def output_hashes(self, stage):
+        return {path: self.path_sha256(path) for path in stage.outputs}
+
+    def is_current(self, stage, key):
+        record = self.stages.get(stage.name)
+        return (record is not None and record["key"] == key
+                and all(sha is not None for sha in self.output_hashes(stage).values())
+                and record["outputs"] == self.output_hashes(stage))
+
+
+# Function to decide what a stage needs, once its dependencies are done:
+#   "missing"  an input does not exist (e.g. no links file for a candidate yet)
+#   "kept"     an input does not exist, but the outputs do: they are used as they are
+#   "current"  nothing changed since its last run
+#   "run"      otherwise
+# Returns (decision, key or the missing inputs).
+def plan_stage(stage, state, force=False):
+    missing = [path for path in stage.inputs if not os.path.exists(path)]
+    if missing:
+        if all(os.path.exists(path) for path in stage.outputs):
+            return "kept", None
+        return "missing", f"no {', '.join(missing)}"
+    key = state.stage_key(stage)
+    if not force and state.is_current(stage, key):
+        return "current", key
+    return "run", key
+
+# Function to bring one stage up to date. Returns (status, detail, seconds, key).
+def run_stage(stage, state, log_dir, force=False):
+    start = time.perf_counter()
+    status, key = plan_stage(stage, state, force)
+    if status == "missing":
+        return status, key, 0.0, None
+    if status != "run":
+        return status, None, 0.0, key
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{stage.name}.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        exit_code = subprocess.call(stage.command(), stdout=log, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - start
+    if exit_code != 0:
+        return "failed", f"exit code {exit_code}, see {log_path}", elapsed, None
+    missing = [path for path in stage.outputs if not os.path.exists(path)]
+    if missing:
+        return "failed", f"did not write {', '.join(missing)}, see {log_path}", elapsed, None
+    return "ran", None, elapsed, key
+
+# Function to run the stages (and the stages they depend on) with up to `jobs`
+# at a time. Returns {stage name: status}.
+def run_pipeline(stages, targets=None, jobs=2, state_path=default_state_path, log_dir=default_log_dir,
+                 force=(), dry_run=False):
+    ordered = resolve(stages)
+    if targets:
+        by_name = {stage.name: stage for stage in ordered}
+        unknown = [target for target in targets if target not in by_name]
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(unknown)}; known stages: {', '.join(by_name)}")
+        wanted = set()
+        pending_names = list(targets)
+        while pending_names:
+            stage = by_name[pending_names.pop()]
+            if stage.name not in wanted:
+                wanted.add(stage.name)
+                pending_names += [dependency.name for dependency in stage.dependencies]
+        ordered = [stage for stage in ordered if stage.name in wanted]
+    state = PipelineState(state_path)
+    forced = lambda stage: "all" in force or stage.name in force
+
+    statuses = {}
+    if dry_run:
+        # Stages downstream of a stage that runs cannot be hashed yet: their inputs will change
+        for stage in ordered:
+            if any(statuses.get(dependency.name) in ("run", "run after upstream") for dependency in stage.dependencies):
+                statuses[stage.name] = "run after upstream"
+            else:
+                statuses[stage.name] = plan_stage(stage, state, forced(stage))[0]
+            print(f"{stage.name:<20} {statuses[stage.name]}")
+        return statuses
+
+    start = time.perf_counter()
+    pending = list(ordered)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for stage in list(pending):
+                if len(running) >= jobs:
+                    break
+                states = [statuses.get(dependency.name) for dependency in stage.dependencies]
+                if any(status in ("failed", "blocked") for status in states):
+                    statuses[stage.name] = "blocked"
+                    pending.remove(stage)
+                    print(f"{stage.name:<20} blocked by a failed dependency")
+                elif all(status is not None for status in states) and not any(
+                        stage.resource and stage.resource == other.resource for other in running.values()):
+                    pending.remove(stage)
+                    if any(status == "ran" for status in states):
+                        print(f"{stage.name:<20} checking (upstream changed)")
+                    running[executor.submit(run_stage, stage, state, log_dir, forced(stage))] = stage
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                status, detail, elapsed, key = future.result()
+                statuses[stage.name] = status
+                if status == "ran":
+                    state.stages[stage.name] = {"key": key, "outputs": state.output_hashes(stage)}
+                    state.save()
+                timing = f" in {elapsed:.1f}s" if status in ("ran", "failed") and elapsed else ""
+                print(f"{stage.name:<20} {status}{timing}" + (f": {detail}" if detail else ""))
+
+    counts = {status: list(statuses.values()).count(status) for status in dict.fromkeys(statuses.values())}
+    print(f"Pipeline finished in {time.perf_counter() - start:.1f}s: "
+          + ", ".join(f"{count} {status}" for status, count in counts.items()))
+    return statuses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the capture-to-plots workflow, skipping stages whose "
+                                                 "inputs and code have not changed since their last run.")
+    parser.add_argument("targets", nargs="*", help="Stages to bring up to date, with their dependencies (default: all)")
+    parser.add_argument("--jobs", type=int, default=2, help="Stages run at the same time")
+    parser.add_argument("--force", nargs="*", default=None, metavar="STAGE",
+                        help="Rerun these stages even if current (no names: all of them)")
+    parser.add_argument("--dry-run", action="store_true", help="Only print which stages would run")
+    parser.add_argument("--list", action="store_true", help="Print the stages and their dependencies")
+    parser.add_argument("--capture-args", default="", help="Extra options for Screenshots.py, e.g. \"--workers 2\"")
+    parser.add_argument("--extract-args", default="--engine async", help="Options for Main_CSV.py")
+    parser.add_argument("--plots-dir", default="plots")
+    parser.add_argument("--state", default=default_state_path)
+    args = parser.parse_args()
+
+    stages = build_stages(shlex.split(args.capture_args), shlex.split(args.extract_args), args.plots_dir)
+    if args.list:
+        for stage in resolve(stages):
+            print(f"{stage.name:<20} <- {', '.join(dependency.name for dependency in stage.dependencies) or '-'}")
+        raise SystemExit
+    force = ["all"] if args.force == [] else args.force or []
+    try:
+        statuses = run_pipeline(stages, args.targets, args.jobs, args.state, force=force, dry_run=args.dry_run)
+    except ValueError as e:
+        parser.error(str(e))
+    if any(status in ("failed", "blocked") for status in statuses.values()):
+        raise SystemExit(1)
@@ -0,0 +1,114 @@
+import os
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+# Preprocessing stage between capture and upload.
+#
+# The raw screenshots are full-window PNGs including browser chrome, side panels
+# and empty margins. Each one is cropped to the timeline column, capped in
+# resolution, optionally converted to grayscale and re-encoded as JPEG or WebP,
+# which cuts both upload bytes and image tokens. Output mirrors the input
+# layout (<output_root>/<tweet_id>/screenshot_N.jpg) so Main_CSV.py can be
+# pointed at it with --screenshots-root.
+
+# Default crop box as fractions of (left, top, right, bottom). On a maximized
+# window the X timeline column sits roughly in this band; tune per screen.
+timeline_crop = (0.25, 0.0, 0.65, 1.0)
+
+formats = {"jpeg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
+
+# Function to parse "left,top,right,bottom" or "none"
+def parse_crop(value):
+    if value.lower() == "none":
+        return None
+    crop = tuple(float(part) for part in value.split(","))
+    if len(crop) != 4 or not all(0.0 <= part <= 1.0 for part in crop) or crop[0] >= crop[2] or crop[1] >= crop[3]:
+        raise argparse.ArgumentTypeError("crop must be four fractions left,top,right,bottom or 'none'")
+    return crop
+
+# Function to preprocess one screenshot; returns (bytes before, bytes after, seconds)
+def preprocess_image(source_path, target_path, crop=timeline_crop, max_size=(1024, 2048),
+                     grayscale=False, image_format="jpeg", quality=80):
+    start = time.perf_counter()
+    with Image.open(source_path) as image:
+        if crop is not None:
+            width, height = image.size
+            image = image.crop((
+                round(crop[0] * width), round(crop[1] * height),
+                round(crop[2] * width), round(crop[3] * height)
+            ))
+        image = image.convert("L" if grayscale else "RGB")
+        image.thumbnail(max_size, Image.LANCZOS)
+        pil_format, _ = formats[image_format]
+        image.save(target_path, pil_format, quality=quality, optimize=True)
+    return os.path.getsize(source_path), os.path.getsize(target_path), time.perf_counter() - start
+
+def _preprocess_job(job):
+    source_path, target_path, options = job
+    return preprocess_image(source_path, target_path, **options)
+
+# Function to preprocess every screenshot under input_root across a process pool
+def preprocess_tree(input_root, output_root, workers=None, **options):
+    _, extension = formats[options.get("image_format", "jpeg")]
+    jobs = []
+    for folder_name in os.listdir(input_root):
+        folder_path = os.path.join(input_root, folder_name)
+        if not os.path.isdir(folder_path):
+            continue
+        os.makedirs(os.path.join(output_root, folder_name), exist_ok=True)
+        for file_name in os.listdir(folder_path):
+            if file_name.endswith(".png"):
+                target_name = os.path.splitext(file_name)[0] + extension
+                jobs.append((
+                    os.path.join(folder_path, file_name),
+                    os.path.join(output_root, folder_name, target_name),
+                    options
+                ))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_preprocess_job, jobs, chunksize=8))
+    elapsed = time.perf_counter() - start
+
+    bytes_before = sum(result[0] for result in results)
+    bytes_after = sum(result[1] for result in results)
+    image_seconds = [result[2] for result in results]
+    return {
+        "images": len(results),
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "elapsed": elapsed,
+        "mean_image_seconds": sum(image_seconds) / len(image_seconds) if image_seconds else 0.0,
+    }
+
+# Function to print the size and latency report
+def report(stats):
+    ratio = stats["bytes_after"] / stats["bytes_before"] if stats["bytes_before"] else 0.0
+    print(f"Preprocessed {stats['images']} screenshots in {stats['elapsed']:.2f}s "
+          f"(mean {stats['mean_image_seconds'] * 1000:.0f} ms per image)")
+    print(f"Bytes: {stats['bytes_before'] / 1e6:.1f} MB before, {stats['bytes_after'] / 1e6:.1f} MB after "
+          f"({ratio:.0%} of original)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crop, downscale and re-encode screenshots before upload.")
+    parser.add_argument("--input-root", default="Screenshots/trump/replies")
+    parser.add_argument("--output-root", default="Screenshots_preprocessed/trump/replies")
+    parser.add_argument("--crop", type=parse_crop, default=timeline_crop,
+                        help="Crop box as fractions left,top,right,bottom, or 'none'")
+    parser.add_argument("--max-width", type=int, default=1024)
+    parser.add_argument("--max-height", type=int, default=2048)
+    parser.add_argument("--grayscale", action="store_true")
+    parser.add_argument("--format", choices=sorted(formats), default="jpeg")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG/WebP quality (1-100)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    stats = preprocess_tree(
+        args.input_root, args.output_root, workers=args.workers,
+        crop=args.crop, max_size=(args.max_width, args.max_height),
+        grayscale=args.grayscale, image_format=args.format, quality=args.quality
+    )
+    report(stats)
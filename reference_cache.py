@@ -0,0 +1,86 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+# Uploaded files are deleted by the API after 48 hours
+reference_ttl_seconds = 47 * 60 * 60
+
+# Re-upload a little before the API's own expiration time
+expiry_margin_seconds = 10 * 60
+
+# Function to turn an expiration time reported by the API into a time.time() deadline
+def deadline_from(expiration_time, fallback_seconds):
+    if isinstance(expiration_time, datetime):
+        if expiration_time.tzinfo is None:
+            expiration_time = expiration_time.replace(tzinfo=timezone.utc)
+        return expiration_time.timestamp() - expiry_margin_seconds
+    return time.time() + fallback_seconds - expiry_margin_seconds
+
+
+# Upload-once cache for the Completeness.jpg reference image.
+#
+# The reference is uploaded once per API key and the handle reused until it
+# expires; an expired handle is uploaded again. Call evict(key_name) when a key
+# is rotated out or one of its requests fails, so a stale handle is never reused.
+#
+# get_context() optionally goes one step further and keeps, per key, a model
+# whose cached context already holds the static prompt and the reference image,
+# so each request only carries the new screenshot.
+class ReferenceCache:
+    def __init__(self, reference_path, ttl_seconds=reference_ttl_seconds, context_ttl_seconds=60 * 60):
+        self.reference_path = reference_path
+        self.ttl_seconds = ttl_seconds
+        self.context_ttl_seconds = context_ttl_seconds
+        self._references = {}  # key_name -> (handle, deadline)
+        self._contexts = {}  # key_name -> (model, deadline); model is None if caching was refused
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self.uploads = 0
+        self.reuses = 0
+
+    def _lock_for(self, key_name):
+        with self._locks_lock:
+            return self._locks.setdefault(key_name, threading.Lock())
+
+    # Function to get the reference handle for a key, uploading it only when needed
+    def get(self, key_name, upload_file):
+        with self._lock_for(key_name):
+            entry = self._references.get(key_name)
+            if entry and entry[1] > time.time():
+                self.reuses += 1
+                return entry[0]
+
+            handle = upload_file(self.reference_path)
+            deadline = deadline_from(getattr(handle, "expiration_time", None), self.ttl_seconds)
+            self._references[key_name] = (handle, deadline)
+            self.uploads += 1
+            print(f"Uploaded reference image {self.reference_path} for {key_name}")
+            return handle
+
+    # Function to get a model whose cached context holds the prompt and reference.
+    # create_context(reference) must return (model, expire_time). Returns None when
+    # context caching is unavailable for this key, so the caller can fall back to
+    # sending the prompt and reference with every request.
+    def get_context(self, key_name, upload_file, create_context):
+        reference = self.get(key_name, upload_file)
+        with self._lock_for(key_name):
+            entry = self._contexts.get(key_name)
+            if entry and entry[1] > time.time():
+                return entry[0]
+
+            try:
+                model, expire_time = create_context(reference)
+                deadline = deadline_from(expire_time, self.context_ttl_seconds)
+                print(f"Created cached context for {key_name}")
+            except Exception as e:
+                # e.g. the prompt and image are below the API's minimum cacheable size
+                print(f"Context caching unavailable for {key_name}, sending prompt with each request: {e}")
+                model, deadline = None, time.time() + self.context_ttl_seconds
+            self._contexts[key_name] = (model, deadline)
+            return model
+
+    # Function to forget everything cached for a key
+    def evict(self, key_name):
+        with self._lock_for(key_name):
+            self._references.pop(key_name, None)
+            self._contexts.pop(key_name, None)
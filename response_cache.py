@@ -0,0 +1,107 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# Default location of the on-disk response cache
+default_cache_path = ".gemini_cache.sqlite"
+
+# Function to hash a file's bytes
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Function to build the cache key for one request: the SHA-256 of the input
+# content together with everything else that changes the model's answer
+def cache_key(content_sha256, prompt, model_name, generation_config):
+    material = json.dumps(
+        {
+            "content": content_sha256,
+            "prompt": prompt,
+            "model_name": model_name,
+            "generation_config": generation_config,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# Content-addressed cache of Gemini response texts, stored in SQLite.
+#
+# A hit means the exact same input bytes were already sent with the same prompt,
+# model and generation_config, so the stored response can be reused without a
+# network call. Entries older than max_age_seconds are dropped, and the least
+# recently used entries are dropped once the stored text exceeds max_bytes.
+class ResponseCache:
+    def __init__(self, path=default_cache_path, max_bytes=512 * 1024 * 1024, max_age_seconds=90 * 24 * 60 * 60):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.commit()
+        self.evict()
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < time.time() - self.max_age_seconds:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response_text):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response_text, len(response_text.encode("utf-8")), now, now),
+            )
+            self._connection.commit()
+            self.writes += 1
+
+    # Function to drop expired entries, then least recently used ones until under max_bytes
+    def evict(self):
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.max_age_seconds,)
+            )
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._connection.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+                doomed = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self._connection.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._connection.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return f"Response cache: {self.hits} hits, {self.misses} misses ({hit_rate:.0%} hit rate), {self.writes} writes"
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,110 @@
+import os
+import json
+
+# Streaming access to the results files, so post-processing holds one entry in
+# memory at a time instead of json.load-ing the whole array.
+#
+# Two formats are supported, chosen by file extension:
+#   .json   the existing format, one JSON array of entries
+#   .jsonl  one entry per line; can be appended to without rewriting the file
+# iter_entries reads either one incrementally, and EntryWriter writes either one
+# entry by entry.
+
+read_chunk_size = 1 << 16
+
+# Function to check whether a path uses the one-entry-per-line format
+def is_jsonl(path):
+    return path.lower().endswith(".jsonl")
+
+# Function to yield the entries of a .json array or .jsonl file one at a time
+def iter_entries(path):
+    if is_jsonl(path):
+        with open(path, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, 1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"{path} line {line_number}: {e}") from e
+        return
+
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as file:
+        buffer = ""
+        position = 0
+        consumed = 0  # characters dropped from the front of buffer
+        started = False
+        at_end = False
+        while True:
+            # Skip whitespace and the separators between entries
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] in ",["):
+                if buffer[position] == "[":
+                    if started:
+                        break
+                    started = True
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            if position < len(buffer) and started:
+                try:
+                    entry, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if at_end:
+                        raise ValueError(f"{path}: invalid or truncated entry at character {consumed + position}")
+                else:
+                    # A number could continue in the next chunk, so only trust a value that ends before the buffer does
+                    if end < len(buffer) or at_end:
+                        yield entry
+                        position = end
+                        continue
+            elif at_end:
+                if not started:
+                    raise ValueError(f"{path}: expected a JSON array")
+                raise ValueError(f"{path}: array is not closed")
+
+            # Need more text: drop what has been consumed and read the next chunk
+            chunk = file.read(read_chunk_size)
+            buffer = buffer[position:] + chunk
+            consumed += position
+            position = 0
+            at_end = not chunk
+
+
+# Writes entries one at a time as a .json array or .jsonl lines.
+# append=True adds to an existing .jsonl file; a .json array can only be written fresh.
+class EntryWriter:
+    def __init__(self, path, append=False):
+        self.path = path
+        self.jsonl = is_jsonl(path)
+        if append and not self.jsonl:
+            raise ValueError(f"Can only append to a .jsonl file, not {path}")
+        self.count = 0
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+        if not self.jsonl:
+            self._file.write("[")
+
+    def write(self, entry):
+        if self.jsonl:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        else:
+            text = json.dumps(entry, indent=4, ensure_ascii=False)
+            self._file.write(("," if self.count else "") + "\n    " + text.replace("\n", "\n    "))
+        self.count += 1
+
+    def close(self):
+        if not self.jsonl:
+            self._file.write("\n]" if self.count else "]")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Function to collect the (tweet_id, file_name) pairs already in an output file,
+# so an appending run can skip them
+def written_keys(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    return {(entry.get("tweet_id", ""), entry.get("file_name", "")) for entry in iter_entries(path)}
@@ -0,0 +1,120 @@
+import os
+import csv
+import json
+import time
+import tempfile
+from datetime import datetime, timezone
+
+# Function to get the manifest path that sits alongside an output file
+def manifest_path_for(output_file):
+    return os.path.splitext(output_file)[0] + ".manifest.json"
+
+
+# Durable record of which (tweet_id, file_name) pairs a run has processed.
+#
+# Each entry stores the status ("success" or "failed"), the number of attempts
+# made across all runs, the number of rows written and the last error. The file
+# is rewritten atomically (temporary file + os.replace), so a crash leaves either
+# the previous or the new manifest on disk, never half of one. Rewriting it after
+# every update would make a run quadratic in its length, so it is saved after
+# save_every updates (or an eighth of the entries, whichever is more, keeping the
+# total rewriting linear), after save_interval seconds, and by flush() at the end.
+# A crash can lose the last unsaved updates: those screenshots are processed
+# again, and drop_unrecorded_rows() removes the rows they already wrote.
+class RunManifest:
+    def __init__(self, path, save_every=100, save_interval=10.0):
+        self.path = path
+        self.entries = {}
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self.entries = json.load(file).get("entries", {})
+
+    @staticmethod
+    def _key(tweet_id, file_name):
+        return f"{tweet_id}/{file_name}"
+
+    def is_done(self, tweet_id, file_name):
+        entry = self.entries.get(self._key(tweet_id, file_name))
+        return entry is not None and entry["status"] == "success"
+
+    def record(self, tweet_id, file_name, succeeded, attempts=1, rows=0, error=None):
+        key = self._key(tweet_id, file_name)
+        entry = self.entries.get(key, {"attempts": 0})
+        self.entries[key] = {
+            "tweet_id": tweet_id,
+            "file_name": file_name,
+            "status": "success" if succeeded else "failed",
+            "attempts": entry["attempts"] + attempts,
+            "rows": rows,
+            "error": error,
+            "updated": datetime.now(timezone.utc).isoformat(),
+        }
+        self._unsaved += 1
+        due = max(self.save_every, len(self.entries) // 8)
+        if self._unsaved >= due or time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    # Function to save the updates not saved yet
+    def flush(self):
+        if self._unsaved:
+            self.save()
+
+    # Function to forget everything, for a fresh (non-resumed) run
+    def reset(self):
+        self.entries = {}
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix=".manifest-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump({"entries": self.entries}, file, indent=1)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    # Function to remove the rows of screenshots without a recorded success from
+    # an output CSV whose first two columns are tweet_id and file_name. Those
+    # screenshots are processed again, so their rows would otherwise appear twice.
+    # Returns the number of rows removed.
+    def drop_unrecorded_rows(self, csv_path):
+        directory = os.path.dirname(os.path.abspath(csv_path))
+        fd, temp_path = tempfile.mkstemp(prefix=".output-", suffix=".tmp", dir=directory)
+        dropped = 0
+        try:
+            with open(csv_path, "r", newline="", encoding="utf-8") as source, \
+                    os.fdopen(fd, "w", newline="", encoding="utf-8") as target:
+                reader = csv.reader(source)
+                writer = csv.writer(target)
+                header = next(reader, None)
+                if header is not None:
+                    writer.writerow(header)
+                for row in reader:
+                    if len(row) >= 2 and not self.is_done(row[0], row[1]):
+                        dropped += 1
+                        continue
+                    writer.writerow(row)
+            if dropped:
+                os.replace(temp_path, csv_path)
+            else:
+                os.remove(temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return dropped
+
+    def summary(self):
+        succeeded = sum(1 for entry in self.entries.values() if entry["status"] == "success")
+        failed = len(self.entries) - succeeded
+        return f"Manifest {self.path}: {succeeded} succeeded, {failed} failed"
@@ -0,0 +1,83 @@
+from collections import defaultdict
+from dedup_screenshots import screenshot_number
+
+# Multi-screenshot batching: several screenshots of the same tweet_id go into a
+# single generate_content call, so the long prompt and the reference image are
+# paid for once per batch instead of once per screenshot. Every CSV row in the
+# response starts with an image_index field that maps it back to its file_name.
+
+# Extra instructions appended to the normal prompt in batch mode
+def batch_instructions(count):
+    return (
+        "\n\nBATCH MODE: Ignore the instruction to only analyze the second image. "
+        f"After the reference image you are given {count} screenshots, numbered 1 to {count} in the order they appear. "
+        "Analyze every one of them. Start each CSV row with an extra image_index field holding the number "
+        "of the screenshot the tweet was found in, followed by the usual 21 fields, for example:\n"
+        '2,1,"reply","Tweet text here","username","Image description here",0,0,0,0,"time",false,'
+        "0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0"
+    )
+
+
+# Raised when a batch response was cut off by max_output_tokens
+class TruncatedResponse(Exception):
+    pass
+
+
+# Function to check whether the model stopped because it ran out of output tokens
+def is_truncated(response):
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return False
+    return getattr(reason, "name", reason) in ("MAX_TOKENS", 2)
+
+# Function to split (tweet_id, file_name, file_path) jobs into batches that never
+# mix tweet_ids, keeping each tweet's screenshots in capture order
+def group_batches(jobs, batch_size):
+    by_tweet = defaultdict(list)
+    for job in jobs:
+        by_tweet[job[0]].append(job)
+
+    batches = []
+    for tweet_jobs in by_tweet.values():
+        tweet_jobs.sort(key=lambda job: screenshot_number(job[1]))
+        for start in range(0, len(tweet_jobs), batch_size):
+            batches.append(tweet_jobs[start:start + batch_size])
+    return batches
+
+# Function to split a batch response into per-screenshot rows.
+# parse_rows validates the remaining 21-field lines (parse_and_validate_csv).
+# Returns a list of (job, rows) in batch order.
+def parse_batch_response(text, batch, parse_rows):
+    lines_by_index = defaultdict(list)
+    for line in text.strip().split("\n"):
+        index_field, _, rest = line.strip().partition(",")
+        try:
+            index = int(index_field.strip().strip('"')) - 1
+        except ValueError:
+            continue  # header line, code fence or stray text
+        if 0 <= index < len(batch):
+            lines_by_index[index].append(rest)
+    return [(job, parse_rows("\n".join(lines_by_index[index]))) for index, job in enumerate(batch)]
+
+
+# Batch size that adapts to truncation: a batch cut off by max_output_tokens
+# halves the size used from then on, and after `grow_after` complete batches in a
+# row the size creeps back up by one, never past max_size.
+class AdaptiveBatchSize:
+    def __init__(self, max_size, grow_after=4):
+        self.max_size = max(1, max_size)
+        self.size = self.max_size
+        self.grow_after = grow_after
+        self._complete_in_a_row = 0
+
+    def truncated(self, observed_size):
+        self.size = max(1, min(self.size, observed_size // 2))
+        self._complete_in_a_row = 0
+        print(f"Batch of {observed_size} was truncated; batch size is now {self.size}")
+
+    def complete(self):
+        self._complete_in_a_row += 1
+        if self._complete_in_a_row >= self.grow_after and self.size < self.max_size:
+            self.size += 1
+            self._complete_in_a_row = 0
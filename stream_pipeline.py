@@ -0,0 +1,103 @@
+import os
+import queue
+import argparse
+import tempfile
+import threading
+import time
+from capture_pool import capture_screenshots, link_id
+from frame_writer import make_frame_writer
+
+# Streaming capture -> analysis: instead of capturing every link with
+# Screenshots.py and only then walking the folders with Main_CSV.py, each frame
+# is handed to the AnalysisEngine as soon as the FrameWriter has it on disk,
+# while the browser keeps scrolling. The hand-over queue is bounded, so when
+# the API side falls behind, the writer and then the capture loop wait for it.
+# Run this file directly to compare the two with the fake driver and backend.
+
+# Function to capture links in a background thread and feed each written frame
+# to the engine. Frames go to screenshots_root/<tweet_id>/, the layout Main_CSV.py
+# reads (Screenshots.py's <output-dir>/replies). job_filter(tweet_id, file_name) can drop frames (e.g. ones the
+# manifest already has). Returns (engine stats, per-link capture results).
+def run_pipeline(engine, driver, links, screenshots_root, on_result, max_queued_jobs=8, job_filter=None,
+                 writer_options=None, **capture_options):
+    jobs = queue.Queue(maxsize=max_queued_jobs)
+    capture_results = []
+
+    # Called on the writer thread; blocks while the analysis queue is full
+    def enqueue(path):
+        tweet_id = os.path.basename(os.path.dirname(path))
+        file_name = os.path.basename(path)
+        if job_filter is None or job_filter(tweet_id, file_name):
+            jobs.put((tweet_id, file_name, path))
+
+    def capture():
+        writer = make_frame_writer(on_written=enqueue, **(writer_options or {}))
+        try:
+            for tweet_link in links:
+                save_dir = os.path.join(screenshots_root, link_id(tweet_link))
+                capture_results.append(capture_screenshots(driver, tweet_link, save_dir, writer=writer,
+                                                           **capture_options))
+        finally:
+            # Write the last frames, then tell the engine nothing more is coming
+            writer.close()
+            jobs.put(None)
+
+    capture_thread = threading.Thread(target=capture, daemon=True)
+    capture_thread.start()
+    stats = engine.run_stream_sync(jobs, on_result)
+    capture_thread.join()
+    return stats, capture_results
+
+
+if __name__ == "__main__":
+    from analysis_engine import AnalysisEngine, list_screenshot_jobs
+    from capture_drivers import FakeCaptureDriver
+    from fake_gemini import FakeGeminiBackend
+
+    parser = argparse.ArgumentParser(
+        description="Compare capture-then-analyze against the streaming pipeline, with a fake browser and fake Gemini.")
+    parser.add_argument("--links", type=int, default=4, help="Number of fake tweet links")
+    parser.add_argument("--frames", type=int, default=8, help="Frames per fake page")
+    parser.add_argument("--scroll-latency", type=float, default=0.2, help="Fake seconds per page load and scroll")
+    parser.add_argument("--keys", type=int, default=2, help="Number of fake API keys")
+    parser.add_argument("--concurrency", type=int, default=2, help="Requests in flight per key")
+    parser.add_argument("--generate-latency", type=float, default=0.4, help="Fake seconds per generate call")
+    parser.add_argument("--queue", type=int, default=8, help="Frames waiting for analysis before capture blocks")
+    args = parser.parse_args()
+
+    links = [f"https://x.com/user/status/18000000000000000{i}" for i in range(args.links)]
+    capture_options = {"poll_interval": 0.02, "scroll_timeout": 2.0, "end_after": 1}
+
+    def make_driver():
+        return FakeCaptureDriver(frames_per_page=args.frames, load_latency=args.scroll_latency,
+                                 scroll_latency=args.scroll_latency)
+
+    def make_engine():
+        backends = [FakeGeminiBackend(key_name=f"GEMINI_API_KEY{i + 1}", upload_latency=0.0,
+                                      generate_latency=args.generate_latency) for i in range(args.keys)]
+        return AnalysisEngine(backends, prompt="prompt", reference_path="Completeness.jpg",
+                              parse_response=lambda text: text.strip().split("\n"),
+                              concurrency_per_key=args.concurrency)
+
+    with tempfile.TemporaryDirectory() as root:
+        # Two phases: capture everything, then analyze the folders
+        start = time.perf_counter()
+        driver = make_driver()
+        for tweet_link in links:
+            capture_screenshots(driver, tweet_link, os.path.join(root, "batch", "replies", link_id(tweet_link)),
+                                **capture_options)
+        capture_elapsed = time.perf_counter() - start
+        batch_stats = make_engine().run_sync(list_screenshot_jobs(os.path.join(root, "batch", "replies")),
+                                             lambda result: None)
+        batch_elapsed = time.perf_counter() - start
+
+        # Streaming: analysis starts with the first frame
+        start = time.perf_counter()
+        stream_stats, _ = run_pipeline(make_engine(), make_driver(), links, os.path.join(root, "stream", "replies"),
+                                       lambda result: None, max_queued_jobs=args.queue, **capture_options)
+        stream_elapsed = time.perf_counter() - start
+
+    print(f"Capture then analyze: {batch_elapsed:.2f}s ({capture_elapsed:.2f}s capture + "
+          f"{batch_stats['elapsed']:.2f}s analysis, {batch_stats['succeeded']} screenshots)")
+    print(f"Streaming:            {stream_elapsed:.2f}s ({stream_stats['succeeded']} screenshots)")
+    print(f"Speedup: {batch_elapsed / stream_elapsed:.1f}x")
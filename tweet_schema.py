@@ -0,0 +1,124 @@
+import json
+
+# The 21-field tweet record extracted from each screenshot, in CSV column order.
+# Used to request schema-constrained JSON from Gemini (response_schema) and to
+# validate the answer locally, which removes the need for the LLM repair passes
+# in Main.py and json_to_csv.py.
+
+score_fields = [
+    "pro_trump", "hostile_to_trump", "sarcastic_about_trump", "ambivalent_about_trump",
+    "nationalist_pro_trump", "anti_elite_pro_trump", "fearful_pro_trump",
+    "optimistic_about_trump", "skeptical_of_trump", "disengaged_from_trump"
+]
+
+tweet_fields = {
+    "completeness": {"type": "integer"},
+    "content_type": {"type": "string", "enum": ["tweet", "reply"]},
+    "text_body": {"type": "string"},
+    "username": {"type": "string"},
+    "image_text_description": {"type": "string"},
+    "likes": {"type": "integer"},
+    "replies": {"type": "integer"},
+    "retweets": {"type": "integer"},
+    "views": {"type": "integer"},
+    "time_of_post": {"type": "string"},
+    "promotional_or_irrelevant": {"type": "boolean"},
+    **{field: {"type": "number"} for field in score_fields},
+}
+
+field_names = list(tweet_fields)
+
+response_schema = {
+    "type": "object",
+    "properties": {
+        "tweets": {
+            "type": "array",
+            "items": {"type": "object", "properties": tweet_fields, "required": field_names},
+        }
+    },
+    "required": ["tweets"],
+}
+
+# Output instructions that replace the CSV format section of the prompt
+json_format_instructions = (
+    "Return a JSON object with a \"tweets\" array holding one object per complete tweet, "
+    "using exactly these fields: " + ", ".join(field_names) + ". "
+    "Counts (likes, replies, retweets, views) are integers, so write 1.6k as 1600. "
+    "Scores are numbers between -1 and 1.\n\n"
+)
+
+# Function to add structured JSON output to a generation_config
+def structured_generation_config(generation_config):
+    return {
+        **generation_config,
+        "response_mime_type": "application/json",
+        "response_schema": response_schema,
+    }
+
+
+# Raised for a tweet object that does not match the schema
+class SchemaError(ValueError):
+    pass
+
+
+def _check_field(name, value):
+    expected = tweet_fields[name]["type"]
+    if expected == "integer":
+        # The model sometimes writes whole numbers as 16.0
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+            raise SchemaError(f"{name} should be an integer, got {value!r}")
+        return int(value)
+    if expected == "number":
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise SchemaError(f"{name} should be a number, got {value!r}")
+        if name in score_fields and not -1.0 <= value <= 1.0:
+            raise SchemaError(f"{name} should be between -1 and 1, got {value!r}")
+        return float(value)
+    if expected == "boolean":
+        if not isinstance(value, bool):
+            raise SchemaError(f"{name} should be true or false, got {value!r}")
+        return value
+    if not isinstance(value, str):
+        raise SchemaError(f"{name} should be a string, got {value!r}")
+    if "enum" in tweet_fields[name] and value not in tweet_fields[name]["enum"]:
+        raise SchemaError(f"{name} should be one of {tweet_fields[name]['enum']}, got {value!r}")
+    return value
+
+# Function to validate one tweet object; returns its values in CSV column order
+def validate_tweet(tweet):
+    if not isinstance(tweet, dict):
+        raise SchemaError(f"tweet should be an object, got {tweet!r}")
+    missing = [name for name in field_names if name not in tweet]
+    if missing:
+        raise SchemaError(f"missing fields: {', '.join(missing)}")
+    values = [_check_field(name, tweet[name]) for name in field_names]
+    if values[0] not in (0, 1):
+        raise SchemaError(f"completeness should be 0 or 1, got {values[0]!r}")
+    return values
+
+# Function to parse and validate a structured response.
+# Returns a list of rows (lists of 21 values); invalid tweets are skipped.
+def parse_and_validate_json(response_text):
+    try:
+        data = json.loads(response_text)
+    except json.JSONDecodeError as e:
+        print(f"Skipping response that is not valid JSON: {e}")
+        return []
+    tweets = data.get("tweets") if isinstance(data, dict) else None
+    if not isinstance(tweets, list):
+        print("Skipping response without a tweets array")
+        return []
+
+    rows = []
+    for tweet in tweets:
+        try:
+            rows.append(validate_tweet(tweet))
+        except SchemaError as e:
+            print(f"Skipping invalid tweet: {e}")
+    return rows
+
+# Function to format a validated value the way the CSV output writes it
+def csv_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
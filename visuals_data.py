@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import pandas as pd
+from aggregate_store import AggregateStore
+
+# Shared data loader for visuals.py and visuals_ui.py.
+#
+# The sentiment CSVs are parsed once into a typed columnar cache (Parquet when
+# pyarrow is installed, pickle otherwise) with `candidate` as a categorical.
+# The long (melted) frame, the per-candidate means and the per-candidate
+# correlation matrices are computed at the same time and cached with it. The
+# cache is reused until a source CSV's content hash changes, so startup only
+# reads the cache and no plot has to melt or group the data itself. Means and
+# correlations come from an incremental aggregate store (aggregate_store.py), so
+# rows appended to a CSV only cost their own share of that work.
+
+# Sentiment CSV for each candidate, in plotting order
+candidate_files = {"Trump": "trump_sentiment.csv", "Kamala": "kamala_sentiment.csv"}
+
+# List of sentiment columns for analysis
+sentiment_columns = [
+    'supportive', 'hostile', 'sarcastic', 'ambivalent', 'nationalist',
+    'anti_elite', 'fearful', 'optimistic', 'skeptical', 'disengaged'
+]
+
+# The CSVs live next to the scripts unless --data-dir says otherwise
+default_data_dir = os.path.dirname(os.path.abspath(__file__))
+default_cache_dir = ".visuals_cache"
+
+# Bump when the cached layout changes, so older caches are rebuilt
+cache_version = 1
+
+# Function to pick the cache format: Parquet if pyarrow is available, pickle otherwise
+def columnar_format():
+    try:
+        import pyarrow  # noqa: F401
+        return "parquet"
+    except ImportError:
+        return "pickle"
+
+def _write_frame(frame, path, file_format):
+    if file_format == "parquet":
+        frame.to_parquet(path, index=True)
+    else:
+        frame.to_pickle(path)
+
+def _read_frame(path, file_format):
+    if file_format == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+# Function to fingerprint a source file by its SHA-256. The hash of an earlier
+# fingerprint is reused when size and modification time have not changed.
+def file_fingerprint(path, known=None):
+    stat = os.stat(path)
+    if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+        return dict(known)
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+# The loaded data and everything precomputed from it:
+#   combined      one row per tweet, `candidate` categorical
+#   long          combined melted to (candidate, variable, value) over sentiment_columns
+#   means         mean of each sentiment column per candidate
+#   correlations  sentiment correlation matrix per candidate
+#   fingerprint   hash of the source CSVs' contents (set by load_visuals_data)
+class VisualsData:
+    def __init__(self, combined, long, means, correlations):
+        self.combined = combined
+        self.long = long
+        self.means = means
+        self.correlations = correlations
+        self.candidates = list(combined["candidate"].cat.categories)
+        self.fingerprint = None
+
+    # aggregates: an up-to-date AggregateStore to take the means and correlations
+    # from; without one they are computed from combined
+    @classmethod
+    def from_combined(cls, combined, aggregates=None):
+        long = combined.melt(id_vars=['candidate'], value_vars=sentiment_columns)
+        long["variable"] = pd.Categorical(long["variable"], categories=sentiment_columns)
+        if aggregates is not None:
+            means = aggregates.means_frame().reindex(list(combined['candidate'].cat.categories))
+            means.index.name = 'candidate'
+            correlations = aggregates.correlations()
+        else:
+            grouped = combined.groupby('candidate', observed=True)[sentiment_columns]
+            means = grouped.mean()
+            correlations = {candidate: frame.corr() for candidate, frame in grouped}
+        return cls(combined, long, means, correlations)
+
+
+# Function to read the candidate CSVs into one typed frame
+def read_sources(paths):
+    frames = []
+    for candidate, path in paths.items():
+        frame = pd.read_csv(path, dtype={"tweet_id": str})
+        frame['candidate'] = candidate
+        frames.append(frame)
+    combined = pd.concat(frames, ignore_index=True)
+    combined['candidate'] = pd.Categorical(combined['candidate'], categories=list(paths))
+    combined[sentiment_columns] = combined[sentiment_columns].apply(pd.to_numeric, errors="coerce")
+    return combined
+
+# Function to load the visuals data, from the cache when the CSVs are unchanged.
+# Returns a VisualsData.
+def load_visuals_data(data_dir=default_data_dir, cache_dir=None, verbose=True):
+    start = time.perf_counter()
+    paths = {candidate: os.path.join(data_dir, file_name) for candidate, file_name in candidate_files.items()}
+    cache_dir = cache_dir or os.path.join(data_dir, default_cache_dir)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    file_format = columnar_format()
+    extension = ".parquet" if file_format == "parquet" else ".pkl"
+    cache_files = {name: os.path.join(cache_dir, name + extension)
+                   for name in ("combined", "long", "means", "correlations")}
+
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as file:
+            meta = json.load(file)
+    known = meta.get("sources", {})
+    sources = {candidate: file_fingerprint(path, known.get(candidate)) for candidate, path in paths.items()}
+
+    current = (meta.get("version") == cache_version and meta.get("format") == file_format
+               and [source["sha256"] for source in sources.values()]
+               == [known.get(candidate, {}).get("sha256") for candidate in sources]
+               and all(os.path.exists(path) for path in cache_files.values()))
+    if current:
+        correlations = _read_frame(cache_files["correlations"], file_format)
+        data = VisualsData(
+            _read_frame(cache_files["combined"], file_format),
+            _read_frame(cache_files["long"], file_format),
+            _read_frame(cache_files["means"], file_format),
+            {candidate: frame.droplevel(0) for candidate, frame in correlations.groupby(level=0, sort=False)}
+        )
+        source = "cache"
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        aggregates = AggregateStore.open(os.path.join(cache_dir, "aggregates.json"), sentiment_columns)
+        aggregates.update(paths)
+        aggregates.save()
+        data = VisualsData.from_combined(read_sources(paths), aggregates)
+        correlations = pd.concat(data.correlations, names=["candidate", "sentiment"])
+        for name, frame in (("combined", data.combined), ("long", data.long), ("means", data.means),
+                            ("correlations", correlations)):
+            _write_frame(frame, cache_files[name], file_format)
+        source = "CSV"
+
+    if sources != known or not current:
+        # Written last, so an interrupted rebuild is redone next time
+        with open(meta_path, "w", encoding="utf-8") as file:
+            json.dump({"version": cache_version, "format": file_format, "sources": sources}, file, indent=1)
+    data.fingerprint = hashlib.sha256(
+        "".join(source["sha256"] for source in sources.values()).encode("ascii")).hexdigest()
+    if verbose:
+        print(f"Loaded {len(data.combined)} rows from {source} in {time.perf_counter() - start:.2f}s")
+    return data
+
+# Command line options shared by the visuals scripts
+def data_dir_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--data-dir", default=default_data_dir,
+                        help="Folder holding trump_sentiment.csv and kamala_sentiment.csv")
+    parser.add_argument("--large-data", choices=["auto", "on", "off"], default="auto",
+                        help="Binned KDEs and sampled point plots (see visuals_large.py); "
+                             "auto turns them on for big datasets")
+    return parser
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+# Large-data helpers for visuals.py and visuals_ui.py.
+#
+# Past a few hundred thousand melted rows, seaborn's per-point plots (strip,
+# violin) and its KDEs (a Gaussian summed over every point) become the slow
+# part. In large-data mode:
+#   - KDEs are computed on a fixed grid: values are binned into a histogram and
+#     the histogram is convolved with a Gaussian kernel through the FFT, so the
+#     cost is one pass over the data plus O(bins log bins).
+#   - Point-heavy plots draw a stratified random sample, the same number of
+#     rows from every (candidate, sentiment) group, so small groups keep all
+#     their points and no group dominates.
+# Polarity counts are always vectorized (sign + bincount), in either mode.
+
+# Melted rows above which "auto" switches to large-data mode
+large_data_rows = 200_000
+
+# Rows drawn per (candidate, sentiment) group for point-heavy plots
+sample_rows_per_group = 5_000
+
+polarity_categories = ['Negative', 'Neutral', 'Positive']
+
+# Function to decide whether to use large-data mode: mode is "auto", "on" or "off"
+def use_large_data(data, mode="auto"):
+    if mode == "auto":
+        return len(data.long) > large_data_rows
+    return mode == "on"
+
+# Function to count negative, neutral and positive scores per candidate and sentiment.
+# Missing scores count as neutral. Returns a DataFrame indexed by (candidate,
+# Sentiment) with one column per polarity category.
+def polarity_counts(combined, sentiment_columns):
+    candidates = combined['candidate'].cat.categories
+    candidate_codes = combined['candidate'].cat.codes.to_numpy().astype(np.int64)
+    scores = combined[sentiment_columns].to_numpy(dtype=float)[candidate_codes >= 0]
+    candidate_codes = candidate_codes[candidate_codes >= 0]
+    # negative, zero, positive -> 0, 1, 2; NaN compares false both ways -> neutral
+    categories = (scores > 0).astype(np.int8) - (scores < 0) + 1
+    cell = (candidate_codes[:, None] * len(sentiment_columns) + np.arange(len(sentiment_columns))) * 3 + categories
+    counts = np.bincount(cell.ravel(), minlength=len(candidates) * len(sentiment_columns) * 3)
+    index = pd.MultiIndex.from_product([candidates, sentiment_columns], names=['candidate', 'Sentiment'])
+    return pd.DataFrame(counts.reshape(-1, 3), index=index, columns=polarity_categories)
+
+# Function to draw up to per_group random rows from every group of `by` columns.
+# Rows are shuffled, then stably sorted by group, so the first per_group rows of
+# each group are a uniform sample of it. Returns the sample in the original order.
+def stratified_sample(frame, by, per_group=sample_rows_per_group, seed=0):
+    groups = np.zeros(len(frame), dtype=np.int64)
+    for column in by:
+        codes, uniques = pd.factorize(frame[column])
+        groups = groups * (len(uniques) + 1) + codes + 1
+    groups = pd.factorize(groups)[0]
+    if len(frame) <= per_group:
+        return frame
+    shuffled = np.random.default_rng(seed).permutation(len(frame))
+    shuffled_groups = groups[shuffled]
+    order = np.argsort(shuffled_groups, kind="stable")
+    sizes = np.bincount(shuffled_groups)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rank = np.arange(len(frame)) - starts[shuffled_groups[order]]
+    keep = np.sort(shuffled[order[rank < per_group]])
+    return frame.iloc[keep]
+
+# Scott's rule bandwidth, as seaborn's kdeplot uses by default
+def scott_bandwidth(values):
+    spread = np.std(values)
+    if spread == 0:
+        spread = 0.1
+    return spread * len(values) ** (-1 / 5)
+
+# Gaussian kernel sampled at the grid spacing, normalized to sum to 1
+def _gaussian_kernel(bandwidth, spacing):
+    half_width = max(1, int(np.ceil(4 * bandwidth / spacing)))
+    offsets = np.arange(-half_width, half_width + 1) * spacing
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    return kernel / kernel.sum()
+
+# Function to convolve `counts` with `kernel` along one axis through the FFT
+def _fft_smooth(counts, kernel, axis):
+    size = counts.shape[axis] + len(kernel) - 1
+    fft_size = 1 << (size - 1).bit_length()
+    shape = [1] * counts.ndim
+    shape[axis] = -1
+    smoothed = np.fft.irfft(np.fft.rfft(counts, fft_size, axis=axis)
+                            * np.fft.rfft(kernel, fft_size).reshape(shape), fft_size, axis=axis)
+    start = len(kernel) // 2
+    return np.take(smoothed, np.arange(start, start + counts.shape[axis]), axis=axis).clip(min=0)
+
+# Function to estimate a 1D density on a grid of `bins` points.
+# Returns (grid, density); both empty when there are fewer than two values.
+def binned_kde(values, bins=512, bandwidth=None):
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) < 2:
+        return np.array([]), np.array([])
+    bandwidth = bandwidth or scott_bandwidth(values)
+    lower, upper = values.min() - 3 * bandwidth, values.max() + 3 * bandwidth
+    counts, edges = np.histogram(values, bins=bins, range=(lower, upper))
+    spacing = edges[1] - edges[0]
+    density = _fft_smooth(counts.astype(float), _gaussian_kernel(bandwidth, spacing), 0)
+    return (edges[:-1] + edges[1:]) / 2, density / (len(values) * spacing)
+
+# Function to estimate a 2D density of (x, y) on a bins x bins grid.
+# Returns (x grid, y grid, density indexed [x, y]).
+def binned_kde_2d(x, y, bins=128):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if len(x) < 2:
+        return np.array([]), np.array([]), np.zeros((0, 0))
+    bandwidths = (scott_bandwidth(x), scott_bandwidth(y))
+    ranges = [(values.min() - 3 * bandwidth, values.max() + 3 * bandwidth)
+              for values, bandwidth in zip((x, y), bandwidths)]
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins, range=ranges)
+    density = counts
+    for axis, (edges, bandwidth) in enumerate(zip((x_edges, y_edges), bandwidths)):
+        density = _fft_smooth(density, _gaussian_kernel(bandwidth, edges[1] - edges[0]), axis)
+    cell_area = (x_edges[1] - x_edges[0]) * (y_edges[1] - y_edges[0])
+    return (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, density / (len(x) * cell_area)
+
+# Function to draw the KDE plot grid (one panel per sentiment, one curve per
+# candidate) from binned densities instead of sns.kdeplot
+def plot_binned_kde_grid(long, candidates, sentiment_columns, palette='coolwarm', col_wrap=3):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    colors = sns.color_palette(palette, len(candidates))
+    rows = -(-len(sentiment_columns) // col_wrap)
+    figure, axes = plt.subplots(rows, col_wrap, figsize=(4 * col_wrap, 3 * rows), squeeze=False)
+    values = long['value'].to_numpy()
+    for panel, (ax, sentiment) in enumerate(zip(axes.flat, sentiment_columns)):
+        in_panel = (long['variable'] == sentiment).to_numpy()
+        for candidate, color in zip(candidates, colors):
+            grid, density = binned_kde(values[in_panel & (long['candidate'] == candidate).to_numpy()])
+            if len(grid):
+                ax.fill_between(grid, density, color=color, alpha=0.25)
+                ax.plot(grid, density, color=color, label=candidate)
+        ax.set_title(sentiment)
+        ax.set_xlabel("Sentiment Score")
+        ax.set_ylabel("Density" if panel % col_wrap == 0 else "")
+    for ax in axes.flat[len(sentiment_columns):]:
+        ax.set_visible(False)
+    figure.legend(*axes.flat[0].get_legend_handles_labels(), title='candidate', loc='center right')
+    return figure
+
+# Function to draw density contours of two sentiments per candidate from binned
+# 2D densities, in place of sns.jointplot(kind="kde")
+def plot_binned_joint_kde(combined, x, y, candidates, palette='coolwarm', levels=6):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from matplotlib.lines import Line2D
+    colors = sns.color_palette(palette, len(candidates))
+    figure = plt.figure(figsize=(8, 8))
+    handles = []
+    for candidate, color in zip(candidates, colors):
+        rows = combined[combined['candidate'] == candidate]
+        x_grid, y_grid, density = binned_kde_2d(rows[x], rows[y])
+        if density.size and density.max() > 0:
+            plt.contour(x_grid, y_grid, density.T, levels=levels, colors=[color])
+            handles.append(Line2D([0], [0], color=color, label=candidate))
+    plt.xlabel(x)
+    plt.ylabel(y)
+    plt.legend(handles=handles, title='candidate')
+    return figure
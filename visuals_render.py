@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+import aggregate_store
+import visuals_data
+import visuals_large
+import visuals_ui
+from visuals_data import load_visuals_data
+from visuals_large import use_large_data
+
+# Headless "render all" mode for visuals_ui.py: every plot is drawn with the
+# Agg backend in a pool of worker processes and saved to files. Each plot's
+# files are recorded in render_cache.json under a key made from the data
+# fingerprint, the plot function's source, the source of the helpers every plot
+# shares and the output settings, so a re-render skips plots whose inputs have
+# not changed.
+
+render_cache_file = "render_cache.json"
+
+# Bump to invalidate every cached figure, e.g. after a theme change
+render_version = 1
+
+# Modules the plot functions draw their data through; changing one re-renders every plot
+helper_modules = [visuals_data, visuals_large, aggregate_store]
+
+# Function to hash the code shared by every plot: the helper modules, and
+# visuals_ui's own loading and saving functions
+def helpers_digest():
+    digest = hashlib.sha256()
+    for source in ([inspect.getsource(module) for module in helper_modules]
+                   + [inspect.getsource(function) for function in (visuals_ui.load_data, visuals_ui.show)]):
+        digest.update(source.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+# Function to compute the cache key of one plot's output files
+def plot_key(fingerprint, name, formats, dpi, large_data, helpers=None):
+    digest = hashlib.sha256()
+    for part in (str(render_version), fingerprint, name, inspect.getsource(visuals_ui.plots[name]),
+                 helpers or helpers_digest(), ",".join(formats), str(dpi), str(large_data)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _init_worker(data_dir, output_dir, formats, dpi, large_data):
+    # No windows: draw into in-memory buffers only
+    matplotlib.use("Agg")
+    visuals_ui.load_data(data_dir, verbose=False)
+    visuals_ui.save_dir = output_dir
+    visuals_ui.save_formats = list(formats)
+    visuals_ui.save_dpi = dpi
+    visuals_ui.large_data_mode = "on" if large_data else "off"
+
+def _render_job(name):
+    start = time.perf_counter()
+    visuals_ui.saved_files.clear()
+    try:
+        visuals_ui.plots[name]()
+        error = None
+    except Exception as e:
+        error = str(e)
+    return name, list(visuals_ui.saved_files), error, time.perf_counter() - start
+
+# Function to render every plot in visuals_ui.plots into output_dir.
+# Returns {plot name: list of files} for the plots that rendered.
+def render_all(data_dir, output_dir, formats=("png",), dpi=100, workers=None, force=False, large_data_mode="auto"):
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    # Build or validate the data cache once here, so the workers only read it
+    data = load_visuals_data(data_dir)
+    fingerprint = data.fingerprint
+    large_data = use_large_data(data, large_data_mode)
+
+    cache_path = os.path.join(output_dir, render_cache_file)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+
+    helpers = helpers_digest()
+    keys = {name: plot_key(fingerprint, name, formats, dpi, large_data, helpers) for name in visuals_ui.plots}
+    pending = [
+        name for name in visuals_ui.plots
+        if force or cache.get(name, {}).get("key") != keys[name]
+        or not all(os.path.exists(path) for path in cache[name]["files"])
+    ]
+    for name in visuals_ui.plots:
+        if name not in pending:
+            print(f"Up to date: {name}")
+
+    failed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data_dir, output_dir, formats, dpi, large_data)) as executor:
+            for name, files, error, seconds in executor.map(_render_job, pending):
+                if error:
+                    # Not cached, so the next run tries it again
+                    print(f"Error rendering {name}: {error}")
+                    cache.pop(name, None)
+                    failed += 1
+                    continue
+                print(f"Rendered {name} in {seconds:.2f}s: {', '.join(os.path.basename(path) for path in files)}")
+                cache[name] = {"key": keys[name], "files": files}
+        with open(cache_path, "w", encoding="utf-8") as file:
+            json.dump(cache, file, indent=1)
+
+    print(f"Rendered {len(pending) - failed} of {len(visuals_ui.plots)} plots into {output_dir} "
+          f"in {time.perf_counter() - start:.2f}s ({len(visuals_ui.plots) - len(pending)} cached, {failed} failed)")
+    return {name: cache[name]["files"] for name in visuals_ui.plots if name in cache}
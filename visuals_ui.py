@@ -1,37 +1,46 @@
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from math import pi
+from visuals_data import data_dir_parser, load_visuals_data, sentiment_columns
+from visuals_large import polarity_counts, stratified_sample, use_large_data
 
-# Set the directory containing the files
-directory = 'C:/Users/Farhan/Desktop/Sem 7/Computational Social Science/Gemini_Image_Analysis'
+# Set a theme for clarity
+sns.set_theme(style="whitegrid")
 
-# Load the datasets
-trump_df = pd.read_csv(os.path.join(directory, 'trump_sentiment.csv'))
-kamala_df = pd.read_csv(os.path.join(directory, 'kamala_sentiment.csv'))
+# The datasets, with the melted frame and per-candidate aggregates precomputed; set by load_data()
+data = None
 
-# Add a new column to label each dataset
-trump_df['candidate'] = 'Trump'
-kamala_df['candidate'] = 'Kamala'
+# Render-all mode (see visuals_render.py): figures are saved here instead of shown
+save_dir = None
+save_formats = ["png"]
+save_dpi = 100
+saved_files = []
 
-# Concatenate both dataframes
-combined_df = pd.concat([trump_df, kamala_df], ignore_index=True)
+# "auto", "on" or "off": sample the violin plot's points for big datasets
+large_data_mode = "auto"
 
-# List of sentiment columns for analysis
-sentiment_columns = [
-    'supportive', 'hostile', 'sarcastic', 'ambivalent', 'nationalist', 
-    'anti_elite', 'fearful', 'optimistic', 'skeptical', 'disengaged'
-]
+def load_data(data_dir, verbose=True):
+    global data
+    data = load_visuals_data(data_dir, verbose=verbose)
 
-# Set a theme for clarity
-sns.set_theme(style="whitegrid")
+# Function to show the current figure, or save and close it in render-all mode
+def show(name):
+    if save_dir is None:
+        plt.show()
+        return
+    figure = plt.gcf()
+    for file_format in save_formats:
+        path = os.path.join(save_dir, f"{name}.{file_format}")
+        figure.savefig(path, dpi=save_dpi, bbox_inches="tight")
+        saved_files.append(path)
+    plt.close(figure)
 
 # Define visualization functions with explanations
 def bar_plot_mean_sentiment_scores():
     print("Visualization: Mean Sentiment Scores by Candidate")
     print("Interpretation: Shows average sentiment scores. Higher bars indicate stronger expressions of that sentiment for each candidate.")
-    mean_sentiments = combined_df.groupby('candidate')[sentiment_columns].mean().reset_index()
+    mean_sentiments = data.means.reset_index()
     mean_sentiment_melted = mean_sentiments.melt(id_vars='candidate', var_name='Sentiment', value_name='Mean Score')
     plt.figure(figsize=(14, 8))
     sns.barplot(data=mean_sentiment_melted, x='Sentiment', y='Mean Score', hue='candidate', palette='coolwarm')
@@ -41,13 +50,13 @@ def bar_plot_mean_sentiment_scores():
     plt.xticks(rotation=45)
     plt.legend(title='Candidate')
     plt.tight_layout()
-    plt.show()
+    show('mean_sentiment_scores')
 
 def box_plot_sentiment_distribution():
     print("Visualization: Sentiment Score Distribution by Candidate")
     print("Interpretation: Box plot shows score range and spread. Wider boxes indicate more variability in sentiment expressions.")
     plt.figure(figsize=(14, 8))
-    sns.boxplot(data=combined_df.melt(id_vars=['candidate'], value_vars=sentiment_columns), 
+    sns.boxplot(data=data.long, 
                 x='variable', y='value', hue='candidate', palette='coolwarm')
     plt.title('Sentiment Score Distribution by Candidate')
     plt.xlabel('Sentiment Type')
@@ -55,13 +64,16 @@ def box_plot_sentiment_distribution():
     plt.xticks(rotation=45)
     plt.legend(title='Candidate')
     plt.tight_layout()
-    plt.show()
+    show('sentiment_distribution_box')
 
 def violin_plot_density_distribution():
     print("Visualization: Density and Distribution of Sentiment Scores")
     print("Interpretation: Shows the density of scores. Thicker sections indicate where most scores fall for each candidate.")
     plt.figure(figsize=(14, 8))
-    sns.violinplot(data=combined_df.melt(id_vars=['candidate'], value_vars=sentiment_columns), 
+    plot_data = data.long
+    if use_large_data(data, large_data_mode):
+        plot_data = stratified_sample(data.long, ['candidate', 'variable'])
+    sns.violinplot(data=plot_data, 
                    x='variable', y='value', hue='candidate', split=True, palette='coolwarm')
     plt.title('Density and Distribution of Sentiment Scores by Candidate')
     plt.xlabel('Sentiment Type')
@@ -69,23 +81,22 @@ def violin_plot_density_distribution():
     plt.xticks(rotation=45)
     plt.legend(title='Candidate')
     plt.tight_layout()
-    plt.show()
+    show('sentiment_distribution_violin')
 
 def heatmap_correlation():
-    for candidate in ['Trump', 'Kamala']:
+    for candidate in data.candidates:
         print(f"Visualization: Sentiment Correlation Matrix for {candidate}")
         print("Interpretation: Highlights correlations between sentiments. Strong correlations (closer to 1 or -1) suggest frequent co-occurrence.")
-        candidate_df = combined_df[combined_df['candidate'] == candidate]
-        corr_matrix = candidate_df[sentiment_columns].corr()
+        corr_matrix = data.correlations[candidate]
         plt.figure(figsize=(10, 8))
         sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', vmin=-1, vmax=1)
         plt.title(f'Sentiment Correlation Matrix for {candidate}')
-        plt.show()
+        show(f'sentiment_correlation_{candidate.lower()}')
 
 def radar_chart_mean_sentiments():
     print("Visualization: Radar Chart of Mean Sentiment Scores")
     print("Interpretation: Displays mean sentiment levels in a circular layout, useful for quick sentiment profile comparisons.")
-    mean_sentiments = combined_df.groupby('candidate')[sentiment_columns].mean()
+    mean_sentiments = data.means
     labels = sentiment_columns
     num_vars = len(labels)
     angles = [n / float(num_vars) * 2 * pi for n in range(num_vars)]
@@ -100,23 +111,12 @@ def radar_chart_mean_sentiments():
     plt.xticks(angles[:-1], labels)
     plt.title('Radar Chart of Mean Sentiment Scores by Candidate')
     plt.legend(loc='upper right', bbox_to_anchor=(1.1, 1.1))
-    plt.show()
+    show('mean_sentiment_radar')
 
 def stacked_bar_sentiment_polarity():
-    def sentiment_category(score):
-        if isinstance(score, (int, float)):
-            if score > 0:
-                return 'Positive'
-            elif score < 0:
-                return 'Negative'
-            else:
-                return 'Neutral'
-        return 'Neutral'
     print("Visualization: Stacked Bar Plot of Sentiment Polarity Counts")
     print("Interpretation: Shows counts of positive, neutral, and negative sentiments per candidate. Useful for visualizing sentiment polarity balance.")
-    sentiment_counts = combined_df[sentiment_columns + ['candidate']].applymap(sentiment_category)
-    sentiment_counts = sentiment_counts.melt(id_vars='candidate', var_name='Sentiment', value_name='Category')
-    sentiment_counts = sentiment_counts.groupby(['candidate', 'Sentiment', 'Category']).size().unstack(fill_value=0)
+    sentiment_counts = polarity_counts(data.combined, sentiment_columns)
     sentiment_counts.plot(kind='bar', stacked=True, figsize=(12, 8), colormap='coolwarm')
     plt.title('Stacked Bar Plot of Sentiment Polarity Counts by Candidate')
     plt.xlabel('Sentiment Type')
@@ -124,35 +124,56 @@ def stacked_bar_sentiment_polarity():
     plt.xticks(rotation=45)
     plt.legend(title='Sentiment Polarity')
     plt.tight_layout()
-    plt.show()
-
-# Console-based UI for visualization selection
-while True:
-    print("\nSelect a visualization to view:")
-    print("1. Mean Sentiment Scores by Candidate (Bar Plot)")
-    print("2. Sentiment Score Distribution by Candidate (Box Plot)")
-    print("3. Density and Distribution of Sentiment Scores (Violin Plot)")
-    print("4. Sentiment Correlation Matrix (Heatmap)")
-    print("5. Radar Chart of Mean Sentiment Scores")
-    print("6. Stacked Bar Plot of Sentiment Polarity Counts")
-    print("0. Exit")
-    
-    choice = input("Enter your choice (0-6): ")
-    
-    if choice == '1':
-        bar_plot_mean_sentiment_scores()
-    elif choice == '2':
-        box_plot_sentiment_distribution()
-    elif choice == '3':
-        violin_plot_density_distribution()
-    elif choice == '4':
-        heatmap_correlation()
-    elif choice == '5':
-        radar_chart_mean_sentiments()
-    elif choice == '6':
-        stacked_bar_sentiment_polarity()
-    elif choice == '0':
-        print("Exiting the program.")
-        break
-    else:
-        print("Invalid choice, please enter a number between 0 and 6.")
+    show('sentiment_polarity_counts')
+
+# Plots by name, in menu order (render-all mode renders each of them)
+plots = {
+    "mean_sentiment_scores": bar_plot_mean_sentiment_scores,
+    "sentiment_distribution_box": box_plot_sentiment_distribution,
+    "sentiment_distribution_violin": violin_plot_density_distribution,
+    "sentiment_correlation": heatmap_correlation,
+    "mean_sentiment_radar": radar_chart_mean_sentiments,
+    "sentiment_polarity_counts": stacked_bar_sentiment_polarity,
+}
+
+
+if __name__ == "__main__":
+    parser = data_dir_parser("Pick sentiment visualizations from a menu, or render them all to files.")
+    parser.add_argument("--render-all", metavar="OUTPUT_DIR", default=None,
+                        help="Save every plot to OUTPUT_DIR without opening windows, in parallel")
+    parser.add_argument("--formats", nargs="+", default=["png"], choices=["png", "svg", "pdf"],
+                        help="File formats for --render-all")
+    parser.add_argument("--dpi", type=int, default=100, help="Resolution of --render-all PNGs")
+    parser.add_argument("--workers", type=int, default=None, help="Processes rendering plots for --render-all")
+    parser.add_argument("--force", action="store_true", help="Re-render plots even if their cached files are current")
+    args = parser.parse_args()
+
+    large_data_mode = args.large_data
+    if args.render_all:
+        from visuals_render import render_all
+        render_all(args.data_dir, args.render_all, args.formats, args.dpi, args.workers, args.force,
+                   args.large_data)
+        raise SystemExit
+
+    load_data(args.data_dir)
+
+    # Console-based UI for visualization selection
+    while True:
+        print("\nSelect a visualization to view:")
+        print("1. Mean Sentiment Scores by Candidate (Bar Plot)")
+        print("2. Sentiment Score Distribution by Candidate (Box Plot)")
+        print("3. Density and Distribution of Sentiment Scores (Violin Plot)")
+        print("4. Sentiment Correlation Matrix (Heatmap)")
+        print("5. Radar Chart of Mean Sentiment Scores")
+        print("6. Stacked Bar Plot of Sentiment Polarity Counts")
+        print("0. Exit")
+
+        choice = input("Enter your choice (0-6): ")
+
+        if choice in ('1', '2', '3', '4', '5', '6'):
+            list(plots.values())[int(choice) - 1]()
+        elif choice == '0':
+            print("Exiting the program.")
+            break
+        else:
+            print("Invalid choice, please enter a number between 0 and 6.")